@@ -1,7 +1,11 @@
 import pandas as pd
+from analysis_cache import AnalysisCache, dataset_path
 
-# CSVファイルの読み込み（エンコーディングは必要に応じて指定）
-df = pd.read_csv('ozmall_reviews.csv', encoding='utf-8')
+# 口コミデータの読み込み（スコアは数値、投稿日は日付型で読み込まれる）
+# 料理コメントは事前に計算済みのトークン列も一緒に読み込む
+# 読み込みと形態素解析の結果は、口コミデータと辞書が変わっていなければ前回のものを使う
+with AnalysisCache() as cache:
+    df = cache.load_tokenized('ozmall_reviews', ['comment_food_drink'])
 
 # データ件数、カラムの確認
 print("データ件数:", len(df))
@@ -17,10 +21,6 @@ df_high = df[df['overall_score'] >= 4.5].copy()
 print("高評価データ件数:", len(df_high))
 
 import re
-from janome.tokenizer import Tokenizer
-
-# Janomeのトークナイザーの初期化
-tokenizer = Tokenizer()
 
 def preprocess_text(text):
     # Noneチェック、文字列変換
@@ -31,51 +31,54 @@ def preprocess_text(text):
     text = re.sub(r'[^\w\sぁ-んァ-ン一-龥]', '', text)
     return text
 
-def tokenize_text(text):
-    # 生成されるgeneratorをリストに変換する
-    tokens = list(tokenizer.tokenize(text, wakati=True))
-    return tokens
+def tokenize_text(surfaces):
+    # 保存済みのトークン（表層形）に同じ前処理をかけ、記号などのトークンを除く
+    return [token for token in map(preprocess_text, surfaces) if token.strip()]
 
 
-# 例として「comment_food_drink」の前処理と分かち書き
+# 例として「comment_food_drink」の前処理と分かち書き（再解析はせずトークン列を使う）
 df_high['clean_comment_food_drink'] = df_high['comment_food_drink'].apply(preprocess_text)
-df_high['tokens_food_drink'] = df_high['clean_comment_food_drink'].apply(tokenize_text)
+df_high['tokens_food_drink'] = df_high['comment_food_drink_surface'].apply(tokenize_text)
 
 # 同様に、他のコメント列も処理可能
 
 # 利用目的の頻度
 print(df_high['purpose'].value_counts())
 
-# 日付形式の変換と時系列解析（必要に応じて）
-df_high['date'] = pd.to_datetime(df_high['date'], format='%Y/%m/%d')
+# 時系列解析（投稿日は読み込み時に日付型に変換済み）
 print(df_high['date'].dt.month.value_counts().sort_index())
 
 from collections import Counter
 
-# 全ての料理コメントの分かち書きリストを結合
-all_tokens_food = sum(df_high['tokens_food_drink'].tolist(), [])
-counter_food = Counter(all_tokens_food)
+# 全ての料理コメントの分かち書きリストの単語を数える（リストは連結しない）
+counter_food = Counter(token for tokens in df_high['tokens_food_drink'] for token in tokens)
 
 # 出現頻度が高い上位20語を表示
 print(counter_food.most_common(20))
 
-from sklearn.feature_extraction.text import TfidfVectorizer
+from tfidf import keyword_tokens, top_keywords, update_document_frequencies
 
-# 料理関連のテキストデータの結合（各レビューを1文書として扱う）
-food_texts = df_high['clean_comment_food_drink'].tolist()
+def food_keywords():
+    # 全口コミの文書頻度（保存済みの値を読み込み、新しく取り込んだ口コミの分だけ追加で集計する）
+    doc_freq = update_document_frequencies('ozmall_reviews', 'comment_food_drink')
 
-# TF-IDFベクトライザーの設定（日本語の場合、事前に分かち書きしたものを結合して文字列にする）
-food_texts_joined = [" ".join(tokens) for tokens in df_high['tokens_food_drink']]
+    # TF-IDF行列（分かち書き済みのトークン列をそのまま使い、文字列に結合して分割し直さない）
+    food_keyword_tokens = df_high['comment_food_drink_surface'].apply(keyword_tokens)
+    tfidf_matrix, feature_names = doc_freq.vectorize(food_keyword_tokens, max_features=100)
 
-vectorizer = TfidfVectorizer(max_features=100)
-tfidf_matrix = vectorizer.fit_transform(food_texts_joined)
-feature_names = vectorizer.get_feature_names_out()
+    # 全文書の上位キーワードを疎行列のまま一度に求める
+    return top_keywords(tfidf_matrix, feature_names, 5)
 
-# 各文書における上位キーワードの確認（例として、最初の5件）
-import numpy as np
+# 口コミデータと辞書が変わっていなければ、前回求めたキーワードを使う
+with AnalysisCache() as cache:
+    df_high['keywords_food_drink'] = cache.cached(
+        'tfidf_keywords',
+        food_keywords,
+        inputs=[dataset_path('ozmall_reviews')],
+        params={'field': 'comment_food_drink', 'min_score': 4.5, 'max_features': 100, 'top': 5},
+        tokenizer=True,
+    )
 
-for idx in range(5):
-    tfidf_scores = tfidf_matrix[idx].toarray().flatten()
-    top_indices = np.argsort(tfidf_scores)[-5:]
-    top_keywords = [feature_names[i] for i in top_indices]
-    print(f"文書 {idx+1} の上位キーワード:", top_keywords)
+# 各文書における上位キーワードの確認（例として、最初の5件）
+for idx, top_keywords_food in enumerate(df_high['keywords_food_drink'].head(5)):
+    print(f"文書 {idx+1} の上位キーワード:", top_keywords_food)
@@ -0,0 +1,237 @@
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import time
+
+from review_store import REVIEW_STORE
+from review_tokens import load_tokenized
+from tokenization import TOKENIZER, dictionary_version
+
+ANALYSIS_CACHE = "analysis_cache"  # 分析の途中結果のキャッシュ
+MAX_CACHE_BYTES = 1 << 30  # キャッシュの合計サイズの上限（超えたら最後に使われたのが古いものから削除する）
+HASH_BLOCK_SIZE = 1 << 20
+
+
+def dataset_path(dataset, store_dir=REVIEW_STORE):
+    """データセットの入力（review_store のディレクトリ、なければ同名のCSV）のパス"""
+    dataset_dir = os.path.join(store_dir, dataset)
+    if os.path.isdir(dataset_dir):
+        return dataset_dir
+    return dataset if dataset.endswith(".csv") else f"{dataset}.csv"
+
+
+class AnalysisCache:
+    """
+    分析の段階（ステージ）ごとの結果を、(入力ファイルの内容のハッシュ, ステージのパラメータ, 形態素解析器と辞書の版) を
+    キーにしてディスクに保存する。入力もパラメータも変わっていなければ、次回は計算せずに保存済みの結果を返す。
+    結果は pickle にして objects/ に置き、キー → サイズ・最終利用時刻をSQLiteの索引に記録する。
+    合計サイズが max_bytes を超えたら、最後に使われたのが古い結果から削除する（LRU）。
+    """
+
+    def __init__(self, cache_dir=ANALYSIS_CACHE, max_bytes=MAX_CACHE_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.objects_dir = os.path.join(cache_dir, "objects")
+        os.makedirs(self.objects_dir, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(cache_dir, "index.sqlite"))
+        with self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    stage TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )
+                """
+            )
+            # 入力ファイルのハッシュ（サイズと更新時刻が変わっていなければ、読み直さずにこの値を使う）
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS file_hashes (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    sha256 TEXT NOT NULL
+                )
+                """
+            )
+
+    def file_hash(self, path):
+        stat = os.stat(path)
+        row = self._conn.execute(
+            "SELECT sha256 FROM file_hashes WHERE path = ? AND size = ? AND mtime_ns = ?",
+            (os.path.abspath(path), stat.st_size, stat.st_mtime_ns),
+        ).fetchone()
+        if row is not None:
+            return row[0]
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+                digest.update(block)
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO file_hashes (path, size, mtime_ns, sha256) VALUES (?, ?, ?, ?)",
+                (os.path.abspath(path), stat.st_size, stat.st_mtime_ns, digest.hexdigest()),
+            )
+        return digest.hexdigest()
+
+    def input_fingerprint(self, path):
+        """入力のファイル（ディレクトリなら配下の全ファイルの相対パスと内容）のハッシュ"""
+        if not os.path.isdir(path):
+            return self.file_hash(path)
+        digest = hashlib.sha256()
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                file_path = os.path.join(root, name)
+                digest.update(f"{os.path.relpath(file_path, path)}\t{self.file_hash(file_path)}\n".encode("utf-8"))
+        return digest.hexdigest()
+
+    def key(self, stage, inputs=(), params=None, tokenizer=False):
+        """
+        ステージの結果のキー。inputs は入力のファイルまたはディレクトリのパスのリスト。
+        params はJSONにできる値の辞書（集合はリストにしておく）。
+        tokenizer=True なら、使用中の形態素解析器と辞書の版もキーに含める（トークンから計算するステージ）。
+        """
+        spec = {
+            "stage": stage,
+            "inputs": [self.input_fingerprint(path) for path in inputs],
+            "params": params or {},
+        }
+        if tokenizer:
+            spec["tokenizer"] = f"{TOKENIZER}:{dictionary_version()}"
+        encoded = json.dumps(spec, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")
+        return hashlib.sha256(encoded).hexdigest()
+
+    def _object_path(self, key):
+        return os.path.join(self.objects_dir, f"{key}.pkl")
+
+    def get(self, key):
+        """(見つかったか, 値) を返す"""
+        path = self._object_path(key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+        except FileNotFoundError:
+            return False, None
+        except (pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            self._remove(key)  # 壊れた、または読み込めなくなった結果は捨てる
+            return False, None
+        with self._conn:
+            self._conn.execute("UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key))
+        return True, value
+
+    def put(self, key, stage, value):
+        # 書き込み途中のファイルを読み込まないよう、一時ファイルに書いてから置き換える
+        path = self._object_path(key)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        now = time.time()
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, stage, size, created_at, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, stage, os.path.getsize(path), now, now),
+            )
+        self.evict()
+
+    def cached(self, stage, compute, inputs=(), params=None, tokenizer=False):
+        """保存済みの結果があればそれを返し、なければ compute() の結果を保存して返す"""
+        key = self.key(stage, inputs, params, tokenizer)
+        found, value = self.get(key)
+        if found:
+            return value
+        value = compute()
+        self.put(key, stage, value)
+        return value
+
+    def load_tokenized(self, dataset, fields, columns=None, store_dir=REVIEW_STORE):
+        """
+        review_tokens.load_tokenized と同じ DataFrame を返す。読み込みと形態素解析（トークン列が保存されていない
+        データセットでは全口コミを解析し直す）の結果を、データセットの内容と辞書の版をキーに保存しておく。
+        """
+        return self.cached(
+            "tokenized",
+            lambda: load_tokenized(dataset, fields, columns, store_dir),
+            inputs=[dataset_path(dataset, store_dir)],
+            params={"fields": list(fields), "columns": None if columns is None else list(columns)},
+            tokenizer=True,
+        )
+
+    def evict(self, max_bytes=None):
+        """合計サイズが max_bytes 以下になるまで、最後に使われたのが古い結果から削除する"""
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        total = self.total_size()
+        if total <= max_bytes:
+            return 0
+        removed = 0
+        for key, size in self._conn.execute("SELECT key, size FROM entries ORDER BY last_used").fetchall():
+            if total <= max_bytes:
+                break
+            self._remove(key)
+            total -= size
+            removed += 1
+        return removed
+
+    def _remove(self, key):
+        try:
+            os.remove(self._object_path(key))
+        except FileNotFoundError:
+            pass
+        with self._conn:
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def clear(self, stage=None):
+        """保存済みの結果を削除する（stage を指定すると、そのステージの結果だけ）"""
+        if stage is None:
+            keys = self._conn.execute("SELECT key FROM entries").fetchall()
+        else:
+            keys = self._conn.execute("SELECT key FROM entries WHERE stage = ?", (stage,)).fetchall()
+        for (key,) in keys:
+            self._remove(key)
+        return len(keys)
+
+    def total_size(self):
+        return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def stats(self):
+        """ステージ → (結果の数, 合計サイズ)"""
+        rows = self._conn.execute("SELECT stage, COUNT(*), SUM(size) FROM entries GROUP BY stage ORDER BY stage")
+        return {stage: (count, size) for stage, count, size in rows}
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="分析結果のキャッシュの状態を表示・整理します。")
+    parser.add_argument("--cache-dir", default=ANALYSIS_CACHE, help="キャッシュの保存先")
+    parser.add_argument("--clear", action="store_true", help="保存済みの結果を削除する")
+    parser.add_argument("--stage", help="--clear で削除するステージ（省略時は全て）")
+    parser.add_argument("--max-mb", type=float, help="合計サイズがこの値（MB）以下になるまで古い結果を削除する")
+    args = parser.parse_args()
+
+    with AnalysisCache(args.cache_dir) as cache:
+        if args.clear:
+            print(f"{cache.clear(args.stage)}件の結果を削除しました。")
+        if args.max_mb is not None:
+            print(f"{cache.evict(int(args.max_mb * 2**20))}件の結果を削除しました。")
+        for stage, (count, size) in cache.stats().items():
+            print(f"{stage}: {count}件, {size / 2**20:.2f}MB")
+        print(f"合計: {cache.total_size() / 2**20:.2f}MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+import argparse
+import glob
+import os
+import time
+
+from crawl_jobs import box_filter, load_jobs
+from page_cache import PageCache
+from review_parser import BACKENDS, etree, parse_page
+
+CACHE_DIR = "page_cache"
+
+
+# 保存済みのHTMLを読み込む（ファイル・ディレクトリ指定がなければページキャッシュから）
+def load_html(paths, cache_dir):
+    pages = []
+    if paths:
+        for path in paths:
+            if os.path.isdir(path):
+                files = sorted(glob.glob(os.path.join(path, "**", "*.html"), recursive=True))
+            else:
+                files = [path]
+            for file in files:
+                with open(file, "r", encoding="utf-8") as f:
+                    pages.append((file, f.read()))
+    else:
+        cache = PageCache(cache_dir)
+        for url in cache.urls():
+            html = cache.load(url)
+            if html is not None:
+                pages.append((url, html))
+        cache.close()
+    return pages
+
+
+def bench(pages, backend, rounds, box_filter=None):
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _, html in pages:
+            parse_page(html, backend, box_filter)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="口コミページ解析のバックエンドごとの速度を比較します。")
+    parser.add_argument("paths", nargs="*", help="HTMLファイルまたはディレクトリ（省略時はページキャッシュを使う）")
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="ページキャッシュの保存先")
+    parser.add_argument("--rounds", type=int, default=3, help="計測の繰り返し回数（最速の回を採用）")
+    parser.add_argument(
+        "--jobs", metavar="CONFIG", help="ジョブの設定（crawl_jobs.json）の条件で抽出を打ち切る場合の速度も計測する"
+    )
+    args = parser.parse_args()
+
+    pages = load_html(args.paths, args.cache_dir)
+    if not pages:
+        print("解析するHTMLがありません。先にクロールしてページキャッシュを作成するか、tests/fixtures を指定してください。")
+        return
+    backends = [backend for backend in BACKENDS if backend != "lxml" or etree is not None]
+    page_filter = box_filter(load_jobs(args.jobs)) if args.jobs else None
+    reviews = sum(len(parse_page(html, backends[0]).reviews) for _, html in pages)
+    print(f"ページ数: {len(pages)}, 口コミボックス数: {reviews}")
+
+    results = {}
+    for backend in backends:
+        results[backend] = bench(pages, backend, args.rounds)
+        print(f"{backend:>5}: {results[backend]:.3f}秒 ({len(pages) / results[backend]:.1f} ページ/秒)")
+        if args.jobs:
+            filtered = bench(pages, backend, args.rounds, page_filter)
+            print(f"{backend:>5} (条件あり): {filtered:.3f}秒 ({results[backend] / filtered:.1f} 倍)")
+    if "lxml" in results:
+        print(f"lxml は bs4 の {results['bs4'] / results['lxml']:.1f} 倍の速度です。")
+
+        # 両バックエンドの抽出結果が一致するかを確認する
+        mismatches = [name for name, html in pages if parse_page(html, "lxml") != parse_page(html, "bs4")]
+        if mismatches:
+            print(f"抽出結果が一致しないページ: {len(mismatches)}件")
+            for name in mismatches[:10]:
+                print(f"  {name}")
+        else:
+            print("全ページで抽出結果が一致しました。")
+
+
+if __name__ == "__main__":
+    main()
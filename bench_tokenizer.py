@@ -0,0 +1,130 @@
+import argparse
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+import tokenization
+from review_store import read_reviews_csv
+from review_tokens import COMMENT_FIELDS
+from tokenization import TOKENIZERS, get_backend
+
+CORPUS_FILES = ["ozmall_reviews_10.csv", "星4.5未満・口コミ3以下.csv"]
+
+
+# 口コミのCSVからテキストを読み込む（コメント列がなければ先頭の列、例えば単語リストの word 列を使う）
+def load_texts(paths):
+    texts = []
+    for path in paths:
+        df = read_reviews_csv(path)
+        columns = [col for col in COMMENT_FIELDS if col in df.columns] or [df.columns[0]]
+        for col in columns:
+            texts.extend(text for text in df[col].dropna().astype(str) if text.strip())
+        print(f"{path}: {len(df)}行, カラム {columns}")
+    return texts
+
+
+def bench(tokenizer, texts, rounds, mecab_args):
+    # 別プロセスで実行される（解析器ごとにメモリ使用量を独立に測る）
+    # メモリは Python のヒープ上の確保量（tracemalloc）で、C拡張が確保する分は含まない
+    if mecab_args is not None:
+        tokenization.MECAB_ARGS = mecab_args
+    # 解析器の読み込み（辞書など）で確保されるメモリ
+    tracemalloc.start()
+    start = time.perf_counter()
+    backend = get_backend(tokenizer)
+    backend.parse("")
+    load_time = time.perf_counter() - start
+    _, load_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # 速度はメモリの計測を止めて測る
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        results = [backend.parse(text) for text in texts]
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    # 全テキストの解析中に確保されるメモリ（解析結果を含む）
+    tracemalloc.start()
+    results = [backend.parse(text) for text in texts]
+    _, parse_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    peak = load_peak + parse_peak
+    # 一致率の計算用に、形態素の区切り位置と原形だけを返す
+    return load_time, best, peak, [segments(text, morphs) for text, morphs in zip(texts, results)]
+
+
+def segments(text, morphs):
+    """
+    形態素の (開始位置, 終了位置, 原形) の集合（空白は解析器によって扱いが違うので除く）。
+    MeCab は空白を出力せず、Janome・Sudachi は空白も形態素として出力するので、位置は表層形の長さの累計ではなく
+    元のテキスト上で表層形を探して決める。
+    """
+    spans = set()
+    position = 0
+    for surface, feature in morphs:
+        if not surface.strip():
+            continue
+        start = text.find(surface, position)
+        if start < 0:
+            start = position  # 元のテキストに見つからない表層形は、直前の形態素の続きとみなす
+        spans.add((start, start + len(surface), tokenization.base_form(surface, feature)))
+        position = start + len(surface)
+    return spans
+
+
+def agreement(reference, other, with_base_form=False):
+    # 区切り位置（と原形）の一致を F1 値で表す
+    matched = total_ref = total_other = 0
+    for ref_spans, other_spans in zip(reference, other):
+        if not with_base_form:
+            ref_spans = {span[:2] for span in ref_spans}
+            other_spans = {span[:2] for span in other_spans}
+        matched += len(ref_spans & other_spans)
+        total_ref += len(ref_spans)
+        total_other += len(other_spans)
+    if not matched:
+        return 0.0
+    precision, recall = matched / total_other, matched / total_ref
+    return 2 * precision * recall / (precision + recall)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="形態素解析器ごとの速度・メモリ・解析結果の一致率を比較します。")
+    parser.add_argument("paths", nargs="*", default=CORPUS_FILES, help="口コミのCSVファイル")
+    parser.add_argument("--tokenizers", nargs="+", choices=TOKENIZERS, default=list(TOKENIZERS), help="比較する解析器")
+    parser.add_argument("--rounds", type=int, default=3, help="計測の繰り返し回数（最速の回を採用）")
+    parser.add_argument("--limit", type=int, help="使うテキスト数の上限")
+    parser.add_argument("--mecab-args", help="MeCab に渡す引数（省略時は tokenization.MECAB_ARGS）")
+    args = parser.parse_args()
+
+    texts = load_texts(args.paths)[: args.limit]
+    chars = sum(len(text) for text in texts)
+    print(f"テキスト数: {len(texts)}, 文字数: {chars}")
+
+    results = {}
+    for tokenizer in args.tokenizers:
+        try:
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                results[tokenizer] = executor.submit(bench, tokenizer, texts, args.rounds, args.mecab_args).result()
+        except ImportError as e:
+            print(f"{tokenizer:>7}: スキップ（{e}）")
+    if not results:
+        return
+
+    reference = next(iter(results))
+    print(f"\n一致率は {reference} の解析結果との比較（区切り位置 / 区切り位置と原形の F1 値）")
+    for tokenizer, (load_time, elapsed, peak, spans) in results.items():
+        tokens = sum(len(text_spans) for text_spans in spans)
+        print(
+            f"{tokenizer:>7}: 読み込み {load_time:.2f}秒, 解析 {elapsed:.3f}秒 "
+            f"({tokens / elapsed:,.0f} 形態素/秒, {chars / elapsed:,.0f} 文字/秒), "
+            f"メモリ {peak / 2**20:.1f}MB, "
+            f"一致率 {agreement(results[reference][3], spans):.3f} / "
+            f"{agreement(results[reference][3], spans, with_base_form=True):.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from review_store import REVIEW_STORE
+from review_tokens import load_tokenized, token_columns
+from term_frequency import doc_term_matrix
+
+MEASURES = ("count", "pmi", "jaccard")
+
+
+class CooccurrenceCounts:
+    """
+    口コミをチャンクごとに加えながら、全単語の組の共起口コミ数 X^T X を積み上げる（X は口コミ×単語の0/1行列）。
+    X^T X はチャンクごとの積の和になるので、保持するのは単語×単語の行列だけで、口コミ数に比例するメモリは使わない。
+    """
+
+    def __init__(self):
+        self.vocabulary = {}  # 単語 → 行・列番号（全チャンクで共通）
+        self.num_docs = 0
+        self.counts = sparse.csr_matrix((0, 0), dtype=np.int32)
+
+    def update(self, token_lists):
+        # 同じ口コミ内で何回出現しても1回として数える
+        X, _ = doc_term_matrix(token_lists, binary=True, vocabulary=self.vocabulary)
+        counts = self.counts.copy()
+        counts.resize(X.shape[1], X.shape[1])  # このチャンクで増えた単語の分だけ広げる
+        self.counts = (counts + X.T @ X).tocsr()
+        self.num_docs += X.shape[0]
+        return self
+
+
+class CooccurrenceMatrix:
+    """
+    口コミ単位の単語の共起行列。
+    口コミ×単語の疎行列（出現すれば1）を一度だけ作り、その積 X^T X で全単語の組の共起口コミ数を求める。
+    対角成分は各単語を含む口コミ数（文書頻度）になる。
+    """
+
+    def __init__(self, token_lists, min_df=1):
+        self._set_counts(CooccurrenceCounts().update(token_lists), min_df)
+
+    @classmethod
+    def from_counts(cls, counts, min_df=1):
+        """チャンクごとに積み上げた CooccurrenceCounts から作る"""
+        matrix = cls.__new__(cls)
+        matrix._set_counts(counts, min_df)
+        return matrix
+
+    def _set_counts(self, counts, min_df):
+        words = np.array(list(counts.vocabulary), dtype=object)
+
+        # 出現する口コミ数が min_df 未満の単語は除く
+        df_counts = counts.counts.diagonal()
+        keep = np.flatnonzero(df_counts >= min_df)
+
+        self.words = words[keep].tolist()
+        self.num_docs = counts.num_docs
+        self.counts = counts.counts[keep][:, keep].tocsr()
+        self.doc_freq = df_counts[keep]
+        self._word_ids = {word: i for i, word in enumerate(self.words)}
+
+    def __contains__(self, word):
+        return word in self._word_ids
+
+    def __len__(self):
+        return len(self.words)
+
+    def _row(self, word, measure):
+        # 単語の行（共起する単語の列番号と値）を measure に応じた尺度で返す（自分自身は除く）
+        i = self._word_ids[word]
+        start, end = self.counts.indptr[i], self.counts.indptr[i + 1]
+        cols = self.counts.indices[start:end]
+        values = self.counts.data[start:end]
+        others = cols != i
+        cols, values = cols[others], values[others]
+        if measure == "pmi":
+            # PMI = log( P(i, j) / (P(i) P(j)) ) = log( c_ij * N / (df_i * df_j) )
+            # 共起数・文書頻度は int32 なので、積があふれないよう float64 にしてから計算する
+            values = np.log(
+                values.astype(np.float64) * self.num_docs / (self.doc_freq[i].astype(np.float64) * self.doc_freq[cols])
+            )
+        elif measure == "jaccard":
+            values = values / (self.doc_freq[i] + self.doc_freq[cols] - values)
+        elif measure != "count":
+            raise ValueError(f"measure は {MEASURES} のいずれかを指定してください: {measure}")
+        return cols, values
+
+    def top_partners(self, word, k=10, measure="count"):
+        """単語と共起する単語の上位k件を (単語, 値) のリストで返す（値の降順、同値なら文書頻度の降順）"""
+        if word not in self._word_ids:
+            return []
+        cols, values = self._row(word, measure)
+        if len(cols) > k:
+            # 上位k件の候補だけを取り出してから並べ替える
+            top = np.argpartition(-values, k - 1)[:k]
+            cols, values = cols[top], values[top]
+        order = np.lexsort((-self.doc_freq[cols], -values))
+        return [(self.words[cols[n]], values[n].item()) for n in order]
+
+    def cooccurrence(self, word, other):
+        i, j = self._word_ids.get(word), self._word_ids.get(other)
+        if i is None or j is None:
+            return 0
+        return int(self.counts[i, j])
+
+    def pmi(self, word, other):
+        count = self.cooccurrence(word, other)
+        if not count:
+            return float("-inf")
+        i, j = self._word_ids[word], self._word_ids[other]
+        return float(np.log(float(count) * self.num_docs / (float(self.doc_freq[i]) * float(self.doc_freq[j]))))
+
+    def jaccard(self, word, other):
+        count = self.cooccurrence(word, other)
+        if not count:
+            return 0.0
+        i, j = self._word_ids[word], self._word_ids[other]
+        return count / float(self.doc_freq[i] + self.doc_freq[j] - count)
+
+    def partners_frame(self, words=None, k=10, measure="count"):
+        """全単語（または指定した単語）について、共起の上位k件を1つの DataFrame にまとめる"""
+        rows = []
+        for word in self.words if words is None else words:
+            for rank, (partner, value) in enumerate(self.top_partners(word, k, measure), start=1):
+                rows.append({"word": word, "rank": rank, "partner": partner, measure: value})
+        return pd.DataFrame(rows, columns=["word", "rank", "partner", measure])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="口コミの単語の共起（共起数・PMI・Jaccard係数）を集計します。")
+    parser.add_argument("dataset", help="review_store のデータセット名")
+    parser.add_argument("--field", default="comment_food_drink", help="集計するコメント列")
+    parser.add_argument("--store-dir", default=REVIEW_STORE, help="データセットの保存先")
+    parser.add_argument("--measure", choices=MEASURES, default="count", help="共起の尺度")
+    parser.add_argument("--top-k", type=int, default=10, help="単語ごとに出力する共起語の数")
+    parser.add_argument("--min-df", type=int, default=2, help="集計対象にする単語の最小出現口コミ数")
+    parser.add_argument("--words", nargs="+", help="集計する単語（省略時は全単語）")
+    parser.add_argument("--output", default="cooccurrence.csv", help="出力するCSVファイル")
+    args = parser.parse_args()
+
+    base_col = token_columns(args.field)[1]
+    df = load_tokenized(args.dataset, [args.field], columns=[], store_dir=args.store_dir)
+    matrix = CooccurrenceMatrix(df[base_col], min_df=args.min_df)
+    print(f"口コミ数: {matrix.num_docs}, 単語数: {len(matrix)}")
+
+    result = matrix.partners_frame(args.words, args.top_k, args.measure)
+    result.to_csv(args.output, index=False, encoding="utf-8-sig")
+    print(f"共起語を '{args.output}' に保存しました。")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+import csv
+import json
+from dataclasses import dataclass, fields, replace
+from datetime import datetime
+
+from review_parser import BoxFilter
+
+JOBS_FILE = "crawl_jobs.json"  # クロールするURLリストと、リストごとの抽出条件の設定
+AFTERNOON_TEA_KEYWORDS = ("Afternoon", "アフタヌーン")
+# 一覧に載っているカテゴリのページのURLを、口コミのページのURLに書き換える
+REVIEW_PATH = ("/afternoontea/", "/review/")
+
+
+@dataclass
+class CrawlJob:
+    """
+    1つのURLリストのクロール条件と出力先。
+    keywords のいずれかを利用プラン名に含む口コミだけを採用する（空なら全プラン）。
+    date_from / date_to / max_reviews が None ならその条件を使わない。
+    priority の大きいジョブのレストランから順に処理する。
+    """
+
+    name: str
+    url_file: str
+    output: str
+    keywords: tuple = AFTERNOON_TEA_KEYWORDS
+    date_from: datetime = None
+    date_to: datetime = None
+    max_reviews: int = None
+    priority: int = 0
+    review_path: tuple = REVIEW_PATH
+    # 料理と雰囲気・サービスのコメントが揃っている口コミだけを採用するか
+    require_comments: bool = True
+
+    def plan_matches(self, plan_menu):
+        return not self.keywords or any(keyword in plan_menu for keyword in self.keywords)
+
+    def review_url(self, url):
+        old, new = self.review_path
+        return url.strip().replace(old, new)
+
+
+def _parse_date(value):
+    return datetime.strptime(value, "%Y-%m-%d") if value else None
+
+
+def load_jobs(path=JOBS_FILE):
+    """
+    ジョブの設定（JSON）を読み込む。形式:
+      {"jobs": [{"name": ..., "url_file": ..., "output": ..., "keywords": [...],
+                 "date_from": "YYYY-MM-DD", "date_to": "YYYY-MM-DD", "max_reviews": 10, "priority": 0}, ...]}
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    known = {f.name for f in fields(CrawlJob)}
+    jobs = []
+    for spec in config["jobs"]:
+        unknown = set(spec) - known
+        if unknown:
+            raise ValueError(f"{path}: ジョブ '{spec.get('name')}' に不明な項目があります: {sorted(unknown)}")
+        spec = dict(spec)
+        for key in ("date_from", "date_to"):
+            spec[key] = _parse_date(spec.get(key))
+        for key in ("keywords", "review_path"):
+            if key in spec:
+                spec[key] = tuple(spec[key])
+        jobs.append(CrawlJob(**spec))
+    names = [job.name for job in jobs]
+    if len(set(names)) != len(names):
+        raise ValueError(f"{path}: ジョブ名が重複しています: {names}")
+    return jobs
+
+
+def override_jobs(jobs, **options):
+    """None でない options（date_from, date_to, max_reviews など）で、全ジョブの条件を置き換える"""
+    options = {key: value for key, value in options.items() if value is not None}
+    return [replace(job, **options) for job in jobs]
+
+
+# CSVファイルからレストランのURLを正しく抽出する
+def read_url_file(path):
+    urls = []
+    with open(path, "r", encoding="utf-8-sig") as csvfile:
+        reader = csv.reader(csvfile)
+        for row in reader:
+            if not row:
+                continue
+            # 行が2つ以上の要素（レストラン名, URL）を持つ場合は2列目、要素が1つだけの場合はそのまま利用
+            urls.append(row[1] if len(row) >= 2 else row[0])
+    return urls
+
+
+def box_filter(jobs):
+    """
+    jobs のいずれかが採用しうる口コミだけを最後まで抽出させる、解析時の条件（BoxFilter）。
+    条件はジョブごとの条件を合わせたもの（日付範囲は全ジョブの範囲を覆い、キーワードは和集合）で、
+    これで除いた口コミは、どのジョブでも対象外になる。
+    """
+    date_froms = [job.date_from for job in jobs]
+    date_tos = [job.date_to for job in jobs]
+    keywords = tuple(dict.fromkeys(keyword for job in jobs for keyword in job.keywords))
+    if any(not job.keywords for job in jobs):
+        keywords = ()  # 全プランを対象にするジョブがあれば、プラン名では除かない
+    return BoxFilter(
+        date_from=None if None in date_froms else min(date_froms),
+        date_to=None if None in date_tos else max(date_tos),
+        keywords=keywords,
+        require_comments=all(job.require_comments for job in jobs),
+    )
+
+
+def schedule(jobs):
+    """
+    全ジョブのURLリストをまとめ、(口コミページのURL, そのレストランを対象とするジョブのリスト) を処理する順に返す。
+    複数のリストに載っているレストランは1回だけ取得し、取得したページを各ジョブの条件で振り分ける。
+    順番は、対象とするジョブの priority の大きい順（同じなら設定・リストに書かれた順）。
+    """
+    tasks = {}
+    for job in sorted(jobs, key=lambda job: -job.priority):
+        for url in read_url_file(job.url_file):
+            task_jobs = tasks.setdefault(job.review_url(url), [])
+            if job not in task_jobs:
+                task_jobs.append(job)
+    return list(tasks.items())
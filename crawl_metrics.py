@@ -0,0 +1,202 @@
+import argparse
+import json
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+METRICS_FILE = "crawl_metrics.jsonl"  # クロールの計測ログ（1行1イベントのJSON、実行ごとに追記）
+
+# 口コミを対象外にした理由
+FILTER_REASONS = {
+    "date_window": "投稿日が取得範囲外",
+    "already_seen": "前回までに取得済み（差分クロール）",
+    "no_detail": "口コミ詳細なし",
+    "plan": "利用プランが対象外（アフタヌーンティー以外など）",
+    "missing_comment": "料理・雰囲気のコメントなし",
+}
+
+
+def _percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def _stats(values):
+    # 平均・中央値・95パーセンタイル・最大値（値がなければ None）
+    if not values:
+        return {"count": 0, "mean": None, "p50": None, "p95": None, "max": None}
+    return {
+        "count": len(values),
+        "mean": sum(values) / len(values),
+        "p50": _percentile(values, 0.5),
+        "p95": _percentile(values, 0.95),
+        "max": max(values),
+    }
+
+
+class CrawlMetrics:
+    """
+    クロールの計測値（リクエストの待ち時間・応答時間・転送量、ページの解析時間、口コミの採用・除外数、再試行）を集計する。
+    path を指定すると、各イベントを JSON-lines のログに書き出す。複数のワーカースレッドから呼ばれても安全。
+    """
+
+    def __init__(self, path=None, **run_info):
+        self.path = path
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8", buffering=1) if path else None
+        self.status_codes = Counter()
+        self.latencies = []  # リクエストの応答時間（秒）
+        self.waits = []  # レートリミッタでの待ち時間（秒）
+        self.bytes_downloaded = 0
+        self.cache_hits = 0  # 304 またはキャッシュからの再生で、本文をダウンロードしなかったページ
+        self.parse_times = []  # ページの解析時間（秒、解析プロセス内で計測）
+        self.boxes_skipped = Counter()  # 解析時の条件で、詳細を抽出せずに除いた口コミ数（理由ごと）
+        self.pages = 0
+        self.reviews_kept = 0
+        self.filtered = Counter()
+        self.job_kept = Counter()  # ジョブごとの採用した口コミ数
+        self.retries = Counter()  # 再試行の理由（ステータスコードや例外名）ごとの回数
+        self._log("run_start", started_at=datetime.now().isoformat(timespec="seconds"), **run_info)
+
+    def _log(self, event, **fields):
+        # ロックを持った状態で呼ぶか、初期化中に呼ぶ
+        if self._file is not None:
+            record = {"event": event, "t": round(time.monotonic() - self.started, 4), **fields}
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def record_request(self, url, status, latency, size, wait=0.0):
+        with self._lock:
+            self.status_codes[status] += 1
+            self.latencies.append(latency)
+            self.waits.append(wait)
+            self.bytes_downloaded += size
+            self._log("request", url=url, status=status, latency=latency, bytes=size, wait=wait)
+
+    def record_cache_hit(self, url, status=None):
+        # status は 304（条件付きGET）、None はネットワークに接続しない再生
+        with self._lock:
+            self.cache_hits += 1
+            self._log("cache_hit", url=url, status=status)
+
+    def record_retry(self, url, reason, attempt, delay):
+        with self._lock:
+            self.retries[str(reason)] += 1
+            self._log("retry", url=url, reason=str(reason), attempt=attempt, delay=delay)
+
+    def record_parse(self, url, seconds, reviews, skipped=None):
+        with self._lock:
+            self.parse_times.append(seconds)
+            self.boxes_skipped.update(skipped or {})
+            fields = {"skipped": dict(skipped)} if skipped else {}
+            self._log("parse", url=url, seconds=seconds, reviews=reviews, **fields)
+
+    def record_page(self, url, page_no, kept, filtered, jobs=None):
+        """
+        ページごとの採用した口コミ数と、理由ごとの除外した口コミ数（filtered は Counter）。
+        複数のジョブで共有するページは、jobs にジョブ名 → {"kept", "filtered"} の内訳を渡す。
+        """
+        with self._lock:
+            self.pages += 1
+            self.reviews_kept += kept
+            self.filtered.update(filtered)
+            for job, counts in (jobs or {}).items():
+                self.job_kept[job] += counts["kept"]
+            fields = {"jobs": jobs} if jobs else {}
+            self._log("page", url=url, page_no=page_no, kept=kept, filtered=dict(filtered), **fields)
+
+    def summary(self):
+        with self._lock:
+            elapsed = time.monotonic() - self.started
+            requests = sum(self.status_codes.values())
+            return {
+                "elapsed": elapsed,
+                "requests": requests,
+                "requests_per_sec": requests / elapsed if elapsed > 0 else None,
+                "status_codes": {str(status): count for status, count in sorted(self.status_codes.items(), key=str)},
+                "cache_hits": self.cache_hits,
+                "bytes_downloaded": self.bytes_downloaded,
+                "latency": _stats(self.latencies),
+                "rate_limit_wait": _stats(self.waits),
+                "parse_time": _stats(self.parse_times),
+                "boxes_skipped": dict(self.boxes_skipped),
+                "pages": self.pages,
+                "reviews_kept": self.reviews_kept,
+                "reviews_filtered": dict(self.filtered),
+                "reviews_kept_by_job": dict(self.job_kept),
+                "retries": dict(self.retries),
+            }
+
+    def close(self):
+        """実行全体の集計をログに書き出して閉じ、集計を返す"""
+        summary = self.summary()
+        with self._lock:
+            self._log("summary", **summary)
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        return summary
+
+
+def format_summary(summary):
+    """summary() の集計を表示用の複数行の文字列にする"""
+
+    def ms(stats, key):
+        return "-" if stats[key] is None else f"{stats[key] * 1000:.0f}ms"
+
+    lines = [
+        f"経過時間: {summary['elapsed']:.1f}秒, リクエスト: {summary['requests']}件 "
+        f"({summary['requests_per_sec'] or 0:.2f}件/秒), キャッシュ利用: {summary['cache_hits']}件",
+        f"ステータスコード: {summary['status_codes']}",
+        f"ダウンロード: {summary['bytes_downloaded'] / 2**20:.2f}MB",
+    ]
+    for key, label in (("latency", "応答時間"), ("rate_limit_wait", "レート制限の待ち"), ("parse_time", "解析時間")):
+        stats = summary[key]
+        lines.append(
+            f"{label}: 平均 {ms(stats, 'mean')}, 中央値 {ms(stats, 'p50')}, "
+            f"95% {ms(stats, 'p95')}, 最大 {ms(stats, 'max')} ({stats['count']}件)"
+        )
+    skipped = summary.get("boxes_skipped")
+    if skipped:
+        lines.append(
+            "詳細の抽出を省略した口コミ: "
+            + ", ".join(f"{FILTER_REASONS.get(reason, reason)} {count}件" for reason, count in skipped.items())
+        )
+    lines.append(f"ページ: {summary['pages']}, 採用した口コミ: {summary['reviews_kept']}件")
+    for reason, count in summary["reviews_filtered"].items():
+        lines.append(f"  除外（{FILTER_REASONS.get(reason, reason)}）: {count}件")
+    by_job = summary.get("reviews_kept_by_job", {})
+    if len(by_job) > 1:
+        lines.append("ジョブ別の採用した口コミ: " + ", ".join(f"{job} {count}件" for job, count in by_job.items()))
+    if summary["retries"]:
+        lines.append(f"再試行: {summary['retries']}")
+    return "\n".join(lines)
+
+
+def read_summaries(path=METRICS_FILE):
+    """ログから実行ごとの集計（summary イベント）を古い順に返す"""
+    summaries = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            if record["event"] == "summary":
+                summaries.append(record)
+    return summaries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="クロールの計測ログから実行ごとの集計を表示します。")
+    parser.add_argument("path", nargs="?", default=METRICS_FILE, help="計測ログのファイル")
+    parser.add_argument("--last", type=int, default=1, help="表示する実行数（新しい順）")
+    args = parser.parse_args()
+
+    for summary in read_summaries(args.path)[-args.last :]:
+        print(format_summary(summary))
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+import hashlib
+import json
+import sqlite3
+import threading
+from datetime import datetime
+
+PENDING = "pending"
+IN_PROGRESS = "in_progress"
+DONE = "done"
+FAILED = "failed"
+
+
+class CrawlState:
+    """
+    レストランURLごとのクロール進捗をSQLiteに保存する。
+    中断後の再実行時に、完了済みのレストランを飛ばし、途中のレストランは続きのページから再開するために使う。
+    差分クロール用に、レストランごとの最新口コミの日付と指紋（ウォーターマーク）も保持する。
+    再試行しても取得できなかったレストランは、失敗したページと理由をデッドレターとして残す。
+    1つのレストランを複数のジョブ（crawl_jobs.CrawlJob）で共有する場合は、ジョブごとの書き込み数と完了も記録する。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        # 複数のワーカースレッドから使うため、接続は1つにしてロックで保護する
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS restaurants (
+                    url TEXT PRIMARY KEY,
+                    restaurant_name TEXT,
+                    last_page INTEGER NOT NULL DEFAULT 0,
+                    reviews_written INTEGER NOT NULL DEFAULT 0,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    updated_at TEXT
+                )
+                """
+            )
+            # 確定済みのウォーターマーク（レストランのクロールが完了した時点で更新）
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS watermarks (
+                    url TEXT PRIMARY KEY,
+                    newest_date TEXT NOT NULL,
+                    fingerprints TEXT NOT NULL,
+                    updated_at TEXT
+                )
+                """
+            )
+            # クロール途中のウォーターマーク候補（中断後の再開時に引き継ぐ）
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS pending_watermarks (
+                    url TEXT PRIMARY KEY,
+                    newest_date TEXT NOT NULL,
+                    fingerprints TEXT NOT NULL
+                )
+                """
+            )
+            # レストランごと・ジョブごとの書き込み済みの口コミ数と、そのジョブの条件を満たし終えたか
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS job_progress (
+                    url TEXT NOT NULL,
+                    job TEXT NOT NULL,
+                    reviews_written INTEGER NOT NULL DEFAULT 0,
+                    finished INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (url, job)
+                )
+                """
+            )
+            # 取得に失敗したレストラン（完了するまで残し、--retry-dead-letters で取得し直す）
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS dead_letters (
+                    url TEXT PRIMARY KEY,
+                    page_url TEXT,
+                    reason TEXT,
+                    failures INTEGER NOT NULL DEFAULT 1,
+                    failed_at TEXT
+                )
+                """
+            )
+
+    def get(self, url):
+        # 記録がなければ None を返す
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT restaurant_name, last_page, reviews_written, status FROM restaurants WHERE url = ?",
+                (url,),
+            ).fetchone()
+        if row is None:
+            return None
+        return {"restaurant_name": row[0], "last_page": row[1], "reviews_written": row[2], "status": row[3]}
+
+    def get_job_progress(self, url):
+        # ジョブ名 → {"reviews_written", "finished"}（記録がなければ空の辞書）
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT job, reviews_written, finished FROM job_progress WHERE url = ?", (url,)
+            ).fetchall()
+        return {job: {"reviews_written": count, "finished": bool(finished)} for job, count, finished in rows}
+
+    def get_watermark(self, url):
+        # 確定済みのウォーターマークを (最新の投稿日, その日の口コミの指紋の集合) で返す
+        return self._get_watermark("watermarks", url)
+
+    def get_pending_watermark(self, url):
+        return self._get_watermark("pending_watermarks", url)
+
+    def record_page(
+        self, url, restaurant_name, page_no, reviews_written, watermark=None, job_counts=None, finished_jobs=()
+    ):
+        # ページの書き込みが終わった時点で呼び、次回はこの次のページから再開する
+        # job_counts はジョブ名 → 書き込み済みの口コミ数、finished_jobs は条件を満たし終えたジョブ名
+        self._upsert(url, restaurant_name, page_no, reviews_written, IN_PROGRESS)
+        if job_counts:
+            finished_jobs = set(finished_jobs)
+            with self._lock, self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO job_progress (url, job, reviews_written, finished) VALUES (?, ?, ?, ?)",
+                    [(url, job, count, int(job in finished_jobs)) for job, count in job_counts.items()],
+                )
+        if watermark is not None:
+            newest_date, fingerprints = watermark
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO pending_watermarks (url, newest_date, fingerprints) VALUES (?, ?, ?)",
+                    (url, newest_date.isoformat(), json.dumps(sorted(fingerprints))),
+                )
+
+    def mark_done(self, url, jobs=()):
+        # 途中のウォーターマーク候補があれば、完了と同時に確定させる（jobs のジョブも完了にする）
+        with self._lock, self._conn:
+            self._conn.executemany(
+                """
+                INSERT INTO job_progress (url, job, finished) VALUES (?, ?, 1)
+                ON CONFLICT(url, job) DO UPDATE SET finished = 1
+                """,
+                [(url, job) for job in jobs],
+            )
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO watermarks (url, newest_date, fingerprints, updated_at)
+                SELECT url, newest_date, fingerprints, ? FROM pending_watermarks WHERE url = ?
+                """,
+                (_now(), url),
+            )
+            self._conn.execute("DELETE FROM pending_watermarks WHERE url = ?", (url,))
+            self._conn.execute("DELETE FROM dead_letters WHERE url = ?", (url,))
+        self._set_status(url, DONE)
+
+    def mark_failed(self, url, page_url=None, reason=None):
+        # 失敗したレストランは完了扱いにせず、次回の実行で続きから再試行する
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT INTO dead_letters (url, page_url, reason, failed_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT(url) DO UPDATE SET
+                    page_url = excluded.page_url,
+                    reason = excluded.reason,
+                    failures = failures + 1,
+                    failed_at = excluded.failed_at
+                """,
+                (url, page_url, reason, _now()),
+            )
+        self._set_status(url, FAILED)
+
+    def dead_letters(self):
+        # 取得に失敗したままのレストラン（失敗した順）
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT url, page_url, reason, failures, failed_at FROM dead_letters ORDER BY failed_at, url"
+            ).fetchall()
+        return [
+            {"url": url, "page_url": page_url, "reason": reason, "failures": failures, "failed_at": failed_at}
+            for url, page_url, reason, failures, failed_at in rows
+        ]
+
+    def reset(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM restaurants")
+            self._conn.execute("DELETE FROM watermarks")
+            self._conn.execute("DELETE FROM pending_watermarks")
+            self._conn.execute("DELETE FROM dead_letters")
+            self._conn.execute("DELETE FROM job_progress")
+
+    def restart_finished(self):
+        # 差分クロールの開始時に呼ぶ。完了済みのレストランを未着手に戻す（途中のものは続きから再開）
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM job_progress WHERE url IN (SELECT url FROM restaurants WHERE status = ?)", (DONE,)
+            )
+            self._conn.execute(
+                """
+                UPDATE restaurants SET status = ?, last_page = 0, reviews_written = 0, updated_at = ?
+                WHERE status = ?
+                """,
+                (PENDING, _now(), DONE),
+            )
+
+    def has_progress(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM restaurants").fetchone()[0] > 0
+
+    def summary(self):
+        # ステータスごとのレストラン数
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM restaurants GROUP BY status").fetchall()
+        return dict(rows)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _upsert(self, url, restaurant_name, page_no, reviews_written, status):
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT INTO restaurants (url, restaurant_name, last_page, reviews_written, status, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(url) DO UPDATE SET
+                    restaurant_name = excluded.restaurant_name,
+                    last_page = excluded.last_page,
+                    reviews_written = excluded.reviews_written,
+                    status = excluded.status,
+                    updated_at = excluded.updated_at
+                """,
+                (url, restaurant_name, page_no, reviews_written, status, _now()),
+            )
+
+    def _get_watermark(self, table, url):
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT newest_date, fingerprints FROM {table} WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        return datetime.fromisoformat(row[0]), set(json.loads(row[1]))
+
+    def _set_status(self, url, status):
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT INTO restaurants (url, status, updated_at) VALUES (?, ?, ?)
+                ON CONFLICT(url) DO UPDATE SET status = excluded.status, updated_at = excluded.updated_at
+                """,
+                (url, status, _now()),
+            )
+
+
+def review_fingerprint(user_name, date):
+    # 同じ日に投稿された口コミを区別するための指紋（ユーザー名と投稿日から作る）
+    return hashlib.sha1(f"{user_name}\t{date}".encode("utf-8")).hexdigest()[:16]
+
+
+def _now():
+    return datetime.now().isoformat(timespec="seconds")
@@ -1,278 +1,453 @@
+import argparse
 import csv
-import time
-import re
+import os
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import ExitStack
+from dataclasses import replace
 from datetime import datetime
+from functools import partial
 from urllib.parse import urljoin
 import requests
-from bs4 import BeautifulSoup
+from crawl_jobs import CrawlJob, box_filter, load_jobs, override_jobs, schedule
+from crawl_metrics import METRICS_FILE, CrawlMetrics, format_summary
+from crawl_state import DONE, CrawlState, review_fingerprint
+from http_fetcher import CONNECT_TIMEOUT, MAX_RETRIES, READ_TIMEOUT, Fetcher, RetryPolicy, make_session
+from page_cache import PageCache
+from pipeline import ParsePool, ReviewWriter
+from rate_limiter import HostRateLimiter
+from review_ids import COMMENT_FIELDS, ID_FIELDS, restaurant_id, review_id
+from review_parser import BACKENDS, DEFAULT_BACKEND, UNKNOWN
 
-UNKNOWN = "Unknown"
+# 既定のジョブ（--jobs を指定しない場合に、URL_FILE のレストランを取得して OUTPUT_FILE に保存する）の条件
 MAX_REVIEWS = 10
+# 取得する口コミの投稿日の範囲（差分クロールではウォーターマークが下限になるため、既定では指定しない）
+DATE_FROM = datetime(2024, 1, 1)
+DATE_TO = datetime(2024, 12, 31)
+MAX_WORKERS = 4  # 同時に処理するレストラン数
+PARSE_WORKERS = os.cpu_count() or 1  # HTMLを解析するプロセス数（0ならワーカースレッド内で解析）
+REQUEST_RATE = 0.4  # 全ワーカー合計で1秒あたりに送るリクエスト数（従来の2.5秒間隔に相当）
+REQUEST_BURST = 1  # 瞬間的に許可するリクエスト数
+URL_FILE = "restaurant_urls.csv"
+OUTPUT_FILE = "ozmall_reviews_10.csv"
+STATE_FILE = "crawl_state.sqlite"  # 中断・再開用のクロール進捗
+CACHE_DIR = "page_cache"  # 取得済みHTMLのキャッシュ
+FIELDNAMES = ID_FIELDS + [
+    "restaurant_name",
+    "user_name",
+    "age_gender",
+    "usage_count",
+    "date",
+    "purpose",
+    "overall_score",
+    "plan_score",
+    "atmosphere_score",
+    "food_score",
+    "cost_performance_score",
+    "service_score",
+    "plan_menu",
+    "comment_food_drink",
+    "comment_atmosphere_service",
+    "comment_reactions",
+]
 
-# CSVファイルからレストランのURLを正しく抽出する
-restaurant_urls = []
-with open("restaurant_urls.csv", "r", encoding="utf-8-sig") as csvfile:
-    reader = csv.reader(csvfile)
-    for row in reader:
-        # 行が2つ以上の要素（レストラン名, URL）を持つ場合
-        if len(row) >= 2:
-            url = row[1].strip().replace("/afternoontea/", "/review/")
-            restaurant_urls.append(url)
+
+def _read_header(path):
+    with open(path, "r", newline="", encoding="utf-8-sig") as f:
+        return next(csv.reader(f), None) or FIELDNAMES
+
+
+# 1ページ分のHTMLを取得し、(ステータスコード, HTML) を返す
+# レートリミッタ・タイムアウト・一時的なエラーの再試行は fetcher（http_fetcher.Fetcher）が扱う
+def fetch_page(fetcher, cache, offline, PAGE_URL):
+    metrics = fetcher.metrics or CrawlMetrics()
+    if offline:
+        # キャッシュからの再生モード：ネットワークにもレートリミッタにも触れない
+        html = cache.load(PAGE_URL)
+        if html is None:
+            return None, None
+        metrics.record_cache_hit(PAGE_URL)
+        return 200, html
+
+    # キャッシュがあれば条件付きGETを送り、変更がなければ(304)キャッシュを使う
+    headers = cache.conditional_headers(PAGE_URL) if cache else {}
+    response = fetcher.get(PAGE_URL, headers)
+    if response.status_code == 304:
+        html = cache.load(PAGE_URL)
+        if html is not None:
+            metrics.record_cache_hit(PAGE_URL, 304)
+            return 200, html
+        # 直前にキャッシュが消えた場合は通常のGETで取り直す
+        response = fetcher.get(PAGE_URL)
+    if response.status_code == 200 and cache:
+        cache.store(PAGE_URL, response.text, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+    return response.status_code, response.text
+
+
+# 1レストラン分の口コミを取得する（複数のワーカースレッドから並行して呼ばれる）
+# fetch でHTMLを取得し、parse で解析（プロセスプール）、結果は output（書き込みスレッド）に渡す
+# jobs はこのレストランを対象とするジョブ（crawl_jobs.CrawlJob）のリストで、ページは1回だけ取得し、
+# 各口コミをジョブごとの条件（投稿日の範囲・件数の上限・利用プラン）で振り分ける
+# 全てのジョブが条件を満たし終えた（下限の投稿日または件数の上限に達した）時点で次のレストランへ移る
+# incremental=True のときは、前回までに取得済みの口コミ（ウォーターマーク）に達した時点で打ち切る
+# metrics（CrawlMetrics）には、ページごとの採用・除外した口コミ数を記録する
+def crawl_restaurant(fetch, parse, state, URL, output, jobs, incremental=False, metrics=None):
+    metrics = metrics or CrawlMetrics()
+    progress = state.get(URL)
+    job_progress = state.get_job_progress(URL)
+    if not job_progress and progress and len(jobs) == 1:
+        # ジョブごとの記録がない（以前の形式の）進捗は、単一のジョブのものとして引き継ぐ
+        job_progress = {
+            jobs[0].name: {"reviews_written": progress["reviews_written"], "finished": progress["status"] == DONE}
+        }
+    # 前回までに条件を満たし終えたジョブは除く
+    jobs = [job for job in jobs if not job_progress.get(job.name, {}).get("finished")]
+    if not jobs:
+        print(f"Skipping finished restaurant URL: {URL}")
+        return
+    print(f"Processing restaurant URL: {URL}")
+    # ページ番号の初期化（前回の続きがあれば、書き込み済みページの次から再開）
+    # 新しく加わったジョブがあれば、そのジョブのために先頭ページから取得し直す
+    if progress and progress["last_page"] > 0 and all(job.name in job_progress for job in jobs):
+        PAGE_NO = progress["last_page"] + 1
+        REVIEW_COUNTS = {job.name: job_progress[job.name]["reviews_written"] for job in jobs}
+        RESTAURANT_NAME = progress["restaurant_name"] or UNKNOWN
+        print(f"  Resuming from page {PAGE_NO} ({sum(REVIEW_COUNTS.values())} reviews already written)")
+        WATERMARK_CANDIDATE = state.get_pending_watermark(URL)
+    else:
+        PAGE_NO = 1
+        REVIEW_COUNTS = {job.name: 0 for job in jobs}
+        RESTAURANT_NAME = UNKNOWN
+        WATERMARK_CANDIDATE = None
+    all_jobs = [job.name for job in jobs]
+    RESTAURANT_ID = restaurant_id(URL)
+    # 件数の上限に達しているジョブは完了扱いにする
+    jobs = [job for job in jobs if job.max_reviews is None or REVIEW_COUNTS[job.name] < job.max_reviews]
+    if not jobs:
+        output.mark_done(URL, all_jobs)
+        return
+    # 前回までに確定したウォーターマーク（差分クロールの打ち切り条件）と、今回更新する候補
+    WATERMARK = state.get_watermark(URL)
+    if WATERMARK_CANDIDATE is None:
+        WATERMARK_CANDIDATE = WATERMARK
+    GOTO_NEXT_RESTAURANT = False
+    while not GOTO_NEXT_RESTAURANT:
+        # ページURLの構築
+        if PAGE_NO == 1:
+            PAGE_URL = URL  # 最初のページは基本URL
         else:
-            # 要素が1つだけの場合はそのまま利用
-            restaurant_urls.append(row[0].strip().replace("/afternoontea/", "/review/"))
-
-# CSVファイルに保存するための準備
-with open("ozmall_reviews_10.csv", "w", newline="", encoding="utf-8-sig") as csvfile:
-    fieldnames = [
-        "restaurant_name",
-        "user_name",
-        "age_gender",
-        "usage_count",
-        "date",
-        "purpose",
-        "overall_score",
-        "plan_score",
-        "atmosphere_score",
-        "food_score",
-        "cost_performance_score",
-        "service_score",
-        "plan_menu",
-        "comment_food_drink",
-        "comment_atmosphere_service",
-        "comment_reactions",
-    ]
-    writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-    writer.writeheader()
-
-    # セッションの設定（リトライやヘッダーの統一に役立ちます）
-    session = requests.Session()
-    session.headers.update({"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"})
-
-    for URL in restaurant_urls:
+            # ページURLに?pageNo=2#resultのように追加
+            PAGE_URL = urljoin(URL, f"?pageNo={PAGE_NO}#result")
+
+        print(f"  Processing page {PAGE_NO}: {PAGE_URL}")
+
+        # HTTPリクエストを送信（キャッシュ・レートリミッタ・再試行は fetch_page 側で扱う）
         try:
-            print(f"Processing restaurant URL: {URL}")
-            # ページ番号の初期化
-            PAGE_NO = 1
-            REVIEW_COUNT = 0
-            RESTAURANT_NAME = UNKNOWN
-            GOTO_NEXT_RESTAURANT = False
-            while not GOTO_NEXT_RESTAURANT:
-                # ページURLの構築
-                if PAGE_NO == 1:
-                    PAGE_URL = URL  # 最初のページは基本URL
-                else:
-                    # ページURLに?pageNo=2#resultのように追加
-                    PAGE_URL = urljoin(URL, f"?pageNo={PAGE_NO}#result")
-
-                print(f"  Processing page {PAGE_NO}: {PAGE_URL}")
-
-                # HTTPリクエストを送信
-                response = session.get(PAGE_URL)
-                if response.status_code != 200:
-                    print(f"    Failed to retrieve {PAGE_URL}: Status code {response.status_code}")
-                    break  # 次のレストランへ移行
-
-                # HTMLを解析
-                soup = BeautifulSoup(response.text, "html.parser")
-
-                # レストラン名の取得（最初のページのみ）
-                if PAGE_NO == 1:
-                    restaurant_name_tag = soup.find("div", class_="shop-name")
-                    if restaurant_name_tag:
-                        h1_tag = restaurant_name_tag.find("h1")
-                        if h1_tag:
-                            a_tag = h1_tag.find("a")
-                            if a_tag:
-                                # レストラン名の抽出（スパン以降を除去）
-                                RESTAURANT_NAME = a_tag.get_text(strip=True).split("[")[0]
-                            else:
-                                RESTAURANT_NAME = UNKNOWN
-                        else:
-                            RESTAURANT_NAME = UNKNOWN
-                    else:
-                        RESTAURANT_NAME = UNKNOWN
-
-                # 口コミ一覧の取得
-                review_lists = soup.find_all("div", class_="review__list")
-                if not review_lists:
-                    print(f"    No reviews found on {PAGE_URL}")
-                    break  # レビューがない場合、次のレストランへ
-
-                # `review__list` の中から `common-frame` を含まないものを選択
-                for review_list in review_lists:
-                    classes = review_list.get("class", [])
-                    if "common-frame" in classes:
-                        continue
-
-                    # 口コミボックスの取得（10件）
-                    review_boxes = review_list.find_all("div", class_="review__list--box", limit=10)
-                    if not review_boxes:
-                        print(f"    No review boxes found on {PAGE_URL}")
-                        continue  # 次の `review__list` へ
-
-                    for review_box in review_boxes:
-                        # ユーザー情報の取得
-                        user_info = review_box.find("div", class_="review__list--box__cell")
-                        if user_info:
-                            user_name_tag = user_info.find("div", class_="review__list--box__user")
-                            if user_name_tag:
-                                p_tags = user_name_tag.find_all("p")
-                                USER_NAME = p_tags[0].get_text(strip=True) if len(p_tags) > 0 else UNKNOWN
-                                AGE_GENDER = p_tags[1].get_text(strip=True) if len(p_tags) > 1 else UNKNOWN
-                            else:
-                                USER_NAME = UNKNOWN
-                                AGE_GENDER = UNKNOWN
-
-                            # ユーザー詳細データの取得
-                            user_data = user_info.find("dl", class_="review__list--box__user-data")
-                            if user_data:
-                                dt_tags = user_data.find_all("dt")
-                                dd_tags = user_data.find_all("dd")
-                                user_data_dict = {
-                                    dt.get_text(strip=True): dd.get_text(strip=True) for dt, dd in zip(dt_tags, dd_tags)
-                                }
-                                USAGE_COUNT = user_data_dict.get("利用人数", UNKNOWN)
-                                DATE = user_data_dict.get("投稿日", UNKNOWN)
-                                PURPOSE = user_data_dict.get("利用目的", UNKNOWN)
-                            else:
-                                USAGE_COUNT = UNKNOWN
-                                DATE = UNKNOWN
-                                PURPOSE = UNKNOWN
-                        else:
-                            USER_NAME = UNKNOWN
-                            AGE_GENDER = UNKNOWN
-                            USAGE_COUNT = UNKNOWN
-                            DATE = UNKNOWN
-                            PURPOSE = UNKNOWN
-
-                        # 口コミは新しい順に取得される
-                        # 取得したい口コミは2023年10月から2024年10月までのもの
-                        date_obj = datetime.strptime(DATE, "%Y/%m/%d")
-                        if date_obj > datetime(2024, 12, 31):
-                            continue
-                        if date_obj < datetime(2024, 1, 1):
-                            GOTO_NEXT_RESTAURANT = True
-                            break
-
-                        # 口コミ詳細の取得
-                        review_detail = review_box.find_all("div", class_="review__list--box__cell")
-                        if len(review_detail) < 2:
-                            continue
-
-                        # 口コミのスコア部分
-                        score_section = review_detail[1].find("div", class_="review__list--box__score")
-                        if score_section:
-                            total_score_section = score_section.find("dl", class_="review__list--box__score--total")
-                            OVERALL_SCORE = (
-                                total_score_section.find("span", class_="review-totalscore").get_text(strip=True)
-                                if total_score_section
-                                else UNKNOWN
-                            )
-
-                            category_scores = score_section.find_all(
-                                "dl", class_="review__list--box__score--categoryScore"
-                            )
-                            scores = {
-                                category.find("dt")
-                                .get_text(strip=True): category.find("dd", class_="score")
-                                .get_text(strip=True)
-                                for category in category_scores
-                            }
-                            PLAN_SCORE = scores.get("プラン", UNKNOWN)
-                            ATMOSPHERE_SCORE = scores.get("雰囲気", UNKNOWN)
-                            FOOD_SCORE = scores.get("料理", UNKNOWN)
-                            COST_PERFORMANCE_SCORE = scores.get("コスパ", UNKNOWN)
-                            SERVICE_SCORE = scores.get("サービス", UNKNOWN)
-                        else:
-                            OVERALL_SCORE = UNKNOWN
-                            PLAN_SCORE = UNKNOWN
-                            ATMOSPHERE_SCORE = UNKNOWN
-                            FOOD_SCORE = UNKNOWN
-                            COST_PERFORMANCE_SCORE = UNKNOWN
-                            SERVICE_SCORE = UNKNOWN
-
-                        # 利用プラン情報の取得
-                        plan_section = review_detail[1].find("div", class_="review__list--box__plan--text")
-                        PLAN_MENU = (
-                            plan_section.find("p", class_="review__list--box__plan--menu").get_text(strip=True)
-                            if plan_section and plan_section.find("p", class_="review__list--box__plan--menu")
-                            else UNKNOWN
-                        )
-                        # "Afternoon", "アフタヌーン"が含まれるものを抽出
-                        if "Afternoon" not in PLAN_MENU and "アフタヌーン" not in PLAN_MENU:
-                            continue
-
-                        # コメントの取得
-                        comments = review_detail[1].find_all("dl", class_="review__list--box__comment")
-                        COMMENT_FOOD_DRINK = COMMENT_ATMOSPHERE_SERVICE = COMMENT_REACTIONS = UNKNOWN
-                        for comment in comments:
-                            heading = comment.find("dt", class_="review__list--box__comment--heading").get_text(strip=True)
-                            content = comment.find("dd").get_text(strip=True)
-                            if heading == "食事やドリンクについて":
-                                COMMENT_FOOD_DRINK = content
-                            elif heading == "店の雰囲気やサービスについて":
-                                COMMENT_ATMOSPHERE_SERVICE = content
-                            elif heading == "一緒に行った相手の反応について":
-                                COMMENT_REACTIONS = content
-                        if COMMENT_FOOD_DRINK == UNKNOWN or COMMENT_ATMOSPHERE_SERVICE == UNKNOWN:
-                            continue
-
-                        # データの書き込み
-                        writer.writerow(
-                            {
-                                "restaurant_name": RESTAURANT_NAME,
-                                "user_name": USER_NAME,
-                                "age_gender": AGE_GENDER,
-                                "usage_count": USAGE_COUNT,
-                                "date": DATE,
-                                "purpose": PURPOSE,
-                                "overall_score": OVERALL_SCORE,
-                                "plan_score": PLAN_SCORE,
-                                "atmosphere_score": ATMOSPHERE_SCORE,
-                                "food_score": FOOD_SCORE,
-                                "cost_performance_score": COST_PERFORMANCE_SCORE,
-                                "service_score": SERVICE_SCORE,
-                                "plan_menu": PLAN_MENU,
-                                "comment_food_drink": COMMENT_FOOD_DRINK,
-                                "comment_atmosphere_service": COMMENT_ATMOSPHERE_SERVICE,
-                                "comment_reactions": COMMENT_REACTIONS,
-                            }
-                        )
-                        REVIEW_COUNT += 1
-                        if REVIEW_COUNT >= MAX_REVIEWS:
-                            GOTO_NEXT_RESTAURANT = True
-                            break
-
-                    if GOTO_NEXT_RESTAURANT:
-                        break
-
-                # ページネーションの確認
-                pager = soup.find("div", class_="pager")
-                if pager:
-                    pager_count = pager.find("ul", class_="pager__count")
-                    if pager_count:
-                        page_links = pager_count.find_all("a")
-                        page_numbers = [
-                            int(re.search(r"pageNo=(\d+)", link.get("href", "")).group(1))
-                            for link in page_links
-                            if re.search(r"pageNo=(\d+)", link.get("href", ""))
-                        ]
-                        if page_numbers and PAGE_NO < max(page_numbers):
-                            PAGE_NO += 1
-                        else:
-                            GOTO_NEXT_RESTAURANT = True  # 最後のページに到達
-                    else:
-                        GOTO_NEXT_RESTAURANT = True  # pager__countがない場合
+            status_code, html = fetch(PAGE_URL)
+        except requests.RequestException as e:
+            print(f"    Failed to retrieve {PAGE_URL}: {e}")
+            output.mark_failed(URL, PAGE_URL, str(e) or type(e).__name__)  # デッドレターに残す
+            return
+        if status_code != 200:
+            print(f"    Failed to retrieve {PAGE_URL}: Status code {status_code}")
+            # 次回の実行（または --retry-dead-letters）でこのページから再試行する
+            output.mark_failed(URL, PAGE_URL, f"HTTP {status_code}")
+            return  # 次のレストランへ移行
+
+        # HTMLを解析（どのジョブでも対象外になる口コミは、投稿日・プラン名・コメントの判定で抽出を打ち切らせる）
+        page = parse(html, PAGE_URL, box_filter(jobs))
+
+        # レストラン名の取得（最初のページのみ）
+        if PAGE_NO == 1:
+            RESTAURANT_NAME = page.restaurant_name
+
+        # 口コミ一覧の取得
+        page_rows = {job.name: [] for job in jobs}
+        filtered = {job.name: Counter() for job in jobs}  # ジョブごと・理由ごとの対象外にした口コミ数
+        finished_jobs = set()  # このページで条件を満たし終えたジョブ
+        if not page.has_review_list:
+            print(f"    No reviews found on {PAGE_URL}")
+            break  # レビューがない場合、次のレストランへ
+        if not page.reviews:
+            print(f"    No review boxes found on {PAGE_URL}")
+
+        for review in page.reviews:
+            # 口コミは新しい順に取得される
+            date_obj = datetime.strptime(review.date, "%Y/%m/%d")
+            active = [job for job in jobs if job.name not in finished_jobs]
+            in_range = []
+            for job in active:
+                if job.date_to is not None and date_obj > job.date_to:
+                    filtered[job.name]["date_window"] += 1
                 else:
-                    GOTO_NEXT_RESTAURANT = True  # pagerがない場合
+                    in_range.append(job)
+            if not in_range:
+                continue
+            fingerprint = review_fingerprint(review.user_name, review.date)
+            # 差分クロール：前回取得済みの口コミに達したら、それより古い口コミも取得済み
+            if incremental and WATERMARK:
+                watermark_date, watermark_fingerprints = WATERMARK
+                already_seen = date_obj == watermark_date and fingerprint in watermark_fingerprints
+                if date_obj < watermark_date or already_seen:
+                    for job in in_range:
+                        filtered[job.name]["already_seen"] += 1
+                    GOTO_NEXT_RESTAURANT = True
+                    break
+            # 下限の投稿日より古い口コミに達したジョブは、これ以降の口コミも対象外
+            for job in in_range:
+                if job.date_from is not None and date_obj < job.date_from:
+                    filtered[job.name]["date_window"] += 1
+                    finished_jobs.add(job.name)
+            in_range = [job for job in in_range if job.name not in finished_jobs]
+            if not in_range:
+                if len(finished_jobs) == len(jobs):
+                    GOTO_NEXT_RESTAURANT = True
+                    break
+                continue
 
-                # サーバーへの負荷を避けるために待機
-                time.sleep(2.5)
+            # 確認済みの口コミのうち最新のものをウォーターマーク候補として記録する
+            if WATERMARK_CANDIDATE is None or date_obj > WATERMARK_CANDIDATE[0]:
+                WATERMARK_CANDIDATE = (date_obj, {fingerprint})
+            elif date_obj == WATERMARK_CANDIDATE[0]:
+                WATERMARK_CANDIDATE[1].add(fingerprint)
 
-        except requests.RequestException as e:
-            print(f"Request error processing {URL}: {e}")
-            continue
-        except csv.Error as e:
-            print(f"CSV error processing {URL}: {e}")
-            continue
+            row = None
+            # 解析時に抽出を打ち切った口コミ（review.rejected）も、判定に使うプラン名・コメントは抽出されているので、
+            # ジョブごとの理由は同じ判定で求まる（どのジョブでも None にはならない）
+            for job in in_range:
+                reason = _rejection_reason(job, review)
+                if reason:
+                    filtered[job.name][reason] += 1
+                    continue
+                if row is None:
+                    # 重複を除いてまとめられるよう、口コミごとに安定したIDを付ける（review_ids.py）
+                    comments = [getattr(review, field) for field in COMMENT_FIELDS]
+                    row = {
+                        "review_id": review_id(RESTAURANT_ID, review.user_name, review.date, comments),
+                        "restaurant_id": RESTAURANT_ID,
+                        **review.to_row(RESTAURANT_NAME),
+                    }
+                # データの書き込み（書き込み自体はページ単位でまとめて行う）
+                page_rows[job.name].append(row)
+                REVIEW_COUNTS[job.name] += 1
+                if job.max_reviews is not None and REVIEW_COUNTS[job.name] >= job.max_reviews:
+                    finished_jobs.add(job.name)
+            if len(finished_jobs) == len(jobs):
+                GOTO_NEXT_RESTAURANT = True
+                break
+
+        # ページ単位で書き込み、書き込み済みのページ番号を記録する
+        metrics.record_page(
+            URL,
+            PAGE_NO,
+            sum(len(rows) for rows in page_rows.values()),
+            sum(filtered.values(), Counter()),
+            {job.name: {"kept": len(page_rows[job.name]), "filtered": dict(filtered[job.name])} for job in jobs},
+        )
+        output.write_page(URL, RESTAURANT_NAME, PAGE_NO, page_rows, REVIEW_COUNTS, WATERMARK_CANDIDATE, finished_jobs)
+        jobs = [job for job in jobs if job.name not in finished_jobs]
+
+        # ページネーションの確認
+        if page.max_page is not None and PAGE_NO < page.max_page:
+            PAGE_NO += 1
+        else:
+            GOTO_NEXT_RESTAURANT = True  # 最後のページに到達、またはページャーがない場合
+
+    output.mark_done(URL, all_jobs)
+
+
+# 口コミをジョブの対象外にする理由（採用する場合は None）
+def _rejection_reason(job, review):
+    # 口コミ詳細がないものは対象外
+    if not review.has_detail:
+        return "no_detail"
+    # ジョブのキーワード（"Afternoon", "アフタヌーン"など）が利用プランに含まれるものを抽出
+    if not job.plan_matches(review.plan_menu):
+        return "plan"
+    # 料理と雰囲気・サービスのコメントが揃っているものだけを使う
+    if job.require_comments and (
+        review.comment_food_drink == UNKNOWN or review.comment_atmosphere_service == UNKNOWN
+    ):
+        return "missing_comment"
+    return None
+
+
+def _parse_date(value):
+    return datetime.strptime(value, "%Y-%m-%d")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="オズモールの口コミを取得してCSVに保存します。")
+    parser.add_argument("--fresh", action="store_true", help="前回の進捗を破棄して最初からクロールする")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="前回までに取得済みの口コミに達したら打ち切り、新しい口コミだけをCSVに追記する",
+    )
+    parser.add_argument("--date-from", type=_parse_date, help="取得する口コミの投稿日の下限 (YYYY-MM-DD)")
+    parser.add_argument("--date-to", type=_parse_date, help="取得する口コミの投稿日の上限 (YYYY-MM-DD)")
+    parser.add_argument("--max-reviews", type=int, help="レストランごとに書き込む口コミの上限")
+    parser.add_argument(
+        "--jobs", metavar="CONFIG", help="複数のURLリストとリストごとの条件を書いたジョブの設定（crawl_jobs.json）"
+    )
+    parser.add_argument("--job", action="append", metavar="NAME", help="設定のうち、指定したジョブだけを実行する")
+    parser.add_argument("--parser", choices=BACKENDS, default=DEFAULT_BACKEND, help="HTMLの解析に使うバックエンド")
+    parser.add_argument("--workers", type=int, help=f"同時に処理するレストラン数（既定: {MAX_WORKERS}）")
+    parser.add_argument(
+        "--parse-workers", type=int, default=PARSE_WORKERS, help="HTMLを解析するプロセス数（0ならスレッド内で解析）"
+    )
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="HTMLキャッシュの保存先")
+    parser.add_argument("--no-cache", action="store_true", help="HTMLキャッシュを使わない")
+    parser.add_argument(
+        "--offline", action="store_true", help="ネットワークに接続せず、キャッシュ済みのHTMLだけで再解析する"
+    )
+    parser.add_argument(
+        "--pool-size", type=int, help="HTTPのコネクションプールの大きさ（既定: 同時に処理するレストラン数）"
+    )
+    parser.add_argument("--connect-timeout", type=float, default=CONNECT_TIMEOUT, help="接続のタイムアウト（秒）")
+    parser.add_argument("--read-timeout", type=float, default=READ_TIMEOUT, help="応答の読み込みのタイムアウト（秒）")
+    parser.add_argument(
+        "--max-retries", type=int, default=MAX_RETRIES, help="一時的なエラー（429・5xx・接続エラー）の再試行回数"
+    )
+    parser.add_argument(
+        "--retry-dead-letters", action="store_true", help="前回までに取得に失敗したレストランだけを取得し直す"
+    )
+    parser.add_argument("--metrics-file", default=METRICS_FILE, help="計測ログ（JSON-lines）の出力先")
+    parser.add_argument("--no-metrics", action="store_true", help="計測ログを書き出さない（集計の表示は行う）")
+    args = parser.parse_args()
+    if args.offline and args.no_cache:
+        parser.error("--offline と --no-cache は同時に指定できません。")
+    if args.incremental and (args.fresh or args.offline):
+        parser.error("--incremental は --fresh / --offline と同時に指定できません。")
+    if args.retry_dead_letters and (args.fresh or args.offline):
+        parser.error("--retry-dead-letters は --fresh / --offline と同時に指定できません。")
+
+    if args.jobs:
+        jobs = load_jobs(args.jobs)
+        if args.job:
+            unknown = set(args.job) - {job.name for job in jobs}
+            if unknown:
+                parser.error(f"設定にないジョブです: {sorted(unknown)}")
+            jobs = [job for job in jobs if job.name in args.job]
+    else:
+        jobs = [
+            CrawlJob("default", URL_FILE, OUTPUT_FILE, date_from=DATE_FROM, date_to=DATE_TO, max_reviews=MAX_REVIEWS)
+        ]
+    # 差分クロールでは、明示されない限り日付範囲と件数の上限を使わない（明示された条件は全ジョブに適用する）
+    if args.incremental:
+        jobs = [
+            replace(job, date_from=args.date_from, date_to=args.date_to, max_reviews=args.max_reviews) for job in jobs
+        ]
+    else:
+        jobs = override_jobs(jobs, date_from=args.date_from, date_to=args.date_to, max_reviews=args.max_reviews)
+
+    # 全ジョブのレストランを優先度順に並べ、複数のリストに載っているレストランは1回だけ取得する
+    tasks = schedule(jobs)
+    print(f"{len(jobs)} jobs, {len(tasks)} restaurants")
+
+    cache = None if args.no_cache else PageCache(args.cache_dir)
+    # 再生モードは数秒で終わるため進捗は保存せず、毎回最初から出力し直す
+    state = CrawlState(":memory:" if args.offline else STATE_FILE)
+    if args.fresh:
+        state.reset()
+    if args.incremental:
+        # 完了済みのレストランも先頭ページから見直す（中断中のものは続きから）
+        state.restart_finished()
+    if args.retry_dead_letters:
+        # 失敗したレストランだけを、失敗したページから取得し直す
+        dead_urls = {dead_letter["url"] for dead_letter in state.dead_letters()}
+        tasks = [(URL, task_jobs) for URL, task_jobs in tasks if URL in dead_urls]
+        print(f"Retrying {len(tasks)} dead-lettered restaurants")
+    if state.has_progress():
+        print(f"Resuming crawl: {state.summary()}")
+
+    # CSVファイルに保存するための準備（ジョブごとの出力先）
+    with ExitStack() as stack:
+        outputs = {}
+        for job in jobs:
+            # 進捗が残っていれば既存のCSVに追記し、なければ新規作成する
+            resume = (state.has_progress() or args.incremental) and os.path.exists(job.output)
+            # 以前の形式（口コミIDなし）のCSVに追記する場合は、そのCSVのカラムに合わせる
+            fieldnames = _read_header(job.output) if resume else FIELDNAMES
+            csvfile = stack.enter_context(open(job.output, "a" if resume else "w", newline="", encoding="utf-8-sig"))
+            writer = csv.DictWriter(csvfile, fieldnames=fieldnames, extrasaction="ignore")
+            if not resume:
+                writer.writeheader()
+            outputs[job.name] = (writer, csvfile)
+        # 書き込みは専用スレッド1つに任せる
+        output = ReviewWriter(outputs, state)
+        # 再生モードは待ち時間がないため、解析プロセスが遊ばないよう取得側のスレッドを増やす
+        workers = args.workers or (max(MAX_WORKERS, args.parse_workers * 2) if args.offline else MAX_WORKERS)
+        # 計測ログには、並列数や送信レートなどの設定も一緒に残す（チューニングの比較用）
+        metrics = CrawlMetrics(
+            None if args.no_metrics else args.metrics_file,
+            workers=workers,
+            parse_workers=args.parse_workers,
+            parser=args.parser,
+            request_rate=REQUEST_RATE,
+            request_burst=REQUEST_BURST,
+            pool_size=args.pool_size or workers,
+            max_retries=args.max_retries,
+            offline=args.offline,
+            incremental=args.incremental,
+            jobs=[job.name for job in jobs],
+        )
+        parse_pool = ParsePool(args.parse_workers, backend=args.parser, metrics=metrics)
+
+        # セッションの設定（既定ではワーカー数に合わせてコネクションプールを確保）
+        session = make_session(args.pool_size or workers)
+
+        # サーバーへの負荷を避けるため、全ワーカーで1つのレートリミッタを共有する（再試行もこれを通す）
+        limiter = HostRateLimiter(REQUEST_RATE, REQUEST_BURST)
+        fetcher = Fetcher(
+            session,
+            limiter,
+            RetryPolicy(max_retries=args.max_retries),
+            timeout=(args.connect_timeout, args.read_timeout),
+            metrics=metrics,
+        )
+        fetch = partial(fetch_page, fetcher, cache, args.offline)
+
+        # 投入した順（優先度順）にワーカーが取り出すので、優先度の高いジョブのレストランから処理される
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(
+                    crawl_restaurant,
+                    fetch,
+                    parse_pool.parse,
+                    state,
+                    URL,
+                    output,
+                    task_jobs,
+                    incremental=args.incremental,
+                    metrics=metrics,
+                ): URL
+                for URL, task_jobs in tasks
+            }
+            for future in as_completed(futures):
+                URL = futures[future]
+                try:
+                    future.result()
+                except requests.RequestException as e:
+                    print(f"Request error processing {URL}: {e}")
+                except csv.Error as e:
+                    print(f"CSV error processing {URL}: {e}")
+
+        # 積まれた書き込みをすべて終えてから閉じる
+        parse_pool.close()
+        output.close()
+
+    print(f"Crawl finished: {state.summary()}")
+    print(format_summary(metrics.close()))
+    dead_letters = state.dead_letters()
+    if dead_letters:
+        print(f"{len(dead_letters)} restaurants failed (retry with --retry-dead-letters):")
+        for dead_letter in dead_letters:
+            print(f"  {dead_letter['page_url'] or dead_letter['url']}: {dead_letter['reason']}")
+    state.close()
+    if cache:
+        cache.close()
+
+
+if __name__ == "__main__":
+    main()
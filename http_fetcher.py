@@ -0,0 +1,139 @@
+import random
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"
+CONNECT_TIMEOUT = 10  # 接続のタイムアウト（秒）
+READ_TIMEOUT = 30  # 応答の読み込みのタイムアウト（秒）
+MAX_RETRIES = 5  # 1ページあたりの再試行の上限（初回を含まない）
+BACKOFF_BASE = 1.0  # 再試行の待ち時間の基準（秒、再試行ごとに2倍）
+BACKOFF_MAX = 60.0  # 待ち時間の上限（秒）
+RETRY_AFTER_MAX = 600.0  # Retry-After に従って待つ時間の上限（秒）
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})  # 一時的なエラーとして再試行するステータスコード
+
+
+class FetchError(requests.RequestException):
+    """再試行しても接続・読み込みに失敗したリクエスト"""
+
+    def __init__(self, url, attempts, error):
+        super().__init__(f"{attempts}回試行して失敗しました ({type(error).__name__}: {error})")
+        self.url = url
+        self.attempts = attempts
+        self.error = error
+
+
+def make_session(pool_size):
+    """コネクションプールの大きさを pool_size にしたセッション（再試行は Fetcher が行う）"""
+    session = requests.Session()
+    session.headers.update({"User-Agent": USER_AGENT})
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def parse_retry_after(value, now=None):
+    """Retry-After ヘッダー（秒数または日時）を待ち時間の秒数にする（解釈できなければ None）"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - (now or datetime.now(timezone.utc))).total_seconds())
+
+
+class RetryPolicy:
+    """
+    再試行の方針。待ち時間は指数バックオフにフルジッター（0〜上限の一様乱数）をかけたもので、
+    サーバーが Retry-After を返した場合は、少なくともその時間は待つ。
+    """
+
+    def __init__(
+        self,
+        max_retries=MAX_RETRIES,
+        backoff_base=BACKOFF_BASE,
+        backoff_max=BACKOFF_MAX,
+        retry_statuses=RETRY_STATUSES,
+        retry_after_max=RETRY_AFTER_MAX,
+    ):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_statuses = frozenset(retry_statuses)
+        self.retry_after_max = retry_after_max
+
+    def should_retry(self, status):
+        return status in self.retry_statuses
+
+    def delay(self, attempt, retry_after=None):
+        """attempt 回目（1から）の再試行の前に待つ秒数"""
+        backoff = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+        if retry_after is None:
+            return backoff
+        return max(backoff, min(retry_after, self.retry_after_max))
+
+
+class Fetcher:
+    """
+    レートリミッタ・タイムアウト・再試行付きでGETを送る（複数のワーカースレッドで共有する）。
+    一時的なエラー（RETRY_STATUSES のステータスコード、接続エラー、タイムアウト）は待ってから送り直し、
+    再試行しても成功しなければ最後の応答を返す（接続できなかった場合は FetchError を送出する）。
+    metrics（CrawlMetrics）を渡すと、送ったリクエストと再試行を記録する。
+    """
+
+    def __init__(
+        self,
+        session,
+        limiter,
+        policy=None,
+        timeout=(CONNECT_TIMEOUT, READ_TIMEOUT),
+        metrics=None,
+        sleep=time.sleep,
+    ):
+        self.session = session
+        self.limiter = limiter
+        self.policy = policy or RetryPolicy()
+        self.timeout = timeout
+        self.metrics = metrics
+        self._sleep = sleep
+
+    def _send(self, url, headers):
+        start = time.monotonic()
+        self.limiter.acquire(url)
+        sent = time.monotonic()
+        response = self.session.get(url, headers=headers, timeout=self.timeout)
+        if self.metrics is not None:
+            self.metrics.record_request(
+                url, response.status_code, time.monotonic() - sent, len(response.content), wait=sent - start
+            )
+        return response
+
+    def get(self, url, headers=None):
+        attempt = 0
+        while True:
+            try:
+                response = self._send(url, headers)
+            except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+                if attempt >= self.policy.max_retries:
+                    raise FetchError(url, attempt + 1, e) from e
+                reason, retry_after = type(e).__name__, None
+            else:
+                if not self.policy.should_retry(response.status_code) or attempt >= self.policy.max_retries:
+                    return response
+                reason = response.status_code
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            attempt += 1
+            delay = self.policy.delay(attempt, retry_after)
+            if self.metrics is not None:
+                self.metrics.record_retry(url, reason, attempt, delay)
+            self._sleep(delay)
@@ -0,0 +1,198 @@
+import argparse
+import os
+from array import array
+from functools import reduce
+
+import numpy as np
+
+from review_store import REVIEW_STORE
+from review_tokens import load_tokenized, token_columns
+
+# 位置情報を文書IDと1つのキーにまとめるためのシフト幅（1口コミあたりのトークン数は 2**32 未満とする）
+_POSITION_BITS = 32
+
+
+class InvertedIndex:
+    """
+    トークン → 口コミの行番号（昇順の配列）の転置インデックス。
+    出現位置も保持しているので、AND / OR 検索に加えてフレーズ（連続するトークン列）検索もできる。
+    行番号は、インデックスを作ったときのトークン列（DataFrame の行）の並び順の位置。
+
+    内部はCSR形式の配列で持つ:
+      vocabulary[t]                           : t番目のトークン
+      doc_ids[doc_ptr[t]:doc_ptr[t + 1]]      : トークン t を含む口コミの行番号（重複なし、昇順）
+      occ_docs / occ_positions[occ_ptr[t]:occ_ptr[t + 1]] : トークン t の全出現の (行番号, 位置)
+    """
+
+    def __init__(self, vocabulary, doc_ptr, doc_ids, occ_ptr, occ_docs, occ_positions, num_docs):
+        self.vocabulary = list(vocabulary)
+        self._term_ids = {token: i for i, token in enumerate(self.vocabulary)}
+        self._doc_ptr = doc_ptr
+        self._doc_ids = doc_ids
+        self._occ_ptr = occ_ptr
+        self._occ_docs = occ_docs
+        self._occ_positions = occ_positions
+        self.num_docs = num_docs
+
+    @classmethod
+    def build(cls, token_lists):
+        """
+        口コミごとのトークンのリストから、1回の走査でインデックスを作る。
+        token_lists はジェネレータでもよく、出現は4バイト整数の配列に詰めて持つので、
+        口コミをチャンクごとに読み込みながら作ればトークン列全体をメモリに保持しない。
+        """
+        term_ids = {}
+        terms, docs, positions = array("i"), array("i"), array("i")
+        num_docs = 0
+        for doc_id, tokens in enumerate(token_lists):
+            num_docs += 1
+            for position, token in enumerate(tokens):
+                terms.append(term_ids.setdefault(token, len(term_ids)))
+                docs.append(doc_id)
+                positions.append(position)
+        terms = np.frombuffer(terms, dtype=np.int32)
+        docs = np.frombuffer(docs, dtype=np.int32)
+        positions = np.frombuffer(positions, dtype=np.int32)
+
+        # トークンごとに並べ替える（安定ソートなので、同じトークン内では行番号・位置の昇順のまま）
+        order = np.argsort(terms, kind="stable")
+        terms, docs, positions = terms[order], docs[order], positions[order]
+        occ_ptr = np.searchsorted(terms, np.arange(len(term_ids) + 1)).astype(np.int64)
+
+        # 同じ口コミ内の2回目以降の出現を除いて、トークンごとの行番号リストを作る
+        first = np.ones(len(terms), dtype=bool)
+        first[1:] = (terms[1:] != terms[:-1]) | (docs[1:] != docs[:-1])
+        doc_ptr = np.searchsorted(terms[first], np.arange(len(term_ids) + 1)).astype(np.int64)
+        return cls(term_ids, doc_ptr, docs[first], occ_ptr, docs, positions, num_docs)
+
+    def __contains__(self, token):
+        return token in self._term_ids
+
+    def __len__(self):
+        return len(self.vocabulary)
+
+    def docs(self, token):
+        """トークンを含む口コミの行番号（昇順）を返す"""
+        term = self._term_ids.get(token)
+        if term is None:
+            return np.empty(0, dtype=np.int32)
+        return self._doc_ids[self._doc_ptr[term] : self._doc_ptr[term + 1]]
+
+    def document_frequency(self, token):
+        term = self._term_ids.get(token)
+        return 0 if term is None else int(self._doc_ptr[term + 1] - self._doc_ptr[term])
+
+    def term_frequency(self, token):
+        """コーパス全体での出現回数"""
+        term = self._term_ids.get(token)
+        return 0 if term is None else int(self._occ_ptr[term + 1] - self._occ_ptr[term])
+
+    def query_and(self, tokens):
+        """全てのトークンを含む口コミの行番号"""
+        postings = sorted((self.docs(token) for token in tokens), key=len)
+        if not postings:
+            return np.empty(0, dtype=np.int32)
+        # 短い行番号リストから順に絞り込む
+        return reduce(lambda a, b: np.intersect1d(a, b, assume_unique=True), postings)
+
+    def query_or(self, tokens):
+        """いずれかのトークンを含む口コミの行番号"""
+        postings = [self.docs(token) for token in tokens]
+        if not postings:
+            return np.empty(0, dtype=np.int32)
+        return np.unique(np.concatenate(postings))
+
+    def query_phrase(self, tokens):
+        """トークン列がこの順に連続して出現する口コミの行番号"""
+        tokens = list(tokens)
+        if len(tokens) <= 1:
+            return self.query_and(tokens)
+        keys = None
+        for offset, token in enumerate(tokens):
+            term = self._term_ids.get(token)
+            if term is None:
+                return np.empty(0, dtype=np.int32)
+            start, end = self._occ_ptr[term], self._occ_ptr[term + 1]
+            # フレーズの開始位置 (行番号, 位置 - offset) をキーにして、全トークンで共通するものを残す
+            starts = self._occ_positions[start:end].astype(np.int64) - offset
+            term_keys = (self._occ_docs[start:end].astype(np.int64) << _POSITION_BITS) | starts.clip(min=0)
+            term_keys = term_keys[starts >= 0]
+            keys = term_keys if keys is None else np.intersect1d(keys, term_keys)
+            if not len(keys):
+                return np.empty(0, dtype=np.int32)
+        return np.unique(keys >> _POSITION_BITS).astype(np.int32)
+
+    def save(self, path):
+        np.savez(
+            path,
+            vocabulary=np.array(self.vocabulary, dtype=str),
+            doc_ptr=self._doc_ptr,
+            doc_ids=self._doc_ids,
+            occ_ptr=self._occ_ptr,
+            occ_docs=self._occ_docs,
+            occ_positions=self._occ_positions,
+            num_docs=np.array(self.num_docs),
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(
+                data["vocabulary"].tolist(),
+                data["doc_ptr"],
+                data["doc_ids"],
+                data["occ_ptr"],
+                data["occ_docs"],
+                data["occ_positions"],
+                int(data["num_docs"]),
+            )
+
+
+def index_path(dataset, field, store_dir=REVIEW_STORE):
+    # review_store のデータセットと同じ場所に、コメント列ごとのインデックスを置く
+    return os.path.join(store_dir, f"{dataset}.{field}.index.npz")
+
+
+def build_index(dataset, field, store_dir=REVIEW_STORE):
+    """データセットのコメント列（基本形のトークン列）からインデックスを作って保存する"""
+    base_col = token_columns(field)[1]
+    df = load_tokenized(dataset, [field], columns=[], store_dir=store_dir)
+    index = InvertedIndex.build(df[base_col])
+    os.makedirs(store_dir, exist_ok=True)
+    index.save(index_path(dataset, field, store_dir))
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="口コミのトークンの転置インデックスを作成・検索します。")
+    parser.add_argument("dataset", help="review_store のデータセット名")
+    parser.add_argument("--field", default="comment_food_drink", help="インデックスを作るコメント列")
+    parser.add_argument("--store-dir", default=REVIEW_STORE, help="データセットの保存先")
+    parser.add_argument("--rebuild", action="store_true", help="保存済みのインデックスがあっても作り直す")
+    query = parser.add_mutually_exclusive_group()
+    query.add_argument("--all", nargs="+", metavar="TOKEN", help="全てのトークンを含む口コミを検索 (AND)")
+    query.add_argument("--any", nargs="+", metavar="TOKEN", help="いずれかのトークンを含む口コミを検索 (OR)")
+    query.add_argument("--phrase", nargs="+", metavar="TOKEN", help="トークン列が連続して出現する口コミを検索")
+    args = parser.parse_args()
+
+    path = index_path(args.dataset, args.field, args.store_dir)
+    if args.rebuild or not os.path.exists(path):
+        index = build_index(args.dataset, args.field, args.store_dir)
+        print(f"インデックスを '{path}' に保存しました。口コミ数: {index.num_docs}, トークン数: {len(index)}")
+    else:
+        index = InvertedIndex.load(path)
+
+    if args.all:
+        doc_ids = index.query_and(args.all)
+    elif args.any:
+        doc_ids = index.query_or(args.any)
+    elif args.phrase:
+        doc_ids = index.query_phrase(args.phrase)
+    else:
+        return
+    print(f"該当する口コミ: {len(doc_ids)}件")
+    print("行番号:", doc_ids.tolist())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,86 +1,40 @@
-import os
 import re
 import pandas as pd
-import MeCab
-from collections import Counter, defaultdict
+from collections import Counter
 import matplotlib.pyplot as plt
 import matplotlib.font_manager as fm
+from analysis_cache import AnalysisCache, dataset_path
+from cooccurrence import CooccurrenceCounts, CooccurrenceMatrix
+from review_tokens import iter_tokenized
+from partitioned_writer import PartitionedCsvWriter
+from sizzle_lexicon import load_lexicon, stored_tokens
+from term_frequency import GroupTermCounts, add_group_columns, age_sort_key
+from word_counts import WORD_COUNTS, write_word_counts
 
 
-# シズルワードリストの読み込み関数
-def load_sizzle_words(file_path, mecab):
-    sizzle_words = []
+# シズルワードリストの読み込み関数（コンパイル済みの辞書を使い、リストが変わったときだけ作り直す）
+def load_sizzle_words(file_path):
     try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            for line in f:
-                word = line.strip()
-                if word:
-                    tokens = tokenize(word, mecab)
-                    if tokens:
-                        sizzle_words.append({"word": word, "tokens": tokens})
-        print(f"シズルワードリストを '{file_path}' から読み込みました。総シズルワード数: {len(sizzle_words)}")
+        lexicon = load_lexicon(file_path)
+        print(f"シズルワードリストを '{file_path}' から読み込みました。総シズルワード数: {len(lexicon)}")
         # デバッグ用に最初の3つを表示
-        if len(sizzle_words) > 0:
-            print("サンプルシズルワード:", sizzle_words[:3])
+        if len(lexicon) > 0:
+            print("サンプルシズルワード:", lexicon.entries[:3])
     except Exception as e:
         print(f"シズルワードリストの読み込み中にエラーが発生しました: {e}")
         exit()
-    return sizzle_words
-
-
-# 前処理関数の定義
-def preprocess(text):
-    # 半角記号を除去（ただし '%' は除外）
-    text = re.sub(r'[!"#$&\'()*+,\-./:;<=>?@[\\\]^_`{|}~]', "", text)
-    # 空白の除去
-    text = re.sub(r"\s+", "", text)
-    return text
-
-
-# トークナイズ関数の定義
-def tokenize(text, mecab):
-    tokens = []
-    text = preprocess(text)
-    parsed = mecab.parse(text)
-
-    if parsed is None:
-        print("MeCabの解析結果がNoneです。")
-        return tokens
-
-    for line in parsed.splitlines():
-        if line == "EOS" or line == "":
-            break
-        try:
-            surface, feature = line.split("\t")[:2]
-            features = feature.split(",")
-            pos = features[0]  # 品詞
-            pos_sub1 = features[1]  # 品詞細分類1
-            if pos_sub1 == "固有名詞":
-                base_form = surface
-            else:
-                base_form = (
-                    features[6] if (len(features) > 6) else surface
-                )  # 基本形が存在する場合は取得、なければ表層形を使用
-            if base_form == "Afternoon tea":
-                base_form = "アフタヌーンティー"
-
-            tokens.append(base_form)
-
-        except ValueError as ve:
-            print(f"解析エラー行: {line} - {ve}")
-
-    return tokens
-
-
-# CSVファイルの読み込み
-def load_reviews(csv_path, required_columns):
+    return lexicon
+
+
+# 口コミデータの読み込み（token_fields のコメント列は計算済みのトークン列も読み込む）
+def load_reviews(dataset, required_columns, token_fields=()):
     try:
-        df = pd.read_csv(csv_path)
-        print("CSVファイルの読み込みに成功しました。")
-    except UnicodeDecodeError:
-        df = pd.read_csv(csv_path, encoding="cp932")  # 日本語Windows環境の場合
+        # 読み込みと形態素解析の結果は、口コミデータと辞書が変わっていなければ前回のものを使う
+        with AnalysisCache() as cache:
+            df = cache.load_tokenized(dataset, list(token_fields))
+        print("口コミデータの読み込みに成功しました。")
     except Exception as e:
-        print("CSVファイルの読み込み中にエラーが発生しました:", e)
+        print("口コミデータの読み込み中にエラーが発生しました:", e)
         exit()
 
     missing_columns = [col for col in required_columns if col not in df.columns]
@@ -95,203 +49,242 @@ def load_reviews(csv_path, required_columns):
     return df
 
 
-# 設定
-suffix = "70代"
-# csv_file = f"split_reviews_by_age/reviews_{suffix}.csv"
-csv_file = f"ozmall_reviews_10.csv"
-required_columns = [
-    "restaurant_name",
-    "user_name",
-    "age_gender",
-    "usage_count",
-    "date",
-    "purpose",
-    "overall_score",
-    "plan_score",
-    "atmosphere_score",
-    "food_score",
-    "cost_performance_score",
-    "service_score",
-    "plan_menu",
-    "comment_food_drink",  # 口コミのカラム名
-]
-col_name = "comment_food_drink"  # 口コミのカラム名
-sizzle_word_file = "sizzle_words.txt"  # シズルワードリストのファイル名
-# output_dir = f"split_reviews_by_age/matched_reviews_by_sizzle_{suffix}"  # 出力ディレクトリ名
-output_dir = "noun_reviews_csv_10"  # 出力ディレクトリ名
-
-# CSVからコメントを読み込む
-df = load_reviews(csv_file, required_columns)
-
-# MeCabの初期化
-try:
-    mecab = MeCab.Tagger(
-        '-d "C:/Program Files (x86)/MeCab/dic/ipadic" -u "C:/Program Files (x86)/MeCab/dic/NEologd/NEologd.20200910-u.dic"'
-    )
-except Exception as e:
-    print("MeCabの初期化中にエラーが発生しました:", e)
-    exit()
-
-# シズルワードリストの読み込み
-sizzle_words = load_sizzle_words(sizzle_word_file, mecab)
-
-# シズルワードごとのマッチした口コミを保存する辞書を初期化
-matched_comments_dict = defaultdict(list)
-for sizzle in sizzle_words:
-    matched_comments_dict[sizzle["word"]] = []
-
-# 全コメントからマッチする口コミを抽出
-for idx, row in df.iterrows():
-    comment = row[col_name]
-    if isinstance(comment, str):
-        tokens = tokenize(comment, mecab)
-
-        for sizzle in sizzle_words:
-            sizzle_word = sizzle["word"]
-            sizzle_tokens = sizzle["tokens"]
-            sizzle_len = len(sizzle_tokens)
-            if sizzle_len == 0:
-                continue
-            # リストsizzle_tokensに'*'が含まれている場合は、そのシズルワードは無視
-            if "*" in sizzle_tokens:
-                continue
-            # スライディングウィンドウでマッチング
-            for i in range(len(tokens) - sizzle_len + 1):
-                if tokens[i : i + sizzle_len] == sizzle_tokens:
-                    # print(f"シズルワード '{sizzle_word}' がマッチしました: インデックス {idx}, 内容: {comment}")
-                    # print(f"マッチしたトークン: {tokens[i:i+sizzle_len]}, {sizzle_tokens}")
-                    # 必要なカラムを抽出
-                    matched_row = row[required_columns].to_dict()
-                    matched_comments_dict[sizzle_word].append(matched_row)
-                    break  # このシズルワードでマッチしたら次のシズルワードへ
-    else:
-        print(f"コメントが文字列ではありません: インデックス {idx}, 内容: {comment}")
-
-# マッチした口コミの総数を表示
-total_matched = sum(len(comments) for comments in matched_comments_dict.values())
-print(f"\nシズルワードを含む口コミの総数: {total_matched}")
-
-# 出力ディレクトリを作成
-os.makedirs(output_dir, exist_ok=True)
-
-# シズルワードごとの口コミを個別のCSVファイルに保存
-for sizzle_word, comments in matched_comments_dict.items():
-    if comments:
-        # ファイル名にシズルワードを使用する場合、ファイル名に使えない文字を置換
-        safe_sizzle_word = re.sub(r'[\\/*?:"<>|]', "_", sizzle_word)
-        filename = os.path.join(output_dir, f"matched_reviews_{safe_sizzle_word}.csv")
-        matched_df = pd.DataFrame(comments)
-        try:
-            matched_df.to_csv(filename, index=False, encoding="utf-8-sig")
-            print(f"シズルワード '{sizzle_word}' を含む口コミを '{filename}' に保存しました。")
-        except Exception as e:
-            print(f"シズルワード '{sizzle_word}' の口コミ保存中にエラーが発生しました: {e}")
-    else:
-        print(f"シズルワード '{sizzle_word}' を含む口コミはありませんでした。")
-
-exit()
-
-# 単語の頻度をカウント
-word_counts = Counter(all_tokens)
-print(f"ユニークな単語数: {len(word_counts)}")
-
-# 頻出単語が存在しない場合の対処
-if not word_counts:
-    print("エラー: 単語のカウントが空です。前処理やトークナイズのステップを再確認してください。")
-    exit()
-
-# 結果の可視化（棒グラフとワードクラウド）
-top = word_counts.most_common(MAX_NUM)
-top_words = [word for word, count in top]
-
-# 共起関係を保存する辞書
-co_occurrence = defaultdict(Counter)
-
-for comment in df[col_name]:
-    if isinstance(comment, str):
-        tokens = tokenize(comment)
-        tokens_set = set(tokens)  # 重複を避けるためにセット化
-        for word in top_words:
-            if word in tokens_set:
-                for co_word in tokens_set:
-                    if co_word != word:
-                        co_occurrence[word][co_word] += 1
-
-# 共起結果の表示
-for word, counter in co_occurrence.items():
-    print(f"'{word}' に関連する頻出単語:")
-    for co_word, count in counter.most_common(10):
-        print(f"  {co_word}: {count}")
-    print()
-
-font_path = "ipaexg.ttf"
-font_prop = fm.FontProperties(fname=font_path)
-
-# 棒グラフの作成
-words, counts = zip(*top)
-plt.figure(figsize=(10, 8))
-plt.barh(words, counts, color="skyblue")
-plt.xlabel("出現回数", fontproperties=font_prop)
-plt.title(f"上位{MAX_NUM}頻出単語", fontproperties=font_prop)
-plt.gca().invert_yaxis()  # 上位が上に来るように
-plt.yticks(fontproperties=font_prop)
-plt.show()
-
-# 年代別に頻出単語を集計
-# "age_gender"カラムには年代と性別が含まれている(例: "20代前半（女）")
-if "age_gender" in df.columns:
-    # 新しいカラム 'age_group' を作成
-    df["age_group"] = df["age_gender"].apply(extract_age_group)
+# シズルワードごとの出力ファイル名（ファイル名に使えない文字を置換）
+def matched_filename(sizzle_word):
+    safe_sizzle_word = re.sub(r'[\\/*?:"<>|]', "_", sizzle_word)
+    return f"matched_reviews_{safe_sizzle_word}.csv"
+
+
+def match_reviews(chunk, col_name, matcher, offset=0):
+    """口コミごとに、コメントに含まれるシズルワードのリストを返す"""
+    matched = []
+    rows = zip(chunk[col_name], chunk[f"{col_name}_surface"], chunk[f"{col_name}_base"])
+    for pos, (comment, surfaces, bases) in enumerate(rows):
+        if isinstance(comment, str):
+            # 形態素解析はやり直さず、保存済みのトークン列を全シズルワードと1回の走査で照合する
+            matched.append(matcher.matched_words(stored_tokens(surfaces, bases)))
+        else:
+            print(f"コメントが文字列ではありません: インデックス {offset + pos}, 内容: {comment}")
+            matched.append([])
+    return matched
+
+
+class WordStats:
+    """
+    口コミ（DataFrame のチャンク）を加えながら、単語の出現回数・共起行列・年代別の出現回数を積み上げる。
+    保持するのは単語（と年代）ごとの集計だけなので、口コミ数が増えてもメモリは増えない。
+    """
+
+    def __init__(self, col_name, cooccurrence=True):
+        self.col_name = col_name
+        self.word_counts = Counter()
+        self.cooccurrence = CooccurrenceCounts() if cooccurrence else None
+        self.age_counts = GroupTermCounts("age_group")
+        self.has_age = True
+
+    def update(self, chunk):
+        # 形態素解析はやり直さず、保存済みのトークン列を使う（コメントが欠損している口コミは空のリスト）
+        review_tokens = [
+            stored_tokens(surfaces, bases)
+            for surfaces, bases in zip(chunk[f"{self.col_name}_surface"], chunk[f"{self.col_name}_base"])
+        ]
+        self.word_counts.update(token for tokens in review_tokens for token in tokens)
+        if self.cooccurrence is None:
+            return
+        self.cooccurrence.update(review_tokens)
+
+        # "age_gender"カラムには年代と性別が含まれている(例: "20代前半（女）")
+        if "age_gender" not in chunk.columns:
+            self.has_age = False
+            return
+        groups = add_group_columns(chunk[["age_gender"]])
+        groups["review_tokens"] = review_tokens
+        # チャンク内の年代別の出現回数を疎行列でまとめて求め、全体の集計に足す
+        self.age_counts.update(groups, "review_tokens")
+
+
+def write_matches(chunks, col_name, matcher, writer, stats=None):
+    """
+    口コミ（DataFrame のチャンク）を順に照合し、マッチした口コミをシズルワードごとのCSVに書き出す。
+    各口コミは1回だけ整形して、マッチした全シズルワードのファイルに書き込む。
+    stats（WordStats）を渡すと、同じチャンクで単語の集計も進める。
+    チャンクごとに読み込めば、メモリに残るのはシズルワードごとの件数（writer.counts）と単語の集計だけになる。
+    """
+    offset = 0
+    for chunk in chunks:
+        writer.write(chunk, match_reviews(chunk, col_name, matcher, offset))
+        if stats is not None:
+            stats.update(chunk)
+        offset += len(chunk)
+
+
+def main():
+    # 設定
+    suffix = "70代"
+    # dataset = f"split_reviews_by_age/reviews_{suffix}.csv"
+    dataset = "ozmall_reviews_10"  # review_store のデータセット名（未取り込みなら同名のCSV）
+    required_columns = [
+        "restaurant_name",
+        "user_name",
+        "age_gender",
+        "usage_count",
+        "date",
+        "purpose",
+        "overall_score",
+        "plan_score",
+        "atmosphere_score",
+        "food_score",
+        "cost_performance_score",
+        "service_score",
+        "plan_menu",
+        "comment_food_drink",  # 口コミのカラム名
+    ]
+    col_name = "comment_food_drink"  # 口コミのカラム名
+    sizzle_word_file = "sizzle_words.txt"  # シズルワードリストのファイル名
+    # output_dir = f"split_reviews_by_age/matched_reviews_by_sizzle_{suffix}"  # 出力ディレクトリ名
+    output_dir = "noun_reviews_csv_10"  # 出力ディレクトリ名
+    MAX_NUM = 30  # 頻出単語として集計・表示する単語数
+    chunk_size = None  # 件数を指定すると口コミを分割して読み込み、マッチした口コミを順次CSVに追記する
+    word_stats = True  # 単語の頻度表の保存に続けて、共起・年代別の頻度も集計する
+    show_plots = False  # 集計結果の棒グラフを表示する（フォントファイル ipaexg.ttf が必要）
+
+    # シズルワードリストの読み込み（照合用のオートマトンも辞書に含まれている）
+    lexicon = load_sizzle_words(sizzle_word_file)
+    matcher = lexicon.matcher
+
+    # 単語の出現回数（word_stats なら共起・年代別も）を、照合と同じ読み込みで集計する
+    stats = WordStats(col_name, cooccurrence=word_stats)
+
+    # シズルワードごとの口コミを個別のCSVファイルに保存
+    with PartitionedCsvWriter(output_dir, matched_filename, required_columns) as writer:
+        if chunk_size:
+            # 口コミ全体をメモリに載せずに、チャンクごとに照合して書き出し、単語の集計も進める
+            write_matches(
+                iter_tokenized(dataset, [col_name], columns=required_columns, chunk_size=chunk_size),
+                col_name,
+                matcher,
+                writer,
+                stats,
+            )
+        else:
+            # CSVからコメントを読み込む
+            df = load_reviews(dataset, required_columns, token_fields=[col_name])
+            # 照合結果は、口コミデータ・シズルワードリスト・辞書が変わっていなければ前回の結果を使う
+            with AnalysisCache() as cache:
+                matched = cache.cached(
+                    "sizzle_matches",
+                    lambda: match_reviews(df, col_name, matcher),
+                    inputs=[dataset_path(dataset)],
+                    params={"field": col_name, "lexicon": lexicon.fingerprint},
+                    tokenizer=True,
+                )
+            writer.write(df, matched)
+            stats.update(df)
+
+    # マッチした口コミの総数を表示
+    total_matched = sum(writer.counts.values())
+    print(f"\nシズルワードを含む口コミの総数: {total_matched}")
+
+    for sizzle_word in lexicon.words:
+        if writer.counts[sizzle_word]:
+            print(f"シズルワード '{sizzle_word}' を含む口コミを '{writer.path(sizzle_word)}' に保存しました。")
+        else:
+            print(f"シズルワード '{sizzle_word}' を含む口コミはありませんでした。")
+
+    # 単語の頻度
+    word_counts = stats.word_counts
+    print(f"ユニークな単語数: {len(word_counts)}")
+
+    # 頻出単語が存在しない場合の対処
+    if not word_counts:
+        print("エラー: 単語のカウントが空です。前処理やトークナイズのステップを再確認してください。")
+        exit()
+
+    # 単語の頻度表は毎回作り直す（sizzle.py はこの頻度表を引く）
+    print("")
+    print("すべての単語の出現頻度を 'word_frequencies.csv' に保存します。")
+    # すべての単語を頻度順にソート
+    sorted_word_freq = sorted(word_counts.items(), key=lambda x: x[1], reverse=True)
+
+    # データフレームを作成
+    df_word_freq = pd.DataFrame(sorted_word_freq, columns=["word", "frequency"])
+
+    # CSVに保存
+    df_word_freq.to_csv("word_frequencies.csv", index=False, encoding="utf-8-sig")
+
+    # 単語 → 出現回数の頻度表（sizzle.py などが全体を読まずに引ける形式）も保存
+    write_word_counts(WORD_COUNTS, word_counts)
+    print("保存が完了しました。")
+
+    if not word_stats:
+        return
+
+    # 結果の可視化（棒グラフとワードクラウド）
+    top = word_counts.most_common(MAX_NUM)
+    top_words = [word for word, count in top]
+
+    # 共起行列（全単語の組の共起口コミ数を、チャンクごとの疎行列の積の和で求めたもの）
+    co_occurrence = CooccurrenceMatrix.from_counts(stats.cooccurrence)
+
+    # 共起結果の表示
+    for word in top_words:
+        print(f"'{word}' に関連する頻出単語:")
+        for co_word, count in co_occurrence.top_partners(word, 10):
+            print(f"  {co_word}: {count}")
+        print()
+
+    # 全単語について、共起数・PMI・Jaccard係数の上位の共起語を保存
+    for measure in ("count", "pmi", "jaccard"):
+        co_occurrence.partners_frame(k=10, measure=measure).to_csv(
+            f"word_cooccurrence_{measure}.csv", index=False, encoding="utf-8-sig"
+        )
+
+    font_path = "ipaexg.ttf"
+    font_prop = fm.FontProperties(fname=font_path)
+
+    # 棒グラフの作成
+    if show_plots:
+        words, counts = zip(*top)
+        plt.figure(figsize=(10, 8))
+        plt.barh(words, counts, color="skyblue")
+        plt.xlabel("出現回数", fontproperties=font_prop)
+        plt.title(f"上位{MAX_NUM}頻出単語", fontproperties=font_prop)
+        plt.gca().invert_yaxis()  # 上位が上に来るように
+        plt.yticks(fontproperties=font_prop)
+        plt.show()
+
+    # 年代別に頻出単語を集計（チャンクごとに積み上げた、全年代の出現回数の疎行列から）
+    if not stats.has_age:
+        print("エラー: 'age_gender' カラムが見つかりません。")
+        exit()
+    age_tf = stats.age_counts.result()
+    age_counters = age_tf.counters()
+    age_reviews = pd.Series(age_tf.num_reviews, index=age_tf.groups["age_group"], name="count")
     print("\n'age_group' カラムを作成しました。")
     print("年代ごとのコメント数:")
-    print(df["age_group"].value_counts())
-else:
-    print("エラー: 'age_gender' カラムが見つかりません。")
-    exit()
-
-# 年代別に頻出単語を集計
-age_groups = df["age_group"].unique()
-age_groups = sorted(age_groups, key=sort_key)
-age_word_counts = defaultdict(Counter)
-
-for age in age_groups:
-    # 年代グループごとにデータをフィルタリング
-    subset = df[df["age_group"] == age]
-    print(f"\n年代: {age} のコメント数: {len(subset)}")
-
-    # 各コメントから単語を抽出し、カウント
-    tokens = []
-    for comment in subset[col_name]:
-        if isinstance(comment, str):
-            tokens.extend(tokenize(comment))
-
-    # 単語の頻度をカウント
-    word_counts_age = Counter(tokens)
-    age_word_counts[age] = word_counts_age
-    print(f"'{age}' の上位10頻出単語: {word_counts_age.most_common(20)}")
-
-# 結果の可視化（年代別の棒グラフ）
-for age, counter in age_word_counts.items():
-    top_n = 20  # 上位10単語を表示
-    top_words = counter.most_common(top_n)
-    words, counts = zip(*top_words) if top_words else ([], [])
-
-    plt.figure(figsize=(10, 8))
-    plt.barh(words, counts, color="skyblue")
-    plt.xlabel("出現回数", fontproperties=fm.FontProperties(fname=font_path))
-    plt.title(f"{age} の上位{top_n}頻出単語", fontproperties=fm.FontProperties(fname=font_path))
-    plt.gca().invert_yaxis()  # 上位が上に来るように
-    plt.yticks(fontproperties=fm.FontProperties(fname=font_path))
-    plt.show()
-
-print("")
-print("すべての単語の出現頻度を 'word_frequencies.csv' に保存します。")
-# すべての単語を頻度順にソート
-sorted_word_freq = sorted(word_counts.items(), key=lambda x: x[1], reverse=True)
-
-# データフレームを作成
-df_word_freq = pd.DataFrame(sorted_word_freq, columns=["word", "frequency"])
-
-# CSVに保存
-df_word_freq.to_csv("word_frequencies.csv", index=False, encoding="utf-8-sig")
-print("保存が完了しました。")
+    print(age_reviews.sort_values(ascending=False, kind="stable"))
+    age_word_counts = {}
+
+    for age in sorted(age_counters, key=age_sort_key):
+        print(f"\n年代: {age} のコメント数: {age_reviews[age]}")
+        word_counts_age = age_counters[age]
+        age_word_counts[age] = word_counts_age
+        print(f"'{age}' の上位10頻出単語: {word_counts_age.most_common(20)}")
+
+    # 結果の可視化（年代別の棒グラフ）
+    for age, counter in age_word_counts.items() if show_plots else ():
+        top_n = 20  # 上位10単語を表示
+        top_words = counter.most_common(top_n)
+        words, counts = zip(*top_words) if top_words else ([], [])
+
+        plt.figure(figsize=(10, 8))
+        plt.barh(words, counts, color="skyblue")
+        plt.xlabel("出現回数", fontproperties=font_prop)
+        plt.title(f"{age} の上位{top_n}頻出単語", fontproperties=font_prop)
+        plt.gca().invert_yaxis()  # 上位が上に来るように
+        plt.yticks(fontproperties=font_prop)
+        plt.show()
+
+
+if __name__ == "__main__":
+    main()
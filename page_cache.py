@@ -0,0 +1,108 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from urllib.parse import urldefrag
+
+
+class PageCache:
+    """
+    取得したHTMLをURL単位でキャッシュする。
+    本文は内容のSHA-256をファイル名にして保存し（同じ内容は1つだけ保持）、
+    URL → ハッシュ・ETag・Last-Modified の対応をSQLiteの索引に記録する。
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.objects_dir = os.path.join(cache_dir, "objects")
+        os.makedirs(self.objects_dir, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(cache_dir, "index.sqlite"), check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS pages (
+                    url TEXT PRIMARY KEY,
+                    sha256 TEXT NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT,
+                    fetched_at TEXT
+                )
+                """
+            )
+
+    def lookup(self, url):
+        # 索引の情報を返す（未キャッシュなら None）
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT sha256, etag, last_modified, fetched_at FROM pages WHERE url = ?", (_cache_key(url),)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"sha256": row[0], "etag": row[1], "last_modified": row[2], "fetched_at": row[3]}
+
+    def load(self, url):
+        # キャッシュ済みのHTMLを返す（未キャッシュ、または本文ファイルが消えている場合は None）
+        entry = self.lookup(url)
+        if entry is None:
+            return None
+        path = self._object_path(entry["sha256"])
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+
+    def conditional_headers(self, url):
+        # 条件付きGET用のヘッダー（If-None-Match / If-Modified-Since）
+        entry = self.lookup(url)
+        headers = {}
+        if entry is None or not os.path.exists(self._object_path(entry["sha256"])):
+            return headers
+        if entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def store(self, url, html, etag=None, last_modified=None):
+        data = html.encode("utf-8")
+        sha256 = hashlib.sha256(data).hexdigest()
+        path = self._object_path(sha256)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # 書き込み途中のファイルが残らないよう、一時ファイルに書いてから置き換える
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT INTO pages (url, sha256, etag, last_modified, fetched_at) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(url) DO UPDATE SET
+                    sha256 = excluded.sha256,
+                    etag = excluded.etag,
+                    last_modified = excluded.last_modified,
+                    fetched_at = excluded.fetched_at
+                """,
+                (_cache_key(url), sha256, etag, last_modified, datetime.now().isoformat(timespec="seconds")),
+            )
+        return sha256
+
+    def urls(self):
+        # キャッシュ済みのURL一覧
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT url FROM pages ORDER BY url")]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _object_path(self, sha256):
+        return os.path.join(self.objects_dir, sha256[:2], f"{sha256}.html")
+
+
+def _cache_key(url):
+    # "#result" などのフラグメントはサーバーに送られないため、キーから除く
+    return urldefrag(url)[0]
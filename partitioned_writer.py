@@ -0,0 +1,116 @@
+import csv
+import io
+import os
+from collections import Counter, OrderedDict
+
+import pandas as pd
+
+from review_store import DATE_FORMAT
+
+MAX_OPEN_FILES = 256  # 同時に開いておく出力ファイル数の上限（超えたら使っていないものから閉じる）
+BUFFER_SIZE = 1 << 16  # 出力ファイルごとの書き込みバッファ
+
+
+def format_line(values):
+    # to_csv と同じ区切り・引用符・改行コードで1行を作る
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator=os.linesep).writerow(values)
+    return buffer.getvalue()
+
+
+def format_rows(df, date_format=DATE_FORMAT):
+    """
+    DataFrame の各行を、to_csv(index=False) と同じ形式のCSVの1行（改行付きの文字列）にする。
+    複数の出力ファイルに書き出す行も、整形は1回だけで済む。
+    """
+    values = df.astype(object).where(df.notna(), "")
+    for col in df.columns:
+        if pd.api.types.is_datetime64_any_dtype(df[col]):
+            values[col] = df[col].dt.strftime(date_format).fillna("")
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator=os.linesep)
+    lines = []
+    for row in values.itertuples(index=False, name=None):
+        writer.writerow(row)
+        lines.append(buffer.getvalue())
+        buffer.seek(0)
+        buffer.truncate()
+    return lines
+
+
+class PartitionedCsvWriter:
+    """
+    口コミを、キー（シズルワード、名詞、年代など）ごとのCSVファイルに振り分けて書き出す。
+    各行の整形は1回だけ行い、該当する全てのキーのファイルにそのまま書き込むので、
+    書き出しにかかる時間はキーの数ではなく該当件数の合計に比例する。
+    ファイルは最初の書き込みで作り直し（ヘッダー付き）、以降はバッファ付きのまま開いておいて追記する。
+    """
+
+    def __init__(
+        self,
+        output_dir,
+        filename,
+        columns,
+        encoding="utf-8-sig",
+        date_format=DATE_FORMAT,
+        max_open_files=MAX_OPEN_FILES,
+    ):
+        self.output_dir = output_dir
+        self.filename = filename  # キー → ファイル名（output_dir からの相対パス）
+        self.columns = list(columns)
+        self.encoding = encoding
+        self.date_format = date_format
+        self.max_open_files = max_open_files
+        self.counts = Counter()  # キーごとの書き出した行数
+        self._header = format_line(self.columns)
+        self._files = OrderedDict()
+        os.makedirs(output_dir, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.output_dir, self.filename(key))
+
+    def _file(self, key):
+        f = self._files.get(key)
+        if f is not None:
+            self._files.move_to_end(key)
+            return f
+        if len(self._files) >= self.max_open_files:
+            _, oldest = self._files.popitem(last=False)
+            oldest.close()
+        if key in self.counts:
+            # 一度閉じたファイルは追記で開き直す（BOMは先頭にだけ書く）
+            encoding = "utf-8" if self.encoding == "utf-8-sig" else self.encoding
+            f = open(self.path(key), "a", encoding=encoding, newline="", buffering=BUFFER_SIZE)
+        else:
+            f = open(self.path(key), "w", encoding=self.encoding, newline="", buffering=BUFFER_SIZE)
+            f.write(self._header)
+            self.counts[key] = 0
+        self._files[key] = f
+        return f
+
+    def write(self, df, keys):
+        """df の各行を、keys の対応する要素（その行を書き出すキーのリスト）の全てのファイルに書き出す"""
+        lines = format_rows(df[self.columns], self.date_format)
+        for line, row_keys in zip(lines, keys):
+            for key in row_keys:
+                self._file(key).write(line)
+                self.counts[key] += 1
+
+    def write_groups(self, df, rows_by_key):
+        """rows_by_key（キー → df の行番号のリスト）に従って、行をキーごとのファイルに書き出す"""
+        lines = format_rows(df[self.columns], self.date_format)
+        for key, rows in rows_by_key.items():
+            if len(rows):
+                self._file(key).writelines(lines[i] for i in rows)
+                self.counts[key] += len(rows)
+
+    def close(self):
+        while self._files:
+            _, f = self._files.popitem()
+            f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,125 @@
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from review_parser import DEFAULT_BACKEND, parse_page
+
+
+def _timed_parse(html, backend, box_filter=None):
+    # 解析プロセス内で計った解析時間（待ち行列やプロセス間の転送の時間を含まない）も返す
+    start = time.perf_counter()
+    page = parse_page(html, backend, box_filter)
+    return page, time.perf_counter() - start
+
+
+class ParsePool:
+    """
+    取得したHTMLをプロセスプールで解析する。
+    取得側（ワーカースレッド）は parse() でHTMLを渡し、解析結果の ReviewPage を受け取る。
+    解析待ちのHTMLは max_pending 件までに制限し、それを超えると取得側が待たされる（有界キュー）。
+    workers=0 のときはプロセスを使わず、呼び出し元のスレッドで解析する。
+    metrics（CrawlMetrics）を渡すと、ページごとの解析時間と、box_filter で抽出を省略した口コミ数を記録する。
+    """
+
+    def __init__(self, workers, max_pending=None, backend=DEFAULT_BACKEND, metrics=None):
+        self.backend = backend
+        self.metrics = metrics
+        self._executor = ProcessPoolExecutor(max_workers=workers) if workers > 0 else None
+        self._slots = threading.BoundedSemaphore(max_pending or max(workers, 1) * 2)
+
+    def parse(self, html, url=None, box_filter=None):
+        if self._executor is None:
+            page, seconds = _timed_parse(html, self.backend, box_filter)
+        else:
+            self._slots.acquire()
+            try:
+                future = self._executor.submit(_timed_parse, html, self.backend, box_filter)
+            except BaseException:
+                self._slots.release()
+                raise
+            future.add_done_callback(lambda _: self._slots.release())
+            page, seconds = future.result()
+        if self.metrics is not None:
+            skipped = Counter(review.rejected for review in page.reviews if review.rejected)
+            self.metrics.record_parse(url, seconds, len(page.reviews), skipped)
+        return page
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+
+
+class ReviewWriter:
+    """
+    CSVへの書き込みとクロール進捗の記録を1つのスレッドにまとめる。
+    outputs はジョブ名 → (csv.DictWriter, ファイル) で、ジョブごとに別のCSVに書き込む。
+    各ワーカーは write_page / mark_done / mark_failed をキューに積むだけで、書き込みを待たない。
+    同じレストランのメッセージは積まれた順に処理されるため、完了の記録がページの記録より先になることはない。
+    """
+
+    def __init__(self, outputs, state, max_pending=1000):
+        self._outputs = outputs
+        self._state = state
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name="review-writer", daemon=True)
+        self._thread.start()
+
+    def write_page(self, url, restaurant_name, page_no, rows_by_job, job_counts, watermark, finished_jobs=()):
+        # rows_by_job はジョブ名 → そのページで採用した行、job_counts はジョブ名 → 書き込み済みの口コミ数
+        # ウォーターマーク候補と件数は呼び出し元で更新され続けるため、複製して渡す
+        if watermark is not None:
+            watermark = (watermark[0], set(watermark[1]))
+        message = ("page", url, restaurant_name, page_no, rows_by_job, dict(job_counts), watermark, set(finished_jobs))
+        self._put(message)
+
+    def mark_done(self, url, jobs=()):
+        self._put(("done", url, list(jobs)))
+
+    def mark_failed(self, url, page_url=None, reason=None):
+        self._put(("failed", url, page_url, reason))
+
+    def close(self):
+        # 積まれたメッセージをすべて書き終えてからスレッドを止める
+        self._queue.put(None)
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+
+    def _put(self, message):
+        if self._error is not None:
+            raise self._error
+        self._queue.put(message)
+
+    def _run(self):
+        while True:
+            message = self._queue.get()
+            if message is None:
+                return
+            if self._error is not None:
+                continue  # エラー後は残りを読み捨て、close() で呼び出し元に伝える
+            try:
+                self._handle(message)
+            except Exception as e:
+                self._error = e
+
+    def _handle(self, message):
+        kind, url = message[0], message[1]
+        if kind == "page":
+            _, _, restaurant_name, page_no, rows_by_job, job_counts, watermark, finished_jobs = message
+            # CSVへの書き込みを確定させてから進捗を記録する
+            for job, rows in rows_by_job.items():
+                if rows:
+                    csv_writer, csvfile = self._outputs[job]
+                    csv_writer.writerows(rows)
+                    csvfile.flush()
+            self._state.record_page(
+                url, restaurant_name, page_no, sum(job_counts.values()), watermark, job_counts, finished_jobs
+            )
+        elif kind == "done":
+            self._state.mark_done(url, message[2])
+        elif kind == "failed":
+            _, _, page_url, reason = message
+            self._state.mark_failed(url, page_url, reason)
@@ -0,0 +1,55 @@
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+class TokenBucket:
+    """
+    トークンバケット方式のレートリミッタ。
+    rate: 1秒あたりに補充されるトークン数（= 許可するリクエスト数）
+    capacity: バケットに貯められるトークンの上限（瞬間的に許可するバースト数）
+    """
+
+    def __init__(self, rate, capacity=1):
+        if rate <= 0:
+            raise ValueError("rate は正の値を指定してください。")
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        # トークンが1つ取れるまで待機する（複数スレッドから呼ばれても安全）
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            # ロックを離してから待機し、他のスレッドをブロックしない
+            time.sleep(wait)
+
+
+class HostRateLimiter:
+    """
+    ホストごとに TokenBucket を割り当てるレートリミッタ。
+    全ワーカーで1つのインスタンスを共有することで、同じホストへの合計負荷を一定に保つ。
+    """
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, url):
+        host = urlsplit(url).netloc
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = self._buckets[host] = TokenBucket(self.rate, self.capacity)
+        bucket.acquire()
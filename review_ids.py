@@ -0,0 +1,122 @@
+import argparse
+import csv
+import hashlib
+import os
+import re
+from collections import Counter
+from datetime import datetime
+
+from review_store import DATE_FORMAT, detect_encoding
+
+# 口コミIDの元にする項目（レストランID・ユーザー名・投稿日と、コメントの本文）
+COMMENT_FIELDS = ("comment_food_drink", "comment_atmosphere_service", "comment_reactions")
+ID_FIELDS = ["review_id", "restaurant_id"]  # クロール結果のCSVの先頭に付けるカラム
+RESTAURANT_ID_PATTERN = re.compile(r"/restaurant/(\d+)/")
+
+
+def restaurant_id(url):
+    """レストランのURL（一覧・口コミのどちらのページでもよい）からレストランIDを取り出す（なければ None）"""
+    match = RESTAURANT_ID_PATTERN.search(url)
+    return match.group(1) if match else None
+
+
+def _normalize_date(value):
+    # CSVを表計算ソフトや pandas で保存し直すと "2024/9/9" が "2024/09/09" になるので、日付として比較する
+    try:
+        return datetime.strptime(value.strip(), DATE_FORMAT).date().isoformat()
+    except ValueError:
+        return value.strip()
+
+
+def review_id(restaurant, user_name, date, comments):
+    """
+    口コミの安定したID。同じ口コミなら、どのクロール・どのCSVから読んでも同じ値になる。
+    空白と改行の違い（CSVの保存し直しで変わりうる）は無視する。
+    """
+    parts = [restaurant or "", user_name.strip(), _normalize_date(date)]
+    parts.extend(" ".join(comment.split()) for comment in comments)
+    return hashlib.sha1("\x1f".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+def load_restaurant_ids(url_files):
+    """レストラン名とURLを並べたリスト（restaurant_urls.csv など）から、レストラン名 → レストランID"""
+    ids = {}
+    for path in url_files:
+        with open(path, "r", encoding="utf-8-sig") as csvfile:
+            for row in csv.reader(csvfile):
+                if len(row) >= 2 and restaurant_id(row[1]):
+                    ids.setdefault(row[0].strip(), restaurant_id(row[1]))
+    return ids
+
+
+def row_review_id(row, restaurant_ids=None):
+    """
+    CSVの1行の口コミID。review_id カラムがあればその値を使い、なければ計算する。
+    restaurant_id カラムのない（以前の形式の）行は、restaurant_ids でレストラン名から引き、引けなければレストラン名で代用する。
+    """
+    if row.get("review_id"):
+        return row["review_id"]
+    restaurant = row.get("restaurant_id") or (restaurant_ids or {}).get(row["restaurant_name"], row["restaurant_name"])
+    return review_id(restaurant, row["user_name"], row["date"], (row.get(field) or "" for field in COMMENT_FIELDS))
+
+
+def merge_reviews(paths, output, restaurant_ids=None):
+    """
+    複数の口コミCSVを1つにまとめ、重複した口コミを除いて output に書き出す。
+    入力を1回ずつ順に読み、書き出した口コミIDの集合（ハッシュ索引）で重複を判定するので、
+    並べ替えは不要で、メモリに載るのはIDだけ。同じ口コミは最初に現れた行を残す。
+    入力ごとの (ファイル, 読み込んだ行数, 重複として除いた行数) のリストを返す。
+    """
+    fieldnames = []
+    for path in paths:
+        with open(path, "r", encoding=detect_encoding(path), newline="") as f:
+            header = next(csv.reader(f), [])
+        fieldnames.extend(name for name in header if name not in fieldnames)
+    fieldnames = ID_FIELDS + [name for name in fieldnames if name not in ID_FIELDS]
+
+    seen = set()
+    stats = []
+    tmp_path = f"{output}.tmp"
+    with open(tmp_path, "w", newline="", encoding="utf-8-sig") as out:
+        writer = csv.DictWriter(out, fieldnames=fieldnames)
+        writer.writeheader()
+        for path in paths:
+            counts = Counter()
+            with open(path, "r", encoding=detect_encoding(path), newline="") as f:
+                for row in csv.DictReader(f):
+                    counts["read"] += 1
+                    row["review_id"] = row_review_id(row, restaurant_ids)
+                    if not row.get("restaurant_id") and restaurant_ids:
+                        row["restaurant_id"] = restaurant_ids.get(row["restaurant_name"], "")
+                    if row["review_id"] in seen:
+                        counts["duplicates"] += 1
+                        continue
+                    seen.add(row["review_id"])
+                    writer.writerow(row)
+            stats.append((path, counts["read"], counts["duplicates"]))
+    # 入力と同じファイルを出力に指定しても壊れないよう、書き終えてから置き換える
+    os.replace(tmp_path, output)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="複数の口コミCSVを、口コミIDで重複を除いて1つにまとめます。")
+    parser.add_argument("inputs", nargs="+", help="まとめる口コミのCSV（重複した口コミは先に指定したものを残す）")
+    parser.add_argument("-o", "--output", required=True, help="出力するCSV")
+    parser.add_argument(
+        "--url-file",
+        action="append",
+        default=[],
+        help="レストラン名とURLのリスト（restaurant_id のない以前の形式のCSVで、レストランIDを引くのに使う）",
+    )
+    args = parser.parse_args()
+
+    stats = merge_reviews(args.inputs, args.output, load_restaurant_ids(args.url_file))
+    for path, read, duplicates in stats:
+        print(f"{path}: {read}件（重複 {duplicates}件）")
+    total = sum(read - duplicates for _, read, duplicates in stats)
+    print(f"{args.output} に {total}件の口コミを書き出しました。")
+
+
+if __name__ == "__main__":
+    main()
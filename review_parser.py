@@ -0,0 +1,365 @@
+import re
+from dataclasses import asdict, dataclass
+from datetime import datetime
+
+from bs4 import BeautifulSoup
+
+# lxml があれば高速なXPathによる解析を使い、なければ BeautifulSoup で解析する
+try:
+    from lxml import etree
+except ImportError:
+    etree = None
+
+UNKNOWN = "Unknown"
+BACKENDS = ("lxml", "bs4")
+DEFAULT_BACKEND = "lxml" if etree is not None else "bs4"
+MAX_BOXES_PER_LIST = 10  # 1つの口コミ一覧に含まれる口コミボックスの数
+DATE_FORMAT = "%Y/%m/%d"  # 投稿日の形式
+
+PAGE_NO_PATTERN = re.compile(r"pageNo=(\d+)")
+COMMENT_HEADINGS = {
+    "食事やドリンクについて": "comment_food_drink",
+    "店の雰囲気やサービスについて": "comment_atmosphere_service",
+    "一緒に行った相手の反応について": "comment_reactions",
+}
+CATEGORY_SCORES = {
+    "プラン": "plan_score",
+    "雰囲気": "atmosphere_score",
+    "料理": "food_score",
+    "コスパ": "cost_performance_score",
+    "サービス": "service_score",
+}
+
+
+@dataclass
+class Review:
+    """口コミボックス1件分の抽出結果（CSVの1行からレストラン名を除いたもの）"""
+
+    user_name: str = UNKNOWN
+    age_gender: str = UNKNOWN
+    usage_count: str = UNKNOWN
+    date: str = UNKNOWN
+    purpose: str = UNKNOWN
+    overall_score: str = UNKNOWN
+    plan_score: str = UNKNOWN
+    atmosphere_score: str = UNKNOWN
+    food_score: str = UNKNOWN
+    cost_performance_score: str = UNKNOWN
+    service_score: str = UNKNOWN
+    plan_menu: str = UNKNOWN
+    comment_food_drink: str = UNKNOWN
+    comment_atmosphere_service: str = UNKNOWN
+    comment_reactions: str = UNKNOWN
+    # 口コミ詳細（スコア・プラン・コメント）のセルがあるかどうか
+    has_detail: bool = False
+    # BoxFilter の条件を満たさず、途中で抽出をやめた理由（"date_window", "plan", "missing_comment"）
+    rejected: str = None
+
+    def to_row(self, restaurant_name):
+        row = {"restaurant_name": restaurant_name}
+        row.update(asdict(self))
+        del row["has_detail"], row["rejected"]
+        return row
+
+
+@dataclass(frozen=True)
+class BoxFilter:
+    """
+    口コミボックスを最後まで抽出する前に、安い順（投稿日 → 利用プラン名 → コメントの有無）に判定する条件。
+    満たさないボックスは、それまでに抽出した項目（投稿日・ユーザー名など）だけの Review に理由を付けて返し、
+    スコアなど残りの項目は抽出しない。date_from / date_to が None ならその条件を使わず、
+    keywords が空なら全プランを対象にする。
+    """
+
+    date_from: datetime = None
+    date_to: datetime = None
+    keywords: tuple = ()
+    require_comments: bool = False
+
+    def date_rejected(self, date):
+        try:
+            posted = datetime.strptime(date, DATE_FORMAT)
+        except ValueError:
+            return False  # 投稿日が読めなければ、ここでは判定しない
+        return (self.date_from is not None and posted < self.date_from) or (
+            self.date_to is not None and posted > self.date_to
+        )
+
+    def plan_rejected(self, plan_menu):
+        return bool(self.keywords) and not any(keyword in plan_menu for keyword in self.keywords)
+
+    def comments_rejected(self, review):
+        return self.require_comments and (
+            review.comment_food_drink == UNKNOWN or review.comment_atmosphere_service == UNKNOWN
+        )
+
+
+@dataclass
+class ReviewPage:
+    """口コミ一覧ページ1枚分の解析結果"""
+
+    restaurant_name: str
+    reviews: list
+    # 口コミ一覧 (review__list) がページに存在したかどうか
+    has_review_list: bool
+    # ページャーに載っている最大のページ番号（ページャーがなければ None）
+    max_page: int = None
+
+
+def parse_review_page(html, backend=None, box_filter=None):
+    """口コミ一覧ページのHTMLから Review のリストを返す"""
+    return parse_page(html, backend, box_filter).reviews
+
+
+def parse_page(html, backend=None, box_filter=None):
+    """口コミ一覧ページのHTMLを解析し、ReviewPage を返す（box_filter は BoxFilter）"""
+    backend = backend or DEFAULT_BACKEND
+    if backend == "lxml":
+        if etree is None:
+            raise ImportError("lxml がインストールされていないため、lxml バックエンドは使えません。")
+        return _parse_page_lxml(html, box_filter)
+    if backend == "bs4":
+        return _parse_page_bs4(html, box_filter)
+    raise ValueError(f"未対応のバックエンドです: {backend}")
+
+
+# ---------------------------------------------------------------------------
+# lxml バックエンド（XPathは読み込み時に一度だけコンパイルする）
+# ---------------------------------------------------------------------------
+
+
+def _has_class(name):
+    # BeautifulSoup の class_ 指定と同じく、class属性のトークン単位で一致を判定する
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+if etree is not None:
+    # BeautifulSoup の find（最初の1件）に当たるものは、結果の先頭要素を使う
+    _HTML_PARSER = etree.HTMLParser(encoding="utf-8")
+    _TEXT = etree.XPath(".//text()")
+    _SHOP_NAME = etree.XPath(f"//div[{_has_class('shop-name')}]")
+    _H1 = etree.XPath(".//h1")
+    _A = etree.XPath(".//a")
+    _REVIEW_LISTS = etree.XPath(f"//div[{_has_class('review__list')}]")
+    _REVIEW_BOXES = etree.XPath(f".//div[{_has_class('review__list--box')}]")
+    _CELLS = etree.XPath(f".//div[{_has_class('review__list--box__cell')}]")
+    _USER = etree.XPath(f".//div[{_has_class('review__list--box__user')}]")
+    _P = etree.XPath(".//p")
+    _USER_DATA = etree.XPath(f".//dl[{_has_class('review__list--box__user-data')}]")
+    _DT = etree.XPath(".//dt")
+    _DD = etree.XPath(".//dd")
+    _SCORE_SECTION = etree.XPath(f".//div[{_has_class('review__list--box__score')}]")
+    _TOTAL_SCORE_SECTION = etree.XPath(f".//dl[{_has_class('review__list--box__score--total')}]")
+    _TOTAL_SCORE = etree.XPath(f".//span[{_has_class('review-totalscore')}]")
+    _CATEGORY_SCORES = etree.XPath(f".//dl[{_has_class('review__list--box__score--categoryScore')}]")
+    _SCORE_DD = etree.XPath(f".//dd[{_has_class('score')}]")
+    _PLAN_SECTION = etree.XPath(f".//div[{_has_class('review__list--box__plan--text')}]")
+    _PLAN_MENU = etree.XPath(f".//p[{_has_class('review__list--box__plan--menu')}]")
+    _COMMENTS = etree.XPath(f".//dl[{_has_class('review__list--box__comment')}]")
+    _COMMENT_HEADING = etree.XPath(f".//dt[{_has_class('review__list--box__comment--heading')}]")
+    _PAGER = etree.XPath(f"//div[{_has_class('pager')}]")
+    _PAGER_COUNT = etree.XPath(f".//ul[{_has_class('pager__count')}]")
+
+
+def _first(xpath, element):
+    # 最初に一致した要素（なければ None）
+    found = xpath(element) if element is not None else []
+    return found[0] if found else None
+
+
+def _text(element):
+    # BeautifulSoup の get_text(strip=True) と同じく、各テキストを strip して連結する
+    return "".join(text.strip() for text in _TEXT(element))
+
+
+def _first_text(elements, default=UNKNOWN):
+    return _text(elements[0]) if elements else default
+
+
+def _parse_page_lxml(html, box_filter=None):
+    root = etree.fromstring(html.encode("utf-8"), _HTML_PARSER)
+    if root is None:
+        return ReviewPage(UNKNOWN, [], False)
+
+    # レストラン名の抽出（スパン以降を除去）
+    a_tag = _first(_A, _first(_H1, _first(_SHOP_NAME, root)))
+    restaurant_name = _text(a_tag).split("[")[0] if a_tag is not None else UNKNOWN
+
+    review_lists = _REVIEW_LISTS(root)
+    reviews = []
+    for review_list in review_lists:
+        # `common-frame` を含む一覧は対象外
+        if "common-frame" in review_list.get("class", "").split():
+            continue
+        for review_box in _REVIEW_BOXES(review_list)[:MAX_BOXES_PER_LIST]:
+            reviews.append(_parse_box_lxml(review_box, box_filter))
+
+    return ReviewPage(restaurant_name, reviews, bool(review_lists), _max_page_lxml(root))
+
+
+def _parse_box_lxml(review_box, box_filter=None):
+    review = Review()
+    cells = _CELLS(review_box)
+    if cells:
+        # ユーザー情報の取得
+        user_info = cells[0]
+        user_name_tag = _first(_USER, user_info)
+        if user_name_tag is not None:
+            p_tags = _P(user_name_tag)
+            review.user_name = _text(p_tags[0]) if len(p_tags) > 0 else UNKNOWN
+            review.age_gender = _text(p_tags[1]) if len(p_tags) > 1 else UNKNOWN
+        user_data = _first(_USER_DATA, user_info)
+        if user_data is not None:
+            user_data_dict = {_text(dt): _text(dd) for dt, dd in zip(_DT(user_data), _DD(user_data))}
+            review.usage_count = user_data_dict.get("利用人数", UNKNOWN)
+            review.date = user_data_dict.get("投稿日", UNKNOWN)
+            review.purpose = user_data_dict.get("利用目的", UNKNOWN)
+    if box_filter is not None and box_filter.date_rejected(review.date):
+        review.rejected = "date_window"
+        return review
+
+    if len(cells) < 2:
+        return review
+    review.has_detail = True
+    detail = cells[1]
+
+    # 利用プラン情報の取得
+    plan_menu = _first(_PLAN_MENU, _first(_PLAN_SECTION, detail))
+    review.plan_menu = _text(plan_menu) if plan_menu is not None else UNKNOWN
+    if box_filter is not None and box_filter.plan_rejected(review.plan_menu):
+        review.rejected = "plan"
+        return review
+
+    # コメントの取得
+    for comment in _COMMENTS(detail):
+        field = COMMENT_HEADINGS.get(_first_text(_COMMENT_HEADING(comment), ""))
+        if field:
+            setattr(review, field, _first_text(_DD(comment), ""))
+    if box_filter is not None and box_filter.comments_rejected(review):
+        review.rejected = "missing_comment"
+        return review
+
+    # 口コミのスコア部分（条件を満たしたボックスだけ抽出する）
+    score_section = _first(_SCORE_SECTION, detail)
+    if score_section is not None:
+        total_score_section = _first(_TOTAL_SCORE_SECTION, score_section)
+        if total_score_section is not None:
+            review.overall_score = _first_text(_TOTAL_SCORE(total_score_section), "")
+        for category in _CATEGORY_SCORES(score_section):
+            field = CATEGORY_SCORES.get(_first_text(_DT(category), ""))
+            if field:
+                setattr(review, field, _first_text(_SCORE_DD(category), ""))
+    return review
+
+
+def _max_page_lxml(root):
+    pager_count = _first(_PAGER_COUNT, _first(_PAGER, root))
+    page_links = _A(pager_count) if pager_count is not None else []
+    page_numbers = [int(m.group(1)) for m in (PAGE_NO_PATTERN.search(a.get("href", "")) for a in page_links) if m]
+    return max(page_numbers) if page_numbers else None
+
+
+# ---------------------------------------------------------------------------
+# BeautifulSoup バックエンド（lxml が使えない環境向けのフォールバック）
+# ---------------------------------------------------------------------------
+
+
+def _parse_page_bs4(html, box_filter=None):
+    soup = BeautifulSoup(html, "html.parser")
+
+    # レストラン名の抽出（スパン以降を除去）
+    restaurant_name = UNKNOWN
+    restaurant_name_tag = soup.find("div", class_="shop-name")
+    if restaurant_name_tag:
+        h1_tag = restaurant_name_tag.find("h1")
+        if h1_tag:
+            a_tag = h1_tag.find("a")
+            if a_tag:
+                restaurant_name = a_tag.get_text(strip=True).split("[")[0]
+
+    review_lists = soup.find_all("div", class_="review__list")
+    reviews = []
+    for review_list in review_lists:
+        # `common-frame` を含む一覧は対象外
+        if "common-frame" in review_list.get("class", []):
+            continue
+        for review_box in review_list.find_all("div", class_="review__list--box", limit=MAX_BOXES_PER_LIST):
+            reviews.append(_parse_box_bs4(review_box, box_filter))
+
+    return ReviewPage(restaurant_name, reviews, bool(review_lists), _max_page_bs4(soup))
+
+
+def _parse_box_bs4(review_box, box_filter=None):
+    review = Review()
+    # ユーザー情報の取得
+    user_info = review_box.find("div", class_="review__list--box__cell")
+    if user_info:
+        user_name_tag = user_info.find("div", class_="review__list--box__user")
+        if user_name_tag:
+            p_tags = user_name_tag.find_all("p")
+            review.user_name = p_tags[0].get_text(strip=True) if len(p_tags) > 0 else UNKNOWN
+            review.age_gender = p_tags[1].get_text(strip=True) if len(p_tags) > 1 else UNKNOWN
+
+        # ユーザー詳細データの取得
+        user_data = user_info.find("dl", class_="review__list--box__user-data")
+        if user_data:
+            dt_tags = user_data.find_all("dt")
+            dd_tags = user_data.find_all("dd")
+            user_data_dict = {dt.get_text(strip=True): dd.get_text(strip=True) for dt, dd in zip(dt_tags, dd_tags)}
+            review.usage_count = user_data_dict.get("利用人数", UNKNOWN)
+            review.date = user_data_dict.get("投稿日", UNKNOWN)
+            review.purpose = user_data_dict.get("利用目的", UNKNOWN)
+    if box_filter is not None and box_filter.date_rejected(review.date):
+        review.rejected = "date_window"
+        return review
+
+    # 口コミ詳細の取得
+    review_detail = review_box.find_all("div", class_="review__list--box__cell")
+    if len(review_detail) < 2:
+        return review
+    review.has_detail = True
+
+    # 利用プラン情報の取得
+    plan_section = review_detail[1].find("div", class_="review__list--box__plan--text")
+    plan_menu = plan_section.find("p", class_="review__list--box__plan--menu") if plan_section else None
+    review.plan_menu = plan_menu.get_text(strip=True) if plan_menu else UNKNOWN
+    if box_filter is not None and box_filter.plan_rejected(review.plan_menu):
+        review.rejected = "plan"
+        return review
+
+    # コメントの取得
+    for comment in review_detail[1].find_all("dl", class_="review__list--box__comment"):
+        heading = comment.find("dt", class_="review__list--box__comment--heading")
+        field = COMMENT_HEADINGS.get(heading.get_text(strip=True) if heading else "")
+        if field:
+            content = comment.find("dd")
+            setattr(review, field, content.get_text(strip=True) if content else "")
+    if box_filter is not None and box_filter.comments_rejected(review):
+        review.rejected = "missing_comment"
+        return review
+
+    # 口コミのスコア部分（条件を満たしたボックスだけ抽出する）
+    score_section = review_detail[1].find("div", class_="review__list--box__score")
+    if score_section:
+        total_score_section = score_section.find("dl", class_="review__list--box__score--total")
+        if total_score_section:
+            total_score = total_score_section.find("span", class_="review-totalscore")
+            review.overall_score = total_score.get_text(strip=True) if total_score else ""
+        for category in score_section.find_all("dl", class_="review__list--box__score--categoryScore"):
+            dt = category.find("dt")
+            field = CATEGORY_SCORES.get(dt.get_text(strip=True) if dt else "")
+            if field:
+                dd = category.find("dd", class_="score")
+                setattr(review, field, dd.get_text(strip=True) if dd else "")
+    return review
+
+
+def _max_page_bs4(soup):
+    pager = soup.find("div", class_="pager")
+    pager_count = pager.find("ul", class_="pager__count") if pager else None
+    if not pager_count:
+        return None
+    page_numbers = [
+        int(m.group(1)) for m in (PAGE_NO_PATTERN.search(link.get("href", "")) for link in pager_count.find_all("a")) if m
+    ]
+    return max(page_numbers) if page_numbers else None
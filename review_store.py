@@ -0,0 +1,149 @@
+import argparse
+import codecs
+import glob
+import os
+from datetime import date
+
+import pandas as pd
+import pyarrow.dataset as ds
+
+REVIEW_STORE = "review_store"  # Parquet形式の口コミデータの保存先
+PARTITION_COLUMN = "crawl_date"
+DATE_FORMAT = "%Y/%m/%d"  # サイト上（およびCSV）の投稿日の形式
+CHUNK_SIZE = 50000  # 分割して読み込むときの1回あたりの口コミ数
+
+# カラムごとの型（スコアは数値、投稿日は日付、繰り返しの多い項目はカテゴリ型）
+SCORE_COLUMNS = ["plan_score", "atmosphere_score", "food_score", "cost_performance_score", "service_score"]
+CATEGORY_COLUMNS = ["restaurant_name", "age_gender", "usage_count", "purpose", "plan_menu"]
+TEXT_COLUMNS = ["user_name", "comment_food_drink", "comment_atmosphere_service", "comment_reactions"]
+# 口コミID・レストランIDは数字だけの値でも文字列のまま読み込む
+ID_DTYPES = {"review_id": str, "restaurant_id": str}
+
+
+def read_reviews_csv(csv_path, columns=None):
+    """口コミのCSVを読み込み、型を整えた DataFrame を返す（文字コードは utf-8 → cp932 の順に試す）"""
+    try:
+        df = pd.read_csv(csv_path, encoding="utf-8-sig", usecols=columns, dtype=ID_DTYPES)
+    except UnicodeDecodeError:
+        df = pd.read_csv(csv_path, encoding="cp932", usecols=columns, dtype=ID_DTYPES)  # 日本語Windows環境の場合
+    return normalize_types(df)
+
+
+def normalize_types(df):
+    # 取得できなかった項目 ("Unknown") は欠損値として扱う
+    df = df.copy()
+    if "overall_score" in df.columns:
+        df["overall_score"] = pd.to_numeric(df["overall_score"], errors="coerce")
+    for col in SCORE_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce").round().astype("Int8")
+    if "date" in df.columns:
+        df["date"] = pd.to_datetime(df["date"], format=DATE_FORMAT, errors="coerce")
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+    for col in TEXT_COLUMNS + list(ID_DTYPES):
+        if col in df.columns:
+            df[col] = df[col].astype("string")
+    return df
+
+
+def import_csv(csv_path, dataset, crawl_date=None, store_dir=REVIEW_STORE):
+    """
+    クロール結果のCSVを、データセットの crawl_date パーティションとして保存する。
+    同じ日付のパーティションが既にあれば置き換える。
+    """
+    crawl_date = crawl_date or date.today().isoformat()
+    df = read_reviews_csv(csv_path)
+    partition_dir = os.path.join(store_dir, dataset, f"{PARTITION_COLUMN}={crawl_date}")
+    os.makedirs(partition_dir, exist_ok=True)
+    for old_file in glob.glob(os.path.join(partition_dir, "*.parquet")):
+        os.remove(old_file)
+    df.to_parquet(os.path.join(partition_dir, "part-0.parquet"), index=False)
+    return len(df)
+
+
+def load_reviews(dataset, columns=None, crawl_dates=None, store_dir=REVIEW_STORE):
+    """
+    データセットの口コミを読み込む。必要なカラムと crawl_date のパーティションだけを読み込める。
+    データセットがまだ取り込まれていなければ、同名のCSV（dataset または dataset.csv）から読み込む。
+    """
+    dataset_dir = os.path.join(store_dir, dataset)
+    if os.path.isdir(dataset_dir):
+        filters = [(PARTITION_COLUMN, "in", list(crawl_dates))] if crawl_dates else None
+        return pd.read_parquet(dataset_dir, columns=columns, filters=filters)
+    if crawl_dates:
+        raise FileNotFoundError(f"データセット '{dataset}' が {store_dir} に取り込まれていません。")
+    csv_path = dataset if dataset.endswith(".csv") else f"{dataset}.csv"
+    return read_reviews_csv(csv_path, columns=columns)
+
+
+def detect_encoding(csv_path, encodings=("utf-8-sig", "cp932"), block_size=1 << 20):
+    """CSVの文字コードを判定する（ファイル全体を一度に読み込まず、ブロックごとにデコードしてみる）"""
+    for encoding in encodings:
+        decoder = codecs.getincrementaldecoder(encoding)()
+        try:
+            with open(csv_path, "rb") as f:
+                for block in iter(lambda: f.read(block_size), b""):
+                    decoder.decode(block)
+                decoder.decode(b"", final=True)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    raise UnicodeDecodeError(encodings[-1], b"", 0, 1, f"{csv_path} の文字コードを判定できません。")
+
+
+def iter_reviews(dataset, columns=None, chunk_size=CHUNK_SIZE, crawl_dates=None, store_dir=REVIEW_STORE):
+    """
+    load_reviews と同じデータを、chunk_size 件ずつの DataFrame として順に返す。
+    データセット全体をメモリに載せずに処理するためのもの（行の順番は load_reviews と同じ）。
+    """
+    dataset_dir = os.path.join(store_dir, dataset)
+    if os.path.isdir(dataset_dir):
+        parquet = ds.dataset(dataset_dir, format="parquet", partitioning="hive")
+        filter_ = ds.field(PARTITION_COLUMN).isin(list(crawl_dates)) if crawl_dates else None
+        for batch in parquet.to_batches(columns=columns, filter=filter_, batch_size=chunk_size):
+            if batch.num_rows:
+                yield batch.to_pandas()
+        return
+    if crawl_dates:
+        raise FileNotFoundError(f"データセット '{dataset}' が {store_dir} に取り込まれていません。")
+    csv_path = dataset if dataset.endswith(".csv") else f"{dataset}.csv"
+    encoding = detect_encoding(csv_path)
+    for chunk in pd.read_csv(csv_path, encoding=encoding, usecols=columns, dtype=ID_DTYPES, chunksize=chunk_size):
+        yield normalize_types(chunk)
+
+
+def dataset_columns(dataset, store_dir=REVIEW_STORE):
+    """データセット（または同名のCSV）のカラム名のリスト"""
+    dataset_dir = os.path.join(store_dir, dataset)
+    if os.path.isdir(dataset_dir):
+        return ds.dataset(dataset_dir, format="parquet", partitioning="hive").schema.names
+    csv_path = dataset if dataset.endswith(".csv") else f"{dataset}.csv"
+    return pd.read_csv(csv_path, encoding=detect_encoding(csv_path), nrows=0).columns.tolist()
+
+
+def list_crawl_dates(dataset, store_dir=REVIEW_STORE):
+    prefix = f"{PARTITION_COLUMN}="
+    dataset_dir = os.path.join(store_dir, dataset)
+    if not os.path.isdir(dataset_dir):
+        return []
+    return sorted(name[len(prefix) :] for name in os.listdir(dataset_dir) if name.startswith(prefix))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="口コミのCSVをParquet形式のデータセットに取り込みます。")
+    parser.add_argument("csv_path", help="取り込むCSVファイル")
+    parser.add_argument("--dataset", help="データセット名（省略時はCSVのファイル名）")
+    parser.add_argument("--crawl-date", help="クロール日 (YYYY-MM-DD、省略時は今日)")
+    parser.add_argument("--store-dir", default=REVIEW_STORE, help="データセットの保存先")
+    args = parser.parse_args()
+
+    dataset = args.dataset or os.path.splitext(os.path.basename(args.csv_path))[0]
+    count = import_csv(args.csv_path, dataset, args.crawl_date, args.store_dir)
+    print(f"{count}件の口コミをデータセット '{dataset}' に取り込みました。")
+    print(f"クロール日: {list_crawl_dates(dataset, args.store_dir)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+import argparse
+import glob
+import json
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from review_store import CHUNK_SIZE, PARTITION_COLUMN, REVIEW_STORE, iter_reviews, load_reviews
+from tokenization import analyze, base_form, dictionary_version
+
+COMMENT_FIELDS = ["comment_food_drink", "comment_atmosphere_service", "comment_reactions"]
+# Parquetのメタデータに保存する、コメント列 → トークン列を作った形態素解析器・辞書の版（dictionary_version）
+TOKEN_VERSIONS_KEY = b"token_versions"
+
+
+def token_columns(field):
+    # コメント列ごとに、表層形・基本形・品詞のリスト列を持つ
+    return [f"{field}_surface", f"{field}_base", f"{field}_pos"]
+
+
+def add_token_columns(df, fields=COMMENT_FIELDS):
+    """
+    コメント列を形態素解析し、表層形・基本形・品詞（"品詞,品詞細分類1"）のリスト列を追加する。
+    欠損しているコメントは空のリストになる。
+    """
+    df = df.copy()
+    for field in fields:
+        texts = df[field].fillna("").astype(str).tolist()
+        surfaces, bases, poses = [], [], []
+        for morphs in analyze(texts):
+            surfaces.append([surface for surface, _ in morphs])
+            bases.append([base_form(surface, feature) for surface, feature in morphs])
+            poses.append([",".join(feature.split(",")[:2]) for _, feature in morphs])
+        surface_col, base_col, pos_col = token_columns(field)
+        df[surface_col] = surfaces
+        df[base_col] = bases
+        df[pos_col] = poses
+    return df
+
+
+def _partition_files(dataset, crawl_dates=None, store_dir=REVIEW_STORE):
+    files = sorted(glob.glob(os.path.join(store_dir, dataset, "*", "*.parquet")))
+    if crawl_dates:
+        partitions = {f"{PARTITION_COLUMN}={crawl_date}" for crawl_date in crawl_dates}
+        files = [path for path in files if os.path.basename(os.path.dirname(path)) in partitions]
+    return files
+
+
+def stored_token_versions(path):
+    """Parquetファイルに保存されているトークン列の、コメント列 → 形態素解析器・辞書の版"""
+    metadata = pq.read_schema(path).metadata or {}
+    return json.loads(metadata.get(TOKEN_VERSIONS_KEY, b"{}"))
+
+
+def has_current_tokens(dataset, fields, crawl_dates=None, store_dir=REVIEW_STORE):
+    """
+    データセット（crawl_dates を指定するとそのパーティション）の全ファイルに、fields のトークン列が
+    現在の形態素解析器・辞書で作られて保存されているか。CSVのみのデータセットは False。
+    """
+    files = _partition_files(dataset, crawl_dates, store_dir)
+    if not files:
+        return False
+    version = dictionary_version()
+    return all(stored_token_versions(path).get(field) == version for path in files for field in fields)
+
+
+def tokenize_dataset(dataset, fields=COMMENT_FIELDS, store_dir=REVIEW_STORE):
+    """
+    review_store に取り込んだデータセットの各パーティションに、トークン列を追加して保存し直す。
+    どの形態素解析器・辞書で作ったトークン列かを、Parquetのメタデータに記録しておく。
+    """
+    files = _partition_files(dataset, store_dir=store_dir)
+    if not files:
+        raise FileNotFoundError(f"データセット '{dataset}' が {store_dir} に取り込まれていません。")
+    version = dictionary_version()
+    for path in files:
+        versions = {**stored_token_versions(path), **{field: version for field in fields}}
+        df = add_token_columns(pd.read_parquet(path), fields)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        metadata = {**(table.schema.metadata or {}), TOKEN_VERSIONS_KEY: json.dumps(versions).encode("utf-8")}
+        pq.write_table(table.replace_schema_metadata(metadata), path)
+    return len(files)
+
+
+def load_tokenized(dataset, fields, columns=None, store_dir=REVIEW_STORE):
+    """
+    口コミと、指定したコメント列のトークン列を読み込む（columns=None なら全カラム）。
+    トークン列が保存されていなければ（CSVのみ、または未解析の場合）、または保存されているトークン列が
+    現在とは別の形態素解析器・辞書で作られたものなら、その場で解析して追加する。
+    """
+    token_cols = [col for field in fields for col in token_columns(field)]
+    if has_current_tokens(dataset, fields, store_dir=store_dir):
+        df = load_reviews(dataset, columns=None if columns is None else [*columns, *token_cols], store_dir=store_dir)
+    else:
+        # 使えるトークン列がないデータセット：コメント列を読み込んで解析する
+        base_columns = None if columns is None else list(dict.fromkeys([*columns, *fields]))
+        df = add_token_columns(load_reviews(dataset, columns=base_columns, store_dir=store_dir), fields)
+    # Parquetから読み込んだリスト列は numpy 配列になるため、Pythonのリストに揃える
+    for col in token_cols:
+        df[col] = [list(tokens) for tokens in df[col]]
+    return df
+
+
+def iter_tokenized(dataset, fields, columns=None, chunk_size=CHUNK_SIZE, crawl_dates=None, store_dir=REVIEW_STORE):
+    """
+    load_tokenized と同じデータを chunk_size 件ずつ順に返す（使えるトークン列がなければチャンクごとに解析する）。
+    crawl_dates を指定すると、その crawl_date のパーティションの口コミだけを返す。
+    """
+    token_cols = [col for field in fields for col in token_columns(field)]
+    if has_current_tokens(dataset, fields, crawl_dates, store_dir):
+        chunk_columns = None if columns is None else list(dict.fromkeys([*columns, *token_cols]))
+        for chunk in iter_reviews(dataset, chunk_columns, chunk_size, crawl_dates, store_dir):
+            for col in token_cols:
+                chunk[col] = [list(tokens) for tokens in chunk[col]]
+            yield chunk
+    else:
+        base_columns = None if columns is None else list(dict.fromkeys([*columns, *fields]))
+        for chunk in iter_reviews(dataset, base_columns, chunk_size, crawl_dates, store_dir):
+            yield add_token_columns(chunk, fields)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="取り込み済みの口コミデータにトークン列を追加します。")
+    parser.add_argument("dataset", help="review_store のデータセット名")
+    parser.add_argument("--fields", nargs="+", default=COMMENT_FIELDS, help="解析するコメント列")
+    parser.add_argument("--store-dir", default=REVIEW_STORE, help="データセットの保存先")
+    args = parser.parse_args()
+
+    count = tokenize_dataset(args.dataset, args.fields, args.store_dir)
+    print(f"データセット '{args.dataset}' の {count} 個のパーティションにトークン列を追加しました。")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,40 +1,32 @@
-import ast
+import os
+
+from word_counts import LEGACY_WORD_COUNTS, WORD_COUNTS, WordCountTable, convert_legacy
 
 
 def extract_matching_entries(input_file, keywords_file):
     """
-    input_file: str - パス to input.txt ファイル
+    input_file: str - パス to 単語の頻度表（all_words.tsv、旧形式の all_words.txt なら変換して使う）
     keywords_file: str - パス to keywords.txt ファイル
-    Returns: list of tuples - 抜き出されたタプルのリスト
+    Returns: list of tuples - 抜き出されたタプルのリスト（出現回数の多い順）
     """
-    # キーワードをセットとして読み込む（高速な検索のため）
+    # キーワードを読み込む（重複は除き、ファイルの並び順を保つ）
     with open(keywords_file, "r", encoding="utf-8") as f:
-        keywords = set(line.strip() for line in f if line.strip())
-
-    # 入力ファイルの内容を読み込む
-    with open(input_file, "r", encoding="utf-8") as f:
-        content = f.read().strip()
-
-    # 入力がリスト形式でない場合、リストに括る
-    if not content.startswith("["):
-        content = "[" + content + "]"
+        keywords = list(dict.fromkeys(line.strip() for line in f if line.strip()))
 
-    try:
-        # タプルのリストとして解析
-        entries = ast.literal_eval(content)
-    except Exception as e:
-        print("入力ファイルの解析中にエラーが発生しました:", e)
-        return []
+    # 旧形式のファイルは一度だけ頻度表に変換する
+    if input_file.endswith(".txt"):
+        input_file = convert_legacy(input_file, os.path.splitext(input_file)[0] + ".tsv")
 
-    # キーワードと一致するエントリを抽出
-    matches = [entry for entry in entries if entry[0] in keywords]
+    # 頻度表をメモリマップして、キーワードの行だけを引く（ファイル全体は解析しない）
+    with WordCountTable(input_file) as table:
+        counts = table.lookup(keywords)
 
-    return matches
+    return sorted(counts.items(), key=lambda entry: entry[1], reverse=True)
 
 
 def main():
-    # ファイル名を指定
-    input_file = "all_words.txt"
+    # ファイル名を指定（頻度表がなければ旧形式のファイルから作る）
+    input_file = WORD_COUNTS if os.path.exists(WORD_COUNTS) else LEGACY_WORD_COUNTS
     keywords_file = "sizzle_words.txt"
 
     # 一致するエントリを抽出
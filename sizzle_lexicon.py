@@ -0,0 +1,162 @@
+import argparse
+import hashlib
+import os
+import pickle
+import re
+
+from sizzle_matcher import SizzleMatcher
+from tokenization import TOKENIZER, analyze, base_form, dictionary_version
+
+SIZZLE_WORDS = "sizzle_words.txt"  # シズルワードリスト（全カテゴリ）
+# カテゴリごとのシズルワードリスト（味・食感・こだわり/産地）
+CATEGORY_FILES = {
+    "taste": "sizzle_1.txt",
+    "texture": "sizzle_2.txt",
+    "provenance": "sizzle_3.txt",
+}
+LEXICON_DIR = "sizzle_lexicon"  # コンパイル済みの辞書の保存先
+# 辞書の形式やトークン化の処理を変えたら上げる（古い辞書は自動的に作り直される）
+LEXICON_FORMAT = 1
+
+
+# 前処理関数の定義
+def preprocess(text):
+    # 半角記号を除去（ただし '%' は除外）
+    text = re.sub(r'[!"#$&\'()*+,\-./:;<=>?@[\\\]^_`{|}~]', "", text)
+    # 空白の除去
+    text = re.sub(r"\s+", "", text)
+    return text
+
+
+def normalize_tokens(tokens):
+    return ["アフタヌーンティー" if token == "Afternoon tea" else token for token in tokens]
+
+
+# 形態素解析結果からトークン（基本形）のリストを作る
+def to_tokens(morphs):
+    # 固有名詞は表層形、それ以外は基本形が存在する場合は取得、なければ表層形を使用
+    return normalize_tokens(base_form(surface, feature) for surface, feature in morphs)
+
+
+# 複数のテキストをまとめてトークナイズする（形態素解析はキャッシュとプロセスプールを使う）
+def tokenize_all(texts, tokenizer=None):
+    return [to_tokens(morphs) for morphs in analyze([preprocess(text) for text in texts], tokenizer=tokenizer)]
+
+
+# 保存済みのトークン列（表層形・基本形）から照合用のトークンのリストを作る（記号・空白のトークンは除く）
+def stored_tokens(surfaces, bases):
+    return normalize_tokens(base for surface, base in zip(surfaces, bases) if preprocess(surface))
+
+
+def _read_words(path):
+    with open(path, "r", encoding="utf-8") as f:
+        # 読み仮名の注記（例: "美味（びみ）"）は除く
+        return [re.sub(r"（[^）]*）$", "", line.strip()) for line in f if line.strip()]
+
+
+def _file_hash(path):
+    if not os.path.exists(path):
+        return "missing"
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+class SizzleLexicon:
+    """
+    コンパイル済みのシズルワード辞書。
+    entries はシズルワードごとの {"word", "tokens", "categories"}（リストの並び順）、
+    matcher は全シズルワードを1回の走査で照合するオートマトン。
+    """
+
+    def __init__(self, entries, fingerprint):
+        self.entries = entries
+        self.fingerprint = fingerprint
+        self.matcher = SizzleMatcher(entries)
+        self.words = list(dict.fromkeys(entry["word"] for entry in entries))
+        self._categories = {entry["word"]: entry["categories"] for entry in entries}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def categories(self, word):
+        """シズルワードのカテゴリ（"taste", "texture", "provenance"）のタプル"""
+        return self._categories.get(word, ())
+
+
+def lexicon_fingerprint(source, category_files=CATEGORY_FILES, tokenizer=None):
+    # 元のファイルの内容・解析器と辞書のバージョンが変わると変わる値
+    parts = [
+        f"format:{LEXICON_FORMAT}",
+        f"tokenizer:{tokenizer or TOKENIZER}:{dictionary_version(tokenizer)}",
+        f"source:{_file_hash(source)}",
+    ]
+    parts.extend(f"{category}:{_file_hash(path)}" for category, path in sorted(category_files.items()))
+    return hashlib.sha1("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+def compile_lexicon(source=SIZZLE_WORDS, category_files=CATEGORY_FILES, tokenizer=None):
+    """シズルワードのファイルをトークナイズし、カテゴリを付けて辞書を作る（トークンが空の語は除く）"""
+    words = _read_words(source)
+    category_words = {
+        category: set(_read_words(path)) for category, path in category_files.items() if os.path.exists(path)
+    }
+    entries = []
+    for word, tokens in zip(words, tokenize_all(words, tokenizer)):
+        if tokens:
+            categories = tuple(category for category, members in category_words.items() if word in members)
+            entries.append({"word": word, "tokens": tokens, "categories": categories})
+    return SizzleLexicon(entries, lexicon_fingerprint(source, category_files, tokenizer))
+
+
+def lexicon_path(source, tokenizer=None, lexicon_dir=LEXICON_DIR):
+    name = os.path.splitext(os.path.basename(source))[0]
+    return os.path.join(lexicon_dir, f"{name}.{tokenizer or TOKENIZER}.lexicon")
+
+
+def load_lexicon(
+    source=SIZZLE_WORDS, category_files=CATEGORY_FILES, tokenizer=None, lexicon_dir=LEXICON_DIR, rebuild=False
+):
+    """
+    コンパイル済みの辞書を読み込む。元のファイルや解析器の辞書が変わっていれば（または rebuild=True なら）
+    コンパイルし直して保存する。
+    """
+    fingerprint = lexicon_fingerprint(source, category_files, tokenizer)
+    path = lexicon_path(source, tokenizer, lexicon_dir)
+    if not rebuild and os.path.exists(path):
+        try:
+            with open(path, "rb") as f:
+                lexicon = pickle.load(f)
+            if isinstance(lexicon, SizzleLexicon) and lexicon.fingerprint == fingerprint:
+                return lexicon
+        except (pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            pass  # 壊れた・古い形式の辞書は作り直す
+
+    lexicon = compile_lexicon(source, category_files, tokenizer)
+    os.makedirs(lexicon_dir, exist_ok=True)
+    # 書き込み途中の辞書を読み込まないよう、一時ファイルに書いてから置き換える
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(lexicon, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+    return lexicon
+
+
+def main():
+    parser = argparse.ArgumentParser(description="シズルワードのリストをコンパイル済みの辞書に変換します。")
+    parser.add_argument("sources", nargs="*", default=[SIZZLE_WORDS], help="シズルワードのファイル")
+    parser.add_argument("--lexicon-dir", default=LEXICON_DIR, help="辞書の保存先")
+    parser.add_argument("--rebuild", action="store_true", help="変更がなくてもコンパイルし直す")
+    args = parser.parse_args()
+
+    for source in args.sources:
+        lexicon = load_lexicon(source, lexicon_dir=args.lexicon_dir, rebuild=args.rebuild)
+        counts = {category: 0 for category in CATEGORY_FILES}
+        for entry in lexicon.entries:
+            for category in entry["categories"]:
+                counts[category] += 1
+        print(f"{source}: {len(lexicon)}語 → '{lexicon_path(source, lexicon_dir=args.lexicon_dir)}'")
+        print("  カテゴリ別: " + ", ".join(f"{category} {count}語" for category, count in counts.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+from collections import deque
+
+
+class SizzleMatcher:
+    """
+    トークン列に対する Aho-Corasick オートマトン。
+    シズルワードのトークン列をすべて1つのトライにまとめておき、口コミのトークン列を1回走査するだけで
+    全シズルワードの出現位置を求める（照合のコストはシズルワード数ではなく口コミの長さに比例する）。
+    """
+
+    def __init__(self, sizzle_words):
+        # sizzle_words: load_sizzle_words の戻り値（{"word": ..., "tokens": [...]} のリスト）
+        self._goto = [{}]  # ノードごとの遷移表（トークン → 次のノード）
+        self._fail = [0]  # 失敗時の遷移先
+        self._outputs = [[]]  # ノードで照合が完了するシズルワード (word, トークン数)
+        self.words = []
+        for sizzle in sizzle_words:
+            self._add(sizzle["word"], sizzle["tokens"])
+        self._build()
+
+    def _add(self, word, tokens):
+        # トークンが空のもの、'*' を含むもの（解析できなかった語）は照合しない
+        if not tokens or "*" in tokens:
+            return
+        node = 0
+        for token in tokens:
+            next_node = self._goto[node].get(token)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][token] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._outputs.append([])
+            node = next_node
+        # 同じ語が重複して登録されている場合は1回だけ数える
+        if (word, len(tokens)) not in self._outputs[node]:
+            self._outputs[node].append((word, len(tokens)))
+            self.words.append(word)
+
+    def _build(self):
+        # 幅優先で失敗遷移を作り、失敗先の出力を引き継ぐ（根の直下のノードの失敗先は根）
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for token, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and token not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(token, 0)
+                self._outputs[child] = self._outputs[child] + self._outputs[self._fail[child]]
+                queue.append(child)
+
+    def find_all(self, tokens):
+        """全シズルワードの出現を (シズルワード, 開始位置, 終了位置) のリストで返す（終了位置は含まない）"""
+        matches = []
+        node = 0
+        for i, token in enumerate(tokens):
+            while node and token not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(token, 0)
+            for word, length in self._outputs[node]:
+                matches.append((word, i + 1 - length, i + 1))
+        return matches
+
+    def matched_words(self, tokens):
+        """トークン列に1回以上出現するシズルワードを、最初に出現した順に返す"""
+        return list(dict.fromkeys(word for word, _, _ in self.find_all(tokens)))
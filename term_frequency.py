@@ -0,0 +1,187 @@
+import re
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+# 年齢情報を抽出する関数
+def extract_age_group(age_gender_str):
+    """
+    'age_gender' カラムから年齢情報を抽出します。
+    例:
+        "20代前半（女）" -> "20代前半"
+        "10代（女）" -> "10代"
+        "70代以上（女）" -> "70代以上"
+    """
+    if not isinstance(age_gender_str, str):
+        return "不明"
+    match = re.match(r"(\d+代(?:前半|後半)?|70代以上)", age_gender_str)
+    if match:
+        return match.group(1)
+    else:
+        return "不明"
+
+
+def age_sort_key(age_group):
+    # "10代" < "20代前半" < "20代後半" < ... < "70代以上" < "不明" の順に並べる
+    match = re.match(r"(\d+)代(前半|後半|以上)?", age_group)
+    if not match:
+        return (1, 0, 0)
+    return (0, int(match.group(1)), {None: 0, "前半": 1, "後半": 2, "以上": 3}[match.group(2)])
+
+
+def add_group_columns(df):
+    """集計によく使う派生カラム（age_group: 年代、month: 投稿月）を追加する"""
+    df = df.copy()
+    if "age_gender" in df.columns:
+        df["age_group"] = df["age_gender"].map(extract_age_group)
+    if "date" in df.columns:
+        df["month"] = df["date"].dt.to_period("M")
+    return df
+
+
+def doc_term_matrix(token_lists, binary=False, vocabulary=None):
+    """
+    口コミ×単語の疎行列（CSR）と単語のリストを返す。
+    binary=True なら出現の有無（1口コミで何回出現しても1）、False なら出現回数を値に持つ。
+    vocabulary（単語 → 列番号の辞書）を渡すとその列番号を使い、新しい単語はその辞書に追加する
+    （チャンクごとに作る行列の列を揃えるためのもの）。
+    """
+    vocabulary = {} if vocabulary is None else vocabulary
+    indptr, indices = [0], []
+    for tokens in token_lists:
+        term_ids = (vocabulary.setdefault(token, len(vocabulary)) for token in tokens)
+        indices.extend(set(term_ids) if binary else term_ids)
+        indptr.append(len(indices))
+    X = sparse.csr_matrix(
+        (np.ones(len(indices), dtype=np.int32), np.asarray(indices, dtype=np.int32), np.asarray(indptr)),
+        shape=(len(indptr) - 1, len(vocabulary)),
+    )
+    X.sum_duplicates()  # 同じ口コミ内の同じ単語を1つの要素にまとめる（値は出現回数）
+    return X, list(vocabulary)
+
+
+class GroupTermFrequency:
+    """
+    グループ（年代、利用目的、店舗、月など）ごとの単語の出現回数表。
+    counts はグループ×単語の疎行列で、groups の i 行目が counts の i 行目に対応する。
+    """
+
+    def __init__(self, groups, words, counts, num_reviews):
+        self.groups = groups  # グループのキー（グループ化したカラムを持つ DataFrame）
+        self.words = words
+        self.counts = counts
+        self.num_reviews = num_reviews  # グループごとの口コミ数
+
+    def _keys(self):
+        if self.groups.shape[1] == 1:
+            return self.groups.iloc[:, 0].tolist()
+        return list(self.groups.itertuples(index=False, name=None))
+
+    def _counter_at(self, i):
+        start, end = self.counts.indptr[i], self.counts.indptr[i + 1]
+        return Counter(
+            {self.words[j]: int(count) for j, count in zip(self.counts.indices[start:end], self.counts.data[start:end])}
+        )
+
+    def counter(self, key):
+        """1つのグループの出現回数を Counter で返す（key は複数カラムでグループ化した場合はタプル）"""
+        return self._counter_at(self._keys().index(key))
+
+    def counters(self):
+        """グループのキー → Counter の辞書"""
+        return {key: self._counter_at(i) for i, key in enumerate(self._keys())}
+
+    def top_terms(self, k=20):
+        """グループごとの上位k語を、グループのカラム・rank・word・count の縦長の DataFrame で返す"""
+        frames = []
+        for i in range(self.counts.shape[0]):
+            start, end = self.counts.indptr[i], self.counts.indptr[i + 1]
+            cols, values = self.counts.indices[start:end], self.counts.data[start:end]
+            # 出現回数の降順、同数なら単語の出現順
+            order = np.lexsort((cols, -values))[:k]
+            frame = pd.DataFrame(
+                {
+                    "rank": np.arange(1, len(order) + 1),
+                    "word": [self.words[j] for j in cols[order]],
+                    "count": values[order],
+                }
+            )
+            for col in self.groups.columns:
+                frame.insert(frame.columns.get_loc("rank"), col, self.groups[col].iloc[i])
+            frames.append(frame)
+        columns = [*self.groups.columns, "rank", "word", "count"]
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns)
+
+    def to_frame(self):
+        """全グループ・全単語の出現回数を1つの表（グループ×単語）にする"""
+        index = pd.MultiIndex.from_frame(self.groups) if self.groups.shape[1] > 1 else self.groups.iloc[:, 0]
+        return pd.DataFrame.sparse.from_spmatrix(self.counts, index=index, columns=self.words)
+
+
+def term_frequency_by_group(df, token_col, group_cols, dropna=True, vocabulary=None):
+    """
+    トークン列（口コミごとのトークンのリスト）を、group_cols でグループ化した単語の出現回数表を作る。
+    口コミ×単語の疎行列をグループ×口コミの0/1行列に掛けるだけなので、グループごとに
+    DataFrame を絞り込んだり、トークンのリストを連結したりしない。
+    dropna=False なら、キーが欠損している口コミも1つのグループとして数える。
+    vocabulary は doc_term_matrix と同じ（チャンクごとの表の単語の列を揃える）。
+    """
+    group_cols = [group_cols] if isinstance(group_cols, str) else list(group_cols)
+    X, words = doc_term_matrix(df[token_col], vocabulary=vocabulary)
+
+    # 口コミごとのグループ番号（どのグループにも入らない口コミは -1 なので除く）
+    grouped = df.groupby(group_cols, observed=True, sort=True, dropna=dropna)
+    codes = grouped.ngroup().to_numpy()
+    docs = np.flatnonzero(codes >= 0)
+    G = sparse.csr_matrix(
+        (np.ones(len(docs), dtype=np.int32), (codes[docs], docs)), shape=(grouped.ngroups, len(codes))
+    )
+    groups = grouped.size().reset_index(name="num_reviews")
+    num_reviews = groups.pop("num_reviews").to_numpy()
+    counts = (G @ X).tocsr()
+    counts.sort_indices()  # 行ごとの単語を列番号（最初に出現した順）に並べる（counters の順序がこれで決まる）
+    return GroupTermFrequency(groups, words, counts, num_reviews)
+
+
+class GroupTermCounts:
+    """
+    口コミをチャンクごとに加えながら、グループ×単語の出現回数 G @ X を積み上げる（G はグループ×口コミの0/1行列）。
+    G @ X はチャンクごとの積の和になるので、保持するのはグループ×単語の行列だけで、口コミ数に比例するメモリは使わない。
+    """
+
+    def __init__(self, group_cols, dropna=True):
+        self.group_cols = [group_cols] if isinstance(group_cols, str) else list(group_cols)
+        self.dropna = dropna
+        self.vocabulary = {}  # 単語 → 列番号（全チャンクで共通）
+        self.group_ids = {}  # グループのキー（タプル） → 行番号（最初に現れた順）
+        self.counts = sparse.csr_matrix((0, 0), dtype=np.int32)
+        self.num_reviews = np.zeros(0, dtype=np.int64)
+
+    def update(self, df, token_col):
+        tf = term_frequency_by_group(df, token_col, self.group_cols, self.dropna, vocabulary=self.vocabulary)
+        keys = tf.groups.itertuples(index=False, name=None)
+        rows = [self.group_ids.setdefault(key, len(self.group_ids)) for key in keys]
+        num_groups = len(self.group_ids)
+        # チャンクのグループの行を、全体の行番号の位置に移して足す
+        P = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.int32), (rows, np.arange(len(rows)))), shape=(num_groups, len(rows))
+        )
+        counts = self.counts.copy()
+        counts.resize(num_groups, len(self.vocabulary))
+        self.counts = (counts + P @ tf.counts).tocsr()
+        self.counts.sort_indices()
+        num_reviews = np.zeros(num_groups, dtype=np.int64)
+        num_reviews[: len(self.num_reviews)] = self.num_reviews
+        np.add.at(num_reviews, rows, tf.num_reviews)
+        self.num_reviews = num_reviews
+        return self
+
+    def result(self):
+        """積み上げた出現回数を GroupTermFrequency にする（term_frequency_by_group と同じく、グループはキーの順）"""
+        keys = list(self.group_ids)
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        groups = pd.DataFrame([keys[i] for i in order], columns=self.group_cols)
+        return GroupTermFrequency(groups, list(self.vocabulary), self.counts[order], self.num_reviews[order])
@@ -0,0 +1,14 @@
+from bench_tokenizer import agreement, segments
+
+FEATURE = "名詞,一般,*,*,*,*,*"
+
+
+def test_segments_align_across_whitespace_handling():
+    # MeCab は空白を出力せず、Janome・Sudachi は空白も形態素として出力する
+    text = "紅茶 とても 美味しい"
+    without_spaces = [("紅茶", FEATURE), ("とても", FEATURE), ("美味しい", FEATURE)]
+    with_spaces = [("紅茶", FEATURE), (" ", FEATURE), ("とても", FEATURE), (" ", FEATURE), ("美味しい", FEATURE)]
+
+    assert segments(text, without_spaces) == segments(text, with_spaces)
+    assert {span[:2] for span in segments(text, without_spaces)} == {(0, 2), (3, 6), (7, 11)}
+    assert agreement([segments(text, without_spaces)], [segments(text, with_spaces)]) == 1.0
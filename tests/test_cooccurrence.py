@@ -0,0 +1,32 @@
+import math
+
+from cooccurrence import CooccurrenceCounts, CooccurrenceMatrix
+
+
+def test_pmi_with_large_counts():
+    # 共起数 × 口コミ数が int32 の範囲を超える大きさ（30,000 × 100,000）でも正しく求まる
+    num_docs, both, only_a, only_b = 100_000, 30_000, 10_000, 20_000
+    token_lists = (
+        [["a", "b"]] * both + [["a"]] * only_a + [["b"]] * only_b + [["c"]] * (num_docs - both - only_a - only_b)
+    )
+    matrix = CooccurrenceMatrix(token_lists)
+    expected = math.log(both * num_docs / ((both + only_a) * (both + only_b)))
+
+    assert math.isclose(matrix.pmi("a", "b"), expected)
+    partners = dict(matrix.top_partners("a", measure="pmi"))
+    assert math.isclose(partners["b"], expected)
+
+
+def test_counts_accumulated_by_chunk():
+    # チャンクごとに積み上げた共起行列が、全口コミから一度に作った共起行列と一致する
+    token_lists = [["a", "b"], ["b", "c", "c"], [], ["a", "c"], ["d"], ["a", "b", "d"], ["b"]]
+    expected = CooccurrenceMatrix(token_lists, min_df=2)
+    counts = CooccurrenceCounts()
+    for start in range(0, len(token_lists), 3):
+        counts.update(token_lists[start : start + 3])
+    matrix = CooccurrenceMatrix.from_counts(counts, min_df=2)
+
+    assert matrix.words == expected.words
+    assert matrix.num_docs == expected.num_docs
+    for measure in ("count", "pmi", "jaccard"):
+        assert matrix.partners_frame(measure=measure).equals(expected.partners_frame(measure=measure))
@@ -0,0 +1,66 @@
+import glob
+import os
+from datetime import datetime
+
+import pytest
+
+from review_parser import UNKNOWN, BoxFilter, etree, parse_page
+
+FIXTURES = sorted(glob.glob(os.path.join(os.path.dirname(__file__), "fixtures", "review_page_*.html")))
+BACKENDS = ["bs4"] + (["lxml"] if etree is not None else [])
+BOX_FILTERS = {
+    "date_window": BoxFilter(date_from=datetime(2024, 1, 1), date_to=datetime(2024, 10, 31)),
+    "plan": BoxFilter(keywords=("Afternoon", "アフタヌーン")),
+    "missing_comment": BoxFilter(require_comments=True),
+}
+
+
+def _read(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def _kept(reviews):
+    # クロール時と同じく、口コミ詳細がないものは対象外
+    return [review for review in reviews if review.has_detail and review.rejected is None]
+
+
+@pytest.mark.parametrize("path", FIXTURES, ids=os.path.basename)
+def test_backends_extract_identical_pages(path):
+    if etree is None:
+        pytest.skip("lxml がインストールされていません。")
+    html = _read(path)
+    assert parse_page(html, backend="lxml") == parse_page(html, backend="bs4")
+
+
+def test_fixture_page():
+    page = parse_page(_read(FIXTURES[0]), backend="bs4")
+    assert page.restaurant_name == "ホテル ラウンジ テスト店"
+    assert page.max_page == 2
+    assert [review.user_name for review in page.reviews][:2] == ["さくらさん", "ゆうこさん"]  # common-frame は除く
+    first = page.reviews[0]
+    assert first.comment_food_drink == "スコーンが焼きたてで美味しかったです。紅茶の種類も多く、Tea & Coffee どちらも楽しめました。"
+    assert (first.overall_score, first.service_score) == ("4.8", "5")
+    assert page.reviews[3].purpose == UNKNOWN
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+@pytest.mark.parametrize("reason", BOX_FILTERS)
+def test_box_filter_matches_filtering_after_extraction(backend, reason):
+    # 途中で抽出をやめても、全項目を抽出してから条件で絞り込んだ場合と同じ口コミが残る
+    box_filter = BOX_FILTERS[reason]
+    rejected = 0
+    for path in FIXTURES:
+        html = _read(path)
+        expected = [
+            review
+            for review in _kept(parse_page(html, backend).reviews)
+            if not box_filter.date_rejected(review.date)
+            and not box_filter.plan_rejected(review.plan_menu)
+            and not box_filter.comments_rejected(review)
+        ]
+        reviews = parse_page(html, backend, box_filter).reviews
+        assert _kept(reviews) == expected
+        assert {review.rejected for review in reviews} <= {None, reason}
+        rejected += sum(review.rejected == reason for review in reviews)
+    assert rejected  # どの条件も、フィクスチャの中に除かれる口コミがある
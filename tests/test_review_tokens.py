@@ -0,0 +1,63 @@
+import glob
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+import review_tokens
+import tfidf
+import tokenization
+from review_store import import_csv
+from review_tokens import TOKEN_VERSIONS_KEY, has_current_tokens, iter_tokenized, load_tokenized, tokenize_dataset
+
+pytest.importorskip("MeCab")
+
+FIELD = "comment_food_drink"
+
+
+@pytest.fixture
+def dataset(tmp_path, monkeypatch):
+    # 辞書はインストールされている既定のもの、形態素解析のキャッシュは一時ディレクトリに作る
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(tokenization, "MECAB_ARGS", "")
+    pd.DataFrame(
+        {
+            "restaurant_name": ["A", "A", "B"],
+            FIELD: ["紅茶がとても美味しかったです。", None, "スコーンは温かくて最高"],
+        }
+    ).to_csv("reviews.csv", index=False)
+    import_csv("reviews.csv", "reviews", "2024-01-01", store_dir="store")
+    tokenize_dataset("reviews", [FIELD], store_dir="store")
+    return "reviews"
+
+
+def test_stale_token_columns_are_recomputed(dataset):
+    assert has_current_tokens(dataset, [FIELD], store_dir="store")
+    expected = load_tokenized(dataset, [FIELD], store_dir="store")[f"{FIELD}_surface"].tolist()
+
+    # 別の解析器・辞書で作られたトークン列に置き換える
+    (path,) = glob.glob("store/reviews/*/*.parquet")
+    table = pq.read_table(path)
+    stale = pa.array([["古い", "トークン"]] * table.num_rows)
+    table = table.set_column(table.schema.get_field_index(f"{FIELD}_surface"), f"{FIELD}_surface", stale)
+    metadata = {**table.schema.metadata, TOKEN_VERSIONS_KEY: b'{"comment_food_drink": "other"}'}
+    pq.write_table(table.replace_schema_metadata(metadata), path)
+
+    assert not has_current_tokens(dataset, [FIELD], store_dir="store")
+    assert load_tokenized(dataset, [FIELD], store_dir="store")[f"{FIELD}_surface"].tolist() == expected
+    chunks = iter_tokenized(dataset, [FIELD], columns=[], chunk_size=2, store_dir="store")
+    assert [tokens for chunk in chunks for tokens in chunk[f"{FIELD}_surface"]] == expected
+
+
+def test_document_frequencies_rebuilt_for_new_tokenizer(dataset, monkeypatch):
+    doc_freq = tfidf.update_document_frequencies(dataset, FIELD, store_dir="store")
+    assert doc_freq.token_version == tokenization.dictionary_version()
+    assert tfidf.update_document_frequencies(dataset, FIELD, store_dir="store").num_docs == 3
+
+    # 形態素解析器・辞書が変わったら、保存済みの文書頻度に足さずに集計し直す
+    monkeypatch.setattr(tfidf, "dictionary_version", lambda: "other")
+    monkeypatch.setattr(review_tokens, "dictionary_version", lambda: "other")
+    doc_freq = tfidf.update_document_frequencies(dataset, FIELD, store_dir="store")
+    assert doc_freq.token_version == "other"
+    assert doc_freq.num_docs == 3
@@ -0,0 +1,24 @@
+import pandas as pd
+
+from term_frequency import GroupTermCounts, term_frequency_by_group
+
+
+def test_group_term_counts_match_in_memory():
+    # チャンクごとに積み上げた年代別の出現回数が、全体を一度に集計した結果と（単語の並びまで）一致する
+    df = pd.DataFrame(
+        {
+            "age_group": ["20代前半", "30代後半", "20代前半", "不明", "30代後半", "20代前半", "不明"],
+            "tokens": [["a", "b", "a"], ["c"], [], ["b", "d"], ["d", "a"], ["e"], ["c", "c"]],
+        }
+    )
+    expected = term_frequency_by_group(df, "tokens", "age_group")
+    counts = GroupTermCounts("age_group")
+    for start in range(0, len(df), 3):
+        counts.update(df.iloc[start : start + 3], "tokens")
+    result = counts.result()
+
+    assert result.groups.equals(expected.groups)
+    assert result.num_reviews.tolist() == expected.num_reviews.tolist()
+    assert [list(c.items()) for c in result.counters().values()] == [
+        list(c.items()) for c in expected.counters().values()
+    ]
@@ -0,0 +1,228 @@
+import argparse
+import glob
+import os
+import re
+
+import numpy as np
+from scipy import sparse
+
+from review_store import CHUNK_SIZE, REVIEW_STORE, list_crawl_dates
+from review_tokens import iter_tokenized, token_columns
+from term_frequency import doc_term_matrix
+from tokenization import dictionary_version
+
+KEYWORD_FIELD = "comment_food_drink"  # キーワードを抽出するコメント列
+_WORD = re.compile(r"\w\w+")
+
+
+def keyword_tokens(tokens):
+    """
+    トークン（表層形）のリストから、TF-IDFに使う単語を取り出す。
+    TfidfVectorizer の既定と同じく、2文字以上の単語文字の並びだけを小文字にして使う（助詞・記号などは除かれる）。
+    """
+    return [word.lower() for token in tokens for word in _WORD.findall(token)]
+
+
+class DocumentFrequencies:
+    """
+    単語ごとの文書頻度（出現する口コミ数）と出現回数の累計。
+    update() で新しい口コミの分だけ追加で集計でき、保存しておけば次回は集計し直さずに IDF を求められる。
+    """
+
+    def __init__(self, vocabulary=(), doc_freq=None, term_freq=None, num_docs=0, sources=None, token_version=None):
+        self.vocabulary = list(vocabulary)
+        self._term_ids = {word: i for i, word in enumerate(self.vocabulary)}
+        size = len(self.vocabulary)
+        self.doc_freq = np.zeros(size, dtype=np.int64) if doc_freq is None else np.asarray(doc_freq, dtype=np.int64)
+        self.term_freq = np.zeros(size, dtype=np.int64) if term_freq is None else np.asarray(term_freq, dtype=np.int64)
+        self.num_docs = num_docs
+        self.sources = dict(sources or {})  # 集計済みの入力（パーティションまたはCSV → 更新時刻）
+        self.token_version = token_version  # 集計に使ったトークンの形態素解析器・辞書の版（dictionary_version）
+
+    def __contains__(self, word):
+        return word in self._term_ids
+
+    def __len__(self):
+        return len(self.vocabulary)
+
+    def _ids(self, words, add=False):
+        if not add:
+            return np.array([self._term_ids.get(word, -1) for word in words], dtype=np.int64)
+        ids = np.array([self._term_ids.setdefault(word, len(self._term_ids)) for word in words], dtype=np.int64)
+        new_words = len(self._term_ids) - len(self.vocabulary)
+        if new_words:
+            self.vocabulary.extend(words[i] for i in np.flatnonzero(ids >= len(self.vocabulary)))
+            self.doc_freq = np.concatenate([self.doc_freq, np.zeros(new_words, dtype=np.int64)])
+            self.term_freq = np.concatenate([self.term_freq, np.zeros(new_words, dtype=np.int64)])
+        return ids
+
+    def update(self, token_lists):
+        """口コミごとのトークンのリストを追加で集計する"""
+        X, words = doc_term_matrix(token_lists)
+        ids = self._ids(words, add=True)
+        # 列（単語）ごとの非ゼロ要素数が文書頻度、合計が出現回数
+        self.doc_freq[ids] += np.diff(X.tocsc().indptr)
+        self.term_freq[ids] += np.asarray(X.sum(axis=0)).ravel()
+        self.num_docs += X.shape[0]
+        return self
+
+    def idf(self):
+        # TfidfVectorizer(smooth_idf=True) と同じ式
+        return np.log((1 + self.num_docs) / (1 + self.doc_freq)) + 1
+
+    def features(self, max_features=None):
+        """使う単語の番号（max_features を指定すると、出現回数の多い順に上位の単語だけ）"""
+        if max_features is None or max_features >= len(self.vocabulary):
+            return np.arange(len(self.vocabulary))
+        top = np.argsort(-self.term_freq, kind="stable")[:max_features]
+        return np.sort(top)
+
+    def vectorize(self, token_lists, max_features=None):
+        """
+        口コミ×単語のTF-IDF行列（CSR、行ごとにL2正規化）と単語のリストを返す。
+        集計していない単語と、max_features に入らない単語は列に含めない。
+        """
+        X, words = doc_term_matrix(token_lists)
+        feature_ids = self.features(max_features)
+        # 全体の単語番号 → 列番号（使わない単語は -1）
+        columns = np.full(len(self.vocabulary) + 1, -1, dtype=np.int64)
+        columns[feature_ids] = np.arange(len(feature_ids))
+        local_columns = columns[self._ids(words)]  # 未知の単語（-1）は末尾の -1 を引く
+
+        X = X.tocoo()
+        cols = local_columns[X.col]
+        keep = cols >= 0
+        values = X.data[keep] * self.idf()[feature_ids[cols[keep]]]
+        M = sparse.csr_matrix((values, (X.row[keep], cols[keep])), shape=(X.shape[0], len(feature_ids)))
+
+        norms = np.sqrt(np.asarray(M.multiply(M).sum(axis=1)).ravel())
+        norms[norms == 0] = 1
+        M = (sparse.diags(1 / norms) @ M).tocsr()
+        return M, [self.vocabulary[i] for i in feature_ids]
+
+    def save(self, path):
+        # 書き込み途中のファイルを読み込まないよう、一時ファイルに書いてから置き換える
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                vocabulary=np.array(self.vocabulary, dtype=str),
+                doc_freq=self.doc_freq,
+                term_freq=self.term_freq,
+                num_docs=np.array(self.num_docs),
+                source_names=np.array(list(self.sources), dtype=str),
+                source_mtimes=np.array(list(self.sources.values()), dtype=np.float64),
+                token_version=np.array(self.token_version or "", dtype=str),
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(
+                data["vocabulary"].tolist(),
+                data["doc_freq"],
+                data["term_freq"],
+                int(data["num_docs"]),
+                dict(zip(data["source_names"].tolist(), data["source_mtimes"].tolist())),
+                # 版を記録していない以前の形式のファイルは None（集計し直す）
+                (str(data["token_version"]) or None) if "token_version" in data else None,
+            )
+
+
+def top_keywords(matrix, feature_names, k=5):
+    """
+    TF-IDF行列の各行（口コミ）の上位k語をスコアの降順のリストで返す（スコアが0の単語は含めない）。
+    全行の非ゼロ要素を (行, スコアの降順) で一度に並べ替えるので、行ごとに密な配列にしない。
+    """
+    matrix = matrix.tocsr()
+    if not matrix.shape[0]:
+        return []
+    lengths = np.diff(matrix.indptr)
+    rows = np.repeat(np.arange(matrix.shape[0]), lengths)
+    order = np.lexsort((-matrix.data, rows))
+    # 行内での順位が k 未満の要素だけ残す
+    rank = np.arange(len(order)) - matrix.indptr[rows[order]]
+    selected = order[rank < k]
+    names = np.asarray(feature_names, dtype=object)[matrix.indices[selected]]
+    return [list(words) for words in np.split(names, np.cumsum(np.minimum(lengths, k))[:-1])]
+
+
+def doc_freq_path(dataset, field, store_dir=REVIEW_STORE):
+    # review_store のデータセットと同じ場所に、コメント列ごとの文書頻度を置く
+    return os.path.join(store_dir, f"{dataset}.{field}.df.npz")
+
+
+def dataset_sources(dataset, store_dir=REVIEW_STORE):
+    """データセットの入力（crawl_date のパーティション、または同名のCSV）→ 更新時刻"""
+    dates = list_crawl_dates(dataset, store_dir)
+    if dates:
+        sources = {}
+        for crawl_date in dates:
+            files = glob.glob(os.path.join(store_dir, dataset, f"crawl_date={crawl_date}", "*.parquet"))
+            sources[crawl_date] = max((os.path.getmtime(path) for path in files), default=0.0)
+        return sources
+    csv_path = dataset if dataset.endswith(".csv") else f"{dataset}.csv"
+    return {csv_path: os.path.getmtime(csv_path)}
+
+
+def update_document_frequencies(
+    dataset, field=KEYWORD_FIELD, store_dir=REVIEW_STORE, chunk_size=CHUNK_SIZE, rebuild=False
+):
+    """
+    保存済みの文書頻度を読み込み、まだ集計していない crawl_date のパーティションの口コミだけを追加で集計して保存する。
+    集計済みのパーティションが取り込み直された（または削除された）場合、CSVが更新された場合と、
+    形態素解析器・辞書が変わった場合は最初から集計し直す。
+    """
+    path = doc_freq_path(dataset, field, store_dir)
+    sources = dataset_sources(dataset, store_dir)
+    version = dictionary_version()
+    doc_freq = DocumentFrequencies.load(path) if os.path.exists(path) and not rebuild else DocumentFrequencies()
+    stale = any(sources.get(name) != mtime for name, mtime in doc_freq.sources.items())
+    if stale or doc_freq.token_version != version:
+        doc_freq = DocumentFrequencies(token_version=version)
+
+    new_sources = [name for name in sources if name not in doc_freq.sources]
+    if not new_sources:
+        return doc_freq
+    # CSVのみのデータセットは crawl_date で絞り込めないので、全体を集計する
+    crawl_dates = None if new_sources == list(sources) else new_sources
+    surface_col = token_columns(field)[0]
+    chunks = iter_tokenized(
+        dataset, [field], columns=[], chunk_size=chunk_size, crawl_dates=crawl_dates, store_dir=store_dir
+    )
+    for chunk in chunks:
+        doc_freq.update(keyword_tokens(tokens) for tokens in chunk[surface_col])
+    doc_freq.sources.update((name, sources[name]) for name in new_sources)
+    os.makedirs(store_dir, exist_ok=True)
+    doc_freq.save(path)
+    return doc_freq
+
+
+def main():
+    parser = argparse.ArgumentParser(description="口コミの文書頻度を更新し、TF-IDFの上位キーワードを表示します。")
+    parser.add_argument("dataset", help="review_store のデータセット名")
+    parser.add_argument("--field", default=KEYWORD_FIELD, help="キーワードを抽出するコメント列")
+    parser.add_argument("--store-dir", default=REVIEW_STORE, help="データセットの保存先")
+    parser.add_argument("--top", type=int, default=5, help="口コミごとに表示するキーワード数")
+    parser.add_argument("--max-features", type=int, help="使う単語数の上限（出現回数の多い順）")
+    parser.add_argument("--show", type=int, default=5, help="キーワードを表示する口コミ数")
+    parser.add_argument("--rebuild", action="store_true", help="保存済みの文書頻度があっても集計し直す")
+    args = parser.parse_args()
+
+    doc_freq = update_document_frequencies(args.dataset, args.field, args.store_dir, rebuild=args.rebuild)
+    print(f"口コミ数: {doc_freq.num_docs}, 単語数: {len(doc_freq)}")
+    if not args.show:
+        return
+
+    surface_col = token_columns(args.field)[0]
+    chunk = next(iter_tokenized(args.dataset, [args.field], columns=[], chunk_size=args.show, store_dir=args.store_dir))
+    matrix, feature_names = doc_freq.vectorize(
+        (keyword_tokens(tokens) for tokens in chunk[surface_col]), max_features=args.max_features
+    )
+    for idx, keywords in enumerate(top_keywords(matrix, feature_names, args.top)):
+        print(f"文書 {idx + 1} の上位キーワード:", keywords)
+
+
+if __name__ == "__main__":
+    main()
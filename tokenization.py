@@ -0,0 +1,288 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+
+# 形態素解析器はインストールされているものだけを使う（既定は MeCab）
+try:
+    import MeCab
+except ImportError:
+    MeCab = None
+try:
+    import janome
+    from janome.tokenizer import Tokenizer as JanomeTokenizer
+except ImportError:
+    janome = None
+try:
+    import sudachipy
+    from sudachipy import Dictionary as SudachiDictionary, SplitMode as SudachiSplitMode
+except ImportError:
+    sudachipy = None
+
+TOKENIZERS = ("mecab", "janome", "sudachi")
+# 使用する形態素解析器（環境変数 TOKENIZER で切り替えられる）
+TOKENIZER = os.environ.get("TOKENIZER", "mecab")
+# MeCabの辞書設定（ipadic + NEologd、環境変数 MECAB_ARGS で変更できる）
+MECAB_ARGS = os.environ.get(
+    "MECAB_ARGS",
+    '-d "C:/Program Files (x86)/MeCab/dic/ipadic" '
+    '-u "C:/Program Files (x86)/MeCab/dic/NEologd/NEologd.20200910-u.dic"',
+)
+SUDACHI_SPLIT_MODE = "C"  # Sudachi の分割単位（A: 短単位、B: 中単位、C: 長単位）
+TOKEN_CACHE = "token_cache.sqlite"  # 形態素解析結果のキャッシュ
+BATCH_SIZE = 500  # 1つのワーカープロセスにまとめて渡すテキスト数
+MIN_PARALLEL = 2000  # これより少ない件数はプロセスを起動せずに解析する
+
+_backends = {}
+
+
+# ---------------------------------------------------------------------------
+# 形態素解析器のバックエンド
+# どのバックエンドも (表層形, 素性文字列) のリストを返す。素性文字列は ipadic と同じ並び
+# （品詞,品詞細分類1,品詞細分類2,品詞細分類3,活用型,活用形,原形,読み,発音）に揃える。
+# ---------------------------------------------------------------------------
+
+
+class MeCabBackend:
+    name = "mecab"
+
+    def __init__(self, mecab_args=None):
+        if MeCab is None:
+            raise ImportError("mecab-python3 がインストールされていないため、MeCab は使えません。")
+        self.mecab_args = MECAB_ARGS if mecab_args is None else mecab_args
+        self._tagger = MeCab.Tagger(self.mecab_args)
+        self._tagger.parse("")  # バッファオーバーフロー防止のためのダミー解析
+
+    def version(self):
+        # 使用中の辞書（システム辞書・ユーザー辞書）のファイル名とバージョンから作る
+        parts = [self.mecab_args]
+        info = self._tagger.dictionary_info()
+        while info:
+            parts.append(f"{info.filename}:{info.version}")
+            info = info.next
+        return "\n".join(parts)
+
+    def parse(self, text):
+        morphs = []
+        node = self._tagger.parseToNode(text)
+        while node:
+            # 文頭・文末ノード (BOS/EOS) は除く
+            if node.stat not in (MeCab.MECAB_BOS_NODE, MeCab.MECAB_EOS_NODE):
+                morphs.append((node.surface, node.feature))
+            node = node.next
+        return morphs
+
+
+class JanomeBackend:
+    name = "janome"
+
+    def __init__(self):
+        if janome is None:
+            raise ImportError("Janome がインストールされていないため、Janome は使えません。")
+        self._tokenizer = JanomeTokenizer()
+
+    def version(self):
+        return f"janome:{janome.__version__}"
+
+    def parse(self, text):
+        return [
+            (
+                token.surface,
+                ",".join(
+                    [
+                        token.part_of_speech,
+                        token.infl_type,
+                        token.infl_form,
+                        token.base_form,
+                        token.reading,
+                        token.phonetic,
+                    ]
+                ),
+            )
+            for token in self._tokenizer.tokenize(text)
+        ]
+
+
+class SudachiBackend:
+    name = "sudachi"
+
+    def __init__(self, split_mode=None):
+        if sudachipy is None:
+            raise ImportError("SudachiPy がインストールされていないため、Sudachi は使えません。")
+        self.split_mode = split_mode or SUDACHI_SPLIT_MODE
+        self._tokenizer = SudachiDictionary().create(getattr(SudachiSplitMode, self.split_mode))
+
+    def version(self):
+        return f"sudachi:{sudachipy.__version__}:{self.split_mode}"
+
+    def parse(self, text):
+        # 品詞は6項目（品詞〜活用形）なので、原形・読み・発音（読みで代用）を足して ipadic の並びにする
+        return [
+            (
+                morpheme.surface(),
+                ",".join([*morpheme.part_of_speech(), morpheme.dictionary_form(), *[morpheme.reading_form()] * 2]),
+            )
+            for morpheme in self._tokenizer.tokenize(text)
+        ]
+
+
+def get_backend(tokenizer=None, mecab_args=None):
+    # プロセスごとに、バックエンド（と辞書の設定）ごとに1つの解析器を使い回す
+    tokenizer = tokenizer or TOKENIZER
+    mecab_args = MECAB_ARGS if mecab_args is None else mecab_args
+    key = (tokenizer, mecab_args if tokenizer == "mecab" else None)
+    if key not in _backends:
+        if tokenizer == "mecab":
+            _backends[key] = MeCabBackend(mecab_args)
+        elif tokenizer == "janome":
+            _backends[key] = JanomeBackend()
+        elif tokenizer == "sudachi":
+            _backends[key] = SudachiBackend()
+        else:
+            raise ValueError(f"未対応の形態素解析器です: {tokenizer} （{', '.join(TOKENIZERS)} から選んでください）")
+    return _backends[key]
+
+
+def dictionary_version(tokenizer=None, mecab_args=None):
+    # 使用中の解析器と辞書から作る識別子（キャッシュのキーに使う）
+    return hashlib.sha1(get_backend(tokenizer, mecab_args).version().encode("utf-8")).hexdigest()[:16]
+
+
+def parse_morphs(text, tokenizer=None, mecab_args=None):
+    """テキストを形態素解析し、(表層形, 素性文字列) のリストを返す"""
+    return get_backend(tokenizer, mecab_args).parse(text)
+
+
+def _parse_batch(texts, tokenizer, mecab_args):
+    # ワーカープロセス内で実行される
+    backend = get_backend(tokenizer, mecab_args)
+    return [backend.parse(text) for text in texts]
+
+
+def analyze(texts, workers=None, cache_path=TOKEN_CACHE, mecab_args=None, tokenizer=None):
+    """
+    複数のテキストをまとめて形態素解析し、入力と同じ順序で形態素のリストを返す。
+    結果は (テキストのハッシュ, 解析器・辞書のバージョン) をキーにキャッシュし、同じテキストは二度と解析しない。
+    キャッシュにないテキストが多い場合は、プロセスプール（ワーカーごとに解析器1つ）で並列に解析する。
+    cache_path=None のときはキャッシュを使わない。tokenizer を省略すると TOKENIZER の解析器を使う。
+    """
+    tokenizer = tokenizer or TOKENIZER
+    mecab_args = MECAB_ARGS if mecab_args is None else mecab_args
+    keys = [_text_key(text) for text in texts]
+    results = {}
+    cache = _MorphCache(cache_path, dictionary_version(tokenizer, mecab_args)) if cache_path else None
+    if cache:
+        results.update(cache.get_many(set(keys)))
+
+    # 未解析のテキスト（重複は1回だけ解析する）
+    missing = {}
+    for key, text in zip(keys, texts):
+        if key not in results:
+            missing.setdefault(key, text)
+    if missing:
+        missing_keys = list(missing)
+        missing_texts = [missing[key] for key in missing_keys]
+        workers = workers or os.cpu_count() or 1
+        if workers > 1 and len(missing_texts) >= MIN_PARALLEL:
+            batches = [missing_texts[i : i + BATCH_SIZE] for i in range(0, len(missing_texts), BATCH_SIZE)]
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                parsed = [
+                    morphs
+                    for batch in executor.map(
+                        _parse_batch, batches, [tokenizer] * len(batches), [mecab_args] * len(batches)
+                    )
+                    for morphs in batch
+                ]
+        else:
+            parsed = _parse_batch(missing_texts, tokenizer, mecab_args)
+        new_results = dict(zip(missing_keys, parsed))
+        results.update(new_results)
+        if cache:
+            cache.put_many(new_results)
+
+    if cache:
+        cache.close()
+    return [results[key] for key in keys]
+
+
+# ---------------------------------------------------------------------------
+# 形態素からの語の取り出し（ipadic の素性の並びを前提とする）
+# ---------------------------------------------------------------------------
+
+
+def base_form(surface, feature):
+    # 基本形を返す（固有名詞は表層形のまま、基本形がない場合も表層形を使う）
+    features = feature.split(",")
+    if len(features) > 1 and features[1] == "固有名詞":
+        return surface
+    return features[6] if len(features) > 6 else surface
+
+
+NOUN_PATTERN = re.compile(r"^[\w一-龥ぁ-んァ-ン]+$")
+
+
+def extract_nouns(morphs, stopwords=()):
+    # 名詞（一般、固有名詞など）を抽出し、不要な記号や数字・ストップワードを除外する
+    nouns = []
+    for surface, feature in morphs:
+        features = feature.split(",")
+        if features[0] == "名詞" and features[1] not in ["代名詞", "接続詞的"]:
+            if NOUN_PATTERN.match(surface) and surface not in stopwords:
+                nouns.append(surface)
+    return nouns
+
+
+# ---------------------------------------------------------------------------
+# 形態素解析結果のキャッシュ
+# ---------------------------------------------------------------------------
+
+
+def _text_key(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class _MorphCache:
+    def __init__(self, path, dict_version):
+        self.dict_version = dict_version
+        self._conn = sqlite3.connect(path)
+        with self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS morphs (
+                    text_hash TEXT NOT NULL,
+                    dict_version TEXT NOT NULL,
+                    morphs TEXT NOT NULL,
+                    PRIMARY KEY (text_hash, dict_version)
+                )
+                """
+            )
+
+    def get_many(self, keys):
+        found = {}
+        keys = list(keys)
+        # SQLiteのパラメータ数の上限を超えないよう分割して問い合わせる
+        for i in range(0, len(keys), 500):
+            chunk = keys[i : i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self._conn.execute(
+                f"SELECT text_hash, morphs FROM morphs WHERE dict_version = ? AND text_hash IN ({placeholders})",
+                [self.dict_version, *chunk],
+            )
+            for text_hash, morphs in rows:
+                found[text_hash] = [tuple(morph) for morph in json.loads(morphs)]
+        return found
+
+    def put_many(self, results):
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO morphs (text_hash, dict_version, morphs) VALUES (?, ?, ?)",
+                [
+                    (key, self.dict_version, json.dumps(morphs, ensure_ascii=False))
+                    for key, morphs in results.items()
+                ],
+            )
+
+    def close(self):
+        self._conn.close()
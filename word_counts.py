@@ -0,0 +1,153 @@
+import argparse
+import ast
+import mmap
+import os
+from collections import Counter
+
+WORD_COUNTS = "all_words.tsv"  # 単語の出現頻度表（単語<TAB>出現回数、単語のバイト順に整列）
+LEGACY_WORD_COUNTS = "all_words.txt"  # 旧形式（"('単語', 出現回数), ..." のタプルの羅列）
+HEADER = "word\tcount\n"
+
+
+def write_word_counts(path, counts):
+    """
+    単語 → 出現回数（Counter や (単語, 出現回数) の列）を頻度表として保存する。
+    単語のUTF-8のバイト順に並べるので、読み込み側はファイル全体を解析せずに二分探索で引ける。
+    """
+    if not isinstance(counts, Counter):
+        merged = Counter()
+        for word, count in counts:
+            merged[word] += count
+        counts = merged
+    for word in counts:
+        if "\t" in word or "\n" in word or "\r" in word:
+            raise ValueError(f"単語にタブ・改行は使えません: {word!r}")
+    # 書き込み途中の表を読み込まないよう、一時ファイルに書いてから置き換える
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8", newline="\n") as f:
+        f.write(HEADER)
+        for word in sorted(counts, key=lambda w: w.encode("utf-8")):
+            f.write(f"{word}\t{counts[word]}\n")
+    os.replace(tmp_path, path)
+
+
+def read_legacy_word_counts(path):
+    """旧形式の all_words.txt（タプルの羅列）を (単語, 出現回数) のリストとして読み込む"""
+    with open(path, "r", encoding="utf-8") as f:
+        content = f.read().strip()
+    # 入力がリスト形式でない場合、リストに括る
+    if not content.startswith("["):
+        content = "[" + content + "]"
+    return ast.literal_eval(content)
+
+
+def convert_legacy(source=LEGACY_WORD_COUNTS, path=WORD_COUNTS):
+    """旧形式のファイルを頻度表に変換する（変換済みで元のファイルより新しければ何もしない）"""
+    if not os.path.exists(path) or os.path.getmtime(path) < os.path.getmtime(source):
+        write_word_counts(path, read_legacy_word_counts(source))
+    return path
+
+
+class WordCountTable:
+    """
+    write_word_counts で保存した頻度表を、メモリマップして引く。
+    表は単語のバイト順に並んでいるので、1語あたり O(log n) 回の比較で出現回数を返し、
+    引いた行以外は Python のオブジェクトにしない。
+    """
+
+    def __init__(self, path=WORD_COUNTS):
+        self.path = path
+        self._file = open(path, "rb")
+        if os.fstat(self._file.fileno()).st_size:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self._mm = b""
+        # ヘッダー行の次から
+        header = HEADER.encode("utf-8")
+        self._start = len(header) if self._mm[: len(header)] == header else 0
+        self._len = None
+
+    def _find(self, key):
+        # lo, hi は常に行の先頭を指す
+        mm = self._mm
+        lo, hi = self._start, len(mm)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            newline = mm.rfind(b"\n", lo, mid)
+            start = lo if newline < 0 else newline + 1
+            end = mm.find(b"\n", start)
+            if end < 0:
+                end = len(mm)
+            tab = mm.find(b"\t", start, end)
+            word = mm[start:tab]
+            if key == word:
+                return int(mm[tab + 1 : end])
+            if key < word:
+                hi = start
+            else:
+                lo = end + 1
+        return None
+
+    def get(self, word, default=None):
+        count = self._find(word.encode("utf-8"))
+        return default if count is None else count
+
+    def __getitem__(self, word):
+        count = self.get(word)
+        if count is None:
+            raise KeyError(word)
+        return count
+
+    def __contains__(self, word):
+        return self.get(word) is not None
+
+    def __len__(self):
+        if self._len is None:
+            self._len = len(self._mm[self._start :].splitlines())
+        return self._len
+
+    def lookup(self, words):
+        """words のうち表にある単語の出現回数を {単語: 出現回数} で返す"""
+        counts = {}
+        for word in words:
+            count = self.get(word)
+            if count is not None:
+                counts[word] = count
+        return counts
+
+    def items(self):
+        """全ての (単語, 出現回数) を単語のバイト順に返す"""
+        for line in self._mm[self._start :].splitlines():
+            word, count = line.split(b"\t")
+            yield word.decode("utf-8"), int(count)
+
+    def close(self):
+        if isinstance(self._mm, mmap.mmap):
+            self._mm.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="単語の頻度表を作成し、単語の出現回数を引きます。")
+    parser.add_argument("words", nargs="*", help="出現回数を引く単語")
+    parser.add_argument("--table", default=WORD_COUNTS, help="頻度表のファイル")
+    parser.add_argument("--convert", metavar="LEGACY", help="旧形式のファイル（all_words.txt）から頻度表を作る")
+    args = parser.parse_args()
+
+    if args.convert:
+        write_word_counts(args.table, read_legacy_word_counts(args.convert))
+        print(f"'{args.convert}' を '{args.table}' に変換しました。")
+    with WordCountTable(args.table) as table:
+        print(f"単語数: {len(table)}")
+        for word in args.words:
+            print(f"{word}: {table.get(word, 0)}")
+
+
+if __name__ == "__main__":
+    main()